@@ -2,6 +2,7 @@
 Command-line interface for analyzing literary texts
 """
 import argparse
+import logging
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
@@ -18,6 +19,9 @@ Examples:
   python analyze_text.py --file poem.txt
   python analyze_text.py --file story.txt --type story --output json
   python analyze_text.py --text "The woods are lovely, dark and deep"
+  python analyze_text.py --file novel.txt --events > events.ndjson
+  python analyze_text.py --dir corpus/ --jsonl results.jsonl --workers 8
+  python analyze_text.py --glob "corpus/**/*.poem" --jsonl poems.jsonl
         """
     )
     
@@ -31,11 +35,49 @@ Examples:
         help='Direct text input to analyze'
     )
     
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Read --file incrementally (bounded memory for book-length texts)'
+    )
+    
+    parser.add_argument(
+        '--events',
+        action='store_true',
+        help='Print partial results as NDJSON events (sentences, arc points, running aggregates) while analyzing'
+    )
+    
+    parser.add_argument(
+        '--dir', '-d',
+        help='Batch mode: analyze every .txt/.poem file under this directory'
+    )
+    
+    parser.add_argument(
+        '--glob', '-g',
+        help='Batch mode: analyze files matching this glob pattern (supports **)'
+    )
+    
+    parser.add_argument(
+        '--jsonl',
+        default='analysis_results.jsonl',
+        help='Batch mode: JSONL output path (default: analysis_results.jsonl)'
+    )
+    
+    parser.add_argument(
+        '--manifest',
+        help='Batch mode: resumable manifest path (default: <jsonl>.manifest)'
+    )
+    
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        help='Batch mode: number of worker processes (default: CPU count)'
+    )
+    
     parser.add_argument(
         '--type',
         choices=['poem', 'book', 'story', 'essay', 'general'],
-        default='general',
-        help='Type of literary text (default: general)'
+        help='Type of literary text (default: general; batch mode detects it from each file extension)'
     )
     
     parser.add_argument(
@@ -45,11 +87,56 @@ Examples:
         help='Output format (default: text)'
     )
     
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Compact JSON output: no indentation, per-sentence results as offset/label/confidence columns'
+    )
+    
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Include per-stage timings in the results metadata (with --text)'
+    )
+    
     args = parser.parse_args()
     
+    # Show pipeline progress on the console
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
     # Validate input
-    if not args.file and not args.text:
-        parser.error("Either --file or --text must be provided")
+    if not args.file and not args.text and not args.dir and not args.glob:
+        parser.error("One of --file, --text, --dir or --glob must be provided")
+    
+    # Batch mode
+    if args.dir or args.glob:
+        from src.batch import collect_files, run_batch
+        
+        paths = collect_files(directory=args.dir, pattern=args.glob)
+        if not paths:
+            print("Error: No matching files found")
+            sys.exit(1)
+        
+        run_batch(paths, args.jsonl, manifest_path=args.manifest, workers=args.workers,
+                  compact=args.compact, text_type=args.type)
+        return
+    
+    text_type = args.type or 'general'
+    
+    # Incremental events only: stdout carries nothing but NDJSON
+    if args.events:
+        from src.serialization import JSONLinesWriter
+        
+        analyzer = LiteraryTextAnalyzer(cache_size=0)
+        writer = JSONLinesWriter(sys.stdout)
+        if args.file:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                for event in analyzer.iter_analyze(f, text_type=text_type):
+                    writer.write(event)
+        else:
+            for event in analyzer.iter_analyze(args.text, text_type=text_type):
+                writer.write(event)
+        return
     
     # Initialize analyzer
     print("Initializing Literary Text Analyzer...")
@@ -63,20 +150,25 @@ Examples:
             sys.exit(1)
         
         print(f"Analyzing file: {args.file}\n")
-        analyzer.analyze_file(args.file, output_format=args.output)
+        analyzer.analyze_file(args.file, output_format=args.output, stream=args.stream,
+                              compact=args.compact)
     
     elif args.text:
         print("Analyzing provided text...\n")
-        results = analyzer.analyze_complete(args.text, text_type=args.type)
+        results = analyzer.analyze_complete(args.text, text_type=text_type, include_timings=args.timings,
+                                            compact=args.compact)
         
         if args.output in ['text', 'both']:
             summary = analyzer.generate_summary(results)
             print(summary)
         
         if args.output in ['json', 'both']:
-            import json
+            from src.sentence_results import json_default, json_default_columnar
+            from src.serialization import write_json
             print("\nJSON Results:")
-            print(json.dumps(results, indent=2))
+            write_json(results, sys.stdout, indent=None if args.compact else 2,
+                       default=json_default_columnar if args.compact else json_default)
+            print()
 
 
 if __name__ == "__main__":
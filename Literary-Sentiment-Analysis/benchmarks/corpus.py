@@ -0,0 +1,129 @@
+"""
+Deterministic synthetic corpus for benchmarks
+The same seed always produces the same poems, stories and novel-length texts
+"""
+import random
+
+
+COMMON_WORDS = [
+    'the', 'and', 'of', 'a', 'to', 'in', 'I', 'was', 'he', 'she', 'it', 'that',
+    'with', 'her', 'his', 'my', 'on', 'for', 'as', 'at', 'by', 'from', 'all',
+    'were', 'had', 'not', 'but', 'would', 'there', 'their', 'when', 'one',
+    'house', 'river', 'road', 'night', 'morning', 'window', 'garden', 'letter',
+    'walked', 'looked', 'remembered', 'waited', 'spoke', 'turned', 'slept',
+    'old', 'quiet', 'long', 'cold', 'green', 'silver', 'distant', 'small',
+]
+
+EMOTION_WORDS = [
+    'happy', 'bright', 'smile', 'laugh', 'peace', 'sad', 'lonely', 'tears',
+    'grief', 'sorrow', 'angry', 'rage', 'storm', 'bitter', 'afraid', 'shadow',
+    'darkness', 'dread', 'sudden', 'wonder', 'awe', 'love', 'tender', 'heart',
+    'gentle', 'hope', 'dream', 'light', 'dawn', 'promise', 'courage',
+]
+
+SIZES = {
+    '1k': 1000,
+    '10k': 10000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+
+def _sentence(rng, min_words=6, max_words=28):
+    length = rng.randint(min_words, max_words)
+    words = [
+        rng.choice(EMOTION_WORDS) if rng.random() < 0.12 else rng.choice(COMMON_WORDS)
+        for _ in range(length)
+    ]
+    words[0] = words[0].capitalize()
+    sentence = ' '.join(words) + rng.choice(['.', '.', '.', '!', '?', '…'])
+
+    # Typographic dialogue and dashes, as in typeset books
+    if rng.random() < 0.15:
+        sentence = f'“{sentence}”'
+    if rng.random() < 0.05:
+        sentence = sentence.replace(' ', ' — ', 1)
+    return sentence
+
+
+def generate_prose(word_count, seed=0):
+    """
+    Prose in paragraphs of 3-8 sentences, roughly word_count words long
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+
+    while total < word_count:
+        sentences = [_sentence(rng) for _ in range(rng.randint(3, 8))]
+        total += sum(len(sentence.split()) for sentence in sentences)
+        paragraphs.append(' '.join(sentences))
+
+    return '\n\n'.join(paragraphs)
+
+
+def generate_prose_bytes(byte_count, seed=0):
+    """
+    Prose at least byte_count bytes long in UTF-8
+    """
+    word_count = byte_count // 5
+    text = generate_prose(word_count, seed)
+    while len(text.encode('utf-8')) < byte_count:
+        word_count += word_count // 10
+        text = generate_prose(word_count, seed)
+    return text
+
+
+def generate_poem(word_count, seed=0):
+    """
+    Verse in stanzas of 4-6 short lines, with a repeated refrain
+    """
+    rng = random.Random(seed)
+    refrain = _sentence(rng, 5, 8)
+    stanzas = []
+    total = 0
+
+    while total < word_count:
+        lines = [_sentence(rng, 4, 10) for _ in range(rng.randint(3, 5))]
+        lines.append(refrain)
+        total += sum(len(line.split()) for line in lines)
+        stanzas.append('\n'.join(lines))
+
+    return '\n\n'.join(stanzas)
+
+
+def generate_labelled_sentences(count, seed=0):
+    """
+    Sentences labelled 0/1/2 (negative/neutral/positive) for training a small model
+    """
+    rng = random.Random(seed)
+    positive = ['happy', 'bright', 'smile', 'laugh', 'peace', 'love', 'hope', 'light']
+    negative = ['sad', 'lonely', 'tears', 'grief', 'rage', 'bitter', 'afraid', 'dread']
+    texts = []
+    labels = []
+
+    for _ in range(count):
+        label = rng.randint(0, 2)
+        words = [rng.choice(COMMON_WORDS) for _ in range(rng.randint(5, 25))]
+        if label != 1:
+            pool = positive if label == 2 else negative
+            for _ in range(rng.randint(1, 3)):
+                words.insert(rng.randrange(len(words)), rng.choice(pool))
+        texts.append(' '.join(words))
+        labels.append(label)
+
+    return texts, labels
+
+
+def build_corpus(sizes=('1k', '10k', '100k'), seed=0):
+    """
+    Returns: dict mapping '<kind>-<size>' -> (text, text_type)
+    Poems are generated up to 10K words; larger sizes are novel-length prose
+    """
+    corpus = {}
+    for size in sizes:
+        word_count = SIZES[size]
+        corpus[f'story-{size}'] = (generate_prose(word_count, seed), 'story')
+        if word_count <= 10000:
+            corpus[f'poem-{size}'] = (generate_poem(word_count, seed), 'poem')
+    return corpus
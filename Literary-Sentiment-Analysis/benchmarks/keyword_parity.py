@@ -0,0 +1,200 @@
+"""
+Parity check: KeywordMatcher vs the original str.count scoring
+The original predict_emotion counted every keyword as a substring of the
+lowercased text. KeywordMatcher counts whole words and their inflections
+("smiled", "mourning", "darkness"), so the only hits it drops are keywords
+inside unrelated words ("mad" in "made", "rage" in "courage").
+This script scores the benchmark corpus and a set of literary sentences both
+ways, reports where the two disagree and why, plus the time each takes, and
+exits with status 1 if any difference is not one of those dropped hits
+
+Usage (from the Literary-Sentiment-Analysis directory):
+  python benchmarks/keyword_parity.py
+  python benchmarks/keyword_parity.py --sizes 1k 10k 100k --top 30
+  python benchmarks/keyword_parity.py --output parity.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.append(PROJECT_DIR)
+sys.path.append(BENCHMARK_DIR)
+
+from corpus import build_corpus
+from src.emotion_detector import EmotionDetector
+from src.keyword_matcher import WORD_PATTERN
+
+
+# Sentences with inflected keywords and keywords hidden inside other words,
+# which the synthetic corpus (base forms only) never produces
+LITERARY_SENTENCES = [
+    "She smiled and laughed, and the children were laughing in the garden.",
+    "He cried all night, mourning the friends he had loved and lost.",
+    "The villagers feared the storms that darkened the valley every spring.",
+    "They hoped for better days and dreamed of the dawning light.",
+    "I was scared, but she cared for me with a tender, careful hand.",
+    "He made his way home, madly in love, his heart pounding.",
+    "The fire had burned down; only embers glowed in the cold hearth.",
+    "Her sadness deepened into despair as the lonely winter passed.",
+    "Trembling, he promised to persevere through the darkness ahead.",
+    "They celebrated with cheerful songs, delighted by the sunshine.",
+    "The haters in the hall whispered bitterly about the threatening news.",
+    "She wished upon the light of the evening star, believing in wonders.",
+]
+
+
+def legacy_scores(lexicon, text):
+    """
+    Keyword scores as the original predict_emotion computed them
+    """
+    text_lower = text.lower()
+    return {emotion: sum(text_lower.count(keyword) for keyword in keywords)
+            for emotion, keywords in lexicon.items()}
+
+
+def primary(scores):
+    return max(scores, key=scores.get) if any(scores.values()) else None
+
+
+def substring_matches(matcher, text):
+    """
+    Keyword hits the original scoring counted inside longer words, split
+    into inflections the matcher still counts and unrelated words it drops
+    Returns: (Counter of (word, keyword) inflections, Counter of the rest)
+    """
+    inflections = Counter()
+    embedded = Counter()
+
+    for word in WORD_PATTERN.findall(text.lower()):
+        for keyword in matcher.index:
+            if keyword != word and keyword in word:
+                target = inflections if matcher.keyword_for(word) == keyword else embedded
+                target[(word, keyword)] += word.count(keyword)
+    return inflections, embedded
+
+
+def unexplained_differences(matcher, old_scores, new_scores, embedded):
+    """
+    Emotions whose str.count score is not the matcher's score plus the
+    dropped embedded hits
+    Returns: list of (emotion, str.count score, matcher score, dropped hits)
+    """
+    dropped = Counter()
+    for (word, keyword), count in embedded.items():
+        for emotion in matcher.index[keyword]:
+            dropped[emotion] += count
+
+    return [(emotion, old_scores[emotion], new_scores[emotion], dropped[emotion])
+            for emotion in old_scores
+            if old_scores[emotion] != new_scores[emotion] + dropped[emotion]]
+
+
+def compare(detector, name, texts):
+    """
+    Score texts both ways and summarize the differences
+    """
+    lexicon = detector.emotion_keywords
+    matcher = detector.matcher
+
+    start = time.perf_counter()
+    old = [legacy_scores(lexicon, text) for text in texts]
+    old_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = [matcher.score(text) for text in texts]
+    new_seconds = time.perf_counter() - start
+
+    inflections, embedded = Counter(), Counter()
+    unexplained = []
+    for text, old_scores, new_scores in zip(texts, old, new):
+        text_inflections, text_embedded = substring_matches(matcher, text)
+        inflections.update(text_inflections)
+        embedded.update(text_embedded)
+        unexplained.extend((text[:60],) + difference for difference in
+                           unexplained_differences(matcher, old_scores, new_scores, text_embedded))
+
+    totals_old = Counter()
+    totals_new = Counter()
+    for old_scores, new_scores in zip(old, new):
+        totals_old.update(old_scores)
+        totals_new.update(new_scores)
+
+    return {
+        'name': name,
+        'texts': len(texts),
+        'primary_agreement': sum(primary(a) == primary(b) for a, b in zip(old, new)) / len(texts),
+        'identical_scores': sum(a == b for a, b in zip(old, new)) / len(texts),
+        'hits': {emotion: {'str_count': totals_old[emotion], 'matcher': totals_new[emotion]}
+                 for emotion in lexicon},
+        'inflections_matched': inflections,
+        'embedded_dropped': embedded,
+        'unexplained': unexplained,
+        'str_count_seconds': old_seconds,
+        'matcher_seconds': new_seconds
+    }
+
+
+def print_report(report, top):
+    print(f"\n{report['name']}: {report['texts']} texts, "
+          f"{report['primary_agreement']:.1%} same primary emotion, "
+          f"{report['identical_scores']:.1%} identical scores")
+    print(f"  str.count {report['str_count_seconds']:.4f}s   "
+          f"matcher {report['matcher_seconds']:.4f}s")
+    print(f"  {'emotion':<10}{'str.count':>10}{'matcher':>10}")
+    for emotion, hits in report['hits'].items():
+        print(f"  {emotion:<10}{hits['str_count']:>10}{hits['matcher']:>10}")
+
+    for label, key in (('inflections still counted', 'inflections_matched'),
+                       ('keywords inside other words no longer counted', 'embedded_dropped')):
+        matches = report[key]
+        if matches:
+            print(f"  {label} ({sum(matches.values())} hits):")
+            for (word, keyword), count in matches.most_common(top):
+                print(f"    {word:<16} ({keyword}) x{count}")
+
+    for text, emotion, old, new, dropped in report['unexplained']:
+        print(f"  UNEXPLAINED {emotion}: str.count {old}, matcher {new}, "
+              f"{dropped} dropped hits in {text!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare keyword scoring with the original str.count')
+    parser.add_argument('--sizes', nargs='+', default=['1k', '10k'],
+                        choices=['1k', '10k', '100k', '1m'], help='Benchmark corpus sizes in words')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus seed')
+    parser.add_argument('--top', type=int, default=15, help='Dropped matches listed per kind')
+    parser.add_argument('--output', help='Also write the report to this JSON file')
+    args = parser.parse_args()
+
+    detector = EmotionDetector()
+    corpus = build_corpus(args.sizes, args.seed)
+    reports = [
+        compare(detector, 'literary sentences', LITERARY_SENTENCES),
+        compare(detector, 'benchmark corpus', [text for text, _ in corpus.values()]),
+    ]
+    # Paragraphs of the corpus, so the agreement rate reflects short passages
+    paragraphs = [paragraph for text, _ in corpus.values() for paragraph in re.split(r'\n\s*\n', text)
+                  if paragraph.strip()]
+    reports.append(compare(detector, 'corpus paragraphs', paragraphs))
+
+    for report in reports:
+        print_report(report, args.top)
+
+    if args.output:
+        for report in reports:
+            for key in ('inflections_matched', 'embedded_dropped'):
+                report[key] = [{'word': word, 'keyword': keyword, 'count': count}
+                               for (word, keyword), count in report[key].most_common()]
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+    return 1 if any(report['unexplained'] for report in reports) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
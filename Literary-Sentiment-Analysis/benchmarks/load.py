@@ -0,0 +1,104 @@
+"""
+Concurrent-request load test for the batch coalescer
+Runs analyze_complete from many threads at once (as the threaded Flask app
+does) with and without a BatchCoalescer, and reports requests per second
+and latency percentiles for each
+
+Usage (from the Literary-Sentiment-Analysis directory):
+  python benchmarks/load.py                          # small BiLSTM, 8 clients
+  python benchmarks/load.py --clients 16 --requests 400
+  python benchmarks/load.py --max-wait-ms 2 --max-batch-size 256
+  python benchmarks/load.py --model vader            # no model: coalescer unused
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.append(PROJECT_DIR)
+sys.path.append(BENCHMARK_DIR)
+
+from corpus import generate_prose
+from run import build_analyzer
+from src.coalescer import BatchCoalescer
+
+
+def run_load(analyzer, texts, clients):
+    """
+    Analyze every text from a pool of client threads
+    Returns: throughput and latency percentiles
+    """
+    def request(text):
+        start = time.perf_counter()
+        analyzer.analyze_complete(text, use_cache=False)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        latencies = np.array(list(executor.map(request, texts)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'requests': len(texts),
+        'seconds': elapsed,
+        'requests_per_second': len(texts) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test request coalescing')
+    parser.add_argument('--model', choices=['vader', 'small'], default='small',
+                        help='VADER fallback or a small locally trained BiLSTM')
+    parser.add_argument('--backend', choices=['keras', 'numpy'], default='keras',
+                        help='Sentiment inference backend for --model small')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per run')
+    parser.add_argument('--words', type=int, default=150, help='Words per request text')
+    parser.add_argument('--max-batch-size', type=int, default=512, help='Coalescer batch size')
+    parser.add_argument('--max-wait-ms', type=float, default=5, help='Coalescer collection window')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus and training seed')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    print(f"Building {args.model} analyzer and {args.requests} request texts...")
+    analyzer = build_analyzer(args.model, args.seed, args.backend)
+    sentiment = analyzer.sentiment_analyzer
+    texts = [generate_prose(args.words, args.seed + i) for i in range(args.requests)]
+
+    # Warm-up (lazy imports, model graph tracing)
+    analyzer.analyze_complete(texts[0], use_cache=False)
+
+    results = {}
+    for name in ('direct', 'coalesced'):
+        sentiment.coalescer = None
+        if name == 'coalesced':
+            sentiment.coalescer = BatchCoalescer(sentiment.predict_sentiment_batch,
+                                                 max_batch_size=args.max_batch_size,
+                                                 max_wait_ms=args.max_wait_ms)
+        results[name] = run_load(analyzer, texts, args.clients)
+        if sentiment.coalescer is not None:
+            results[name]['avg_batch_size'] = sentiment.coalescer.stats()['avg_batch_size']
+
+        line = (f"  {name:<10}{results[name]['requests_per_second']:>8.1f} req/s"
+                f"   p50 {results[name]['p50_ms']:>7.1f}ms   p99 {results[name]['p99_ms']:>7.1f}ms")
+        if 'avg_batch_size' in results[name]:
+            line += f"   {results[name]['avg_batch_size']:.1f} sentences/batch"
+        print(line)
+
+    if args.output:
+        report = {'meta': vars(args), 'results': results}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Benchmark suite for the literary analysis pipeline
+Times every analysis stage on a deterministic synthetic corpus, reports
+throughput and peak memory, and compares against a stored JSON baseline
+
+Usage (from the Literary-Sentiment-Analysis directory):
+  python benchmarks/run.py                          # VADER fallback, 1k/10k/100k words
+  python benchmarks/run.py --model small            # small locally trained BiLSTM
+  python benchmarks/run.py --model small --backend numpy  # same model, NumPy inference
+  python benchmarks/run.py --sizes 1k 10k 100k 1m   # include novel-length texts
+  python benchmarks/run.py --stages predict_sentiment predict_sentiment_batch
+  python benchmarks/run.py --update-baseline        # store results as the new baseline
+  python benchmarks/run.py --allow-missing-baseline # don't fail on results without a baseline
+  python benchmarks/run.py --tolerance 0.3          # fail if a stage is >30% slower
+  python benchmarks/run.py --compare-approximate    # exact vs approximate results side by side
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.append(PROJECT_DIR)
+sys.path.append(BENCHMARK_DIR)
+
+from corpus import build_corpus, generate_labelled_sentences, generate_prose_bytes
+from src.document import Document
+from src.sentence_results import json_default
+from src.sentiment_model import LiterarySentimentAnalyzer
+from src.serialization import write_json
+from src.text_analyzer import LiteraryTextAnalyzer
+
+
+# Per-sentence predict_sentiment calls are slow with a model; cap the sample
+MAX_SINGLE_SENTENCES = 2000
+
+# Size of the dedicated clean_text input, so text cleanup is also timed on
+# input past a megabyte whatever --sizes is
+LARGE_TEXT_BYTES = 2 ** 20
+
+# Latency target (seconds) of the approximate analysis stage and comparison
+APPROXIMATE_TIME_BUDGET = 0.25
+
+
+class Sample:
+    def __init__(self, name, text, text_type):
+        self.name = name
+        self.text = text
+        self.text_type = text_type
+        doc = Document(text)
+        self.sentences = doc.sentences
+        self.word_count = len(doc.words)
+        self.single_sentences = self.sentences[:MAX_SINGLE_SENTENCES]
+        self.single_word_count = sum(len(words) for words in doc.sentence_words[:MAX_SINGLE_SENTENCES])
+        self._results = None
+
+    def results(self, analyzer):
+        # Analysis output for the serialization stages, computed once
+        if self._results is None:
+            self._results = analyzer.analyze_complete(self.text, text_type=self.text_type, use_cache=False)
+        return self._results
+
+
+def _fresh(text):
+    # A new string object so no stage can reuse another stage's Document
+    return ''.join([text])
+
+
+# Each stage runs once on a sample and returns the number of words it processed
+STAGES = {
+    'clean_text': lambda a, s: (a.preprocessor.clean_text(_fresh(s.text)), s.word_count)[1],
+    'preprocess': lambda a, s: (a.preprocessor.preprocess(_fresh(s.text)), s.word_count)[1],
+    'preprocess_many': lambda a, s: (a.preprocessor.preprocess_many(s.text.split('\n\n')), s.word_count)[1],
+    'extract_features': lambda a, s: (a.preprocessor.extract_features(_fresh(s.text)), s.word_count)[1],
+    'predict_sentiment': lambda a, s: (
+        [a.sentiment_analyzer.predict_sentiment(sentence) for sentence in s.single_sentences],
+        s.single_word_count
+    )[1],
+    'predict_sentiment_batch': lambda a, s: (
+        a.sentiment_analyzer.predict_sentiment_batch(s.sentences), s.word_count
+    )[1],
+    'predict_sentiment_batch_fixed': lambda a, s: (
+        a.sentiment_analyzer.predict_sentiment_batch(s.sentences, dynamic_padding=False), s.word_count
+    )[1],
+    'get_overall_sentiment': lambda a, s: (a.sentiment_analyzer.get_overall_sentiment(_fresh(s.text)), s.word_count)[1],
+    'predict_emotion': lambda a, s: (a.emotion_detector.predict_emotion(_fresh(s.text)), s.word_count)[1],
+    'analyze_emotional_arc': lambda a, s: (a.emotion_detector.analyze_emotional_arc(_fresh(s.text)), s.word_count)[1],
+    'analyze_subjectivity': lambda a, s: (a.emotion_detector.analyze_subjectivity(_fresh(s.text)), s.word_count)[1],
+    'analyze_complete': lambda a, s: (
+        a.analyze_complete(_fresh(s.text), text_type=s.text_type, use_cache=False), s.word_count
+    )[1],
+    'analyze_approximate': lambda a, s: (
+        a.analyze_complete(_fresh(s.text), text_type=s.text_type, mode='approximate',
+                           time_budget=APPROXIMATE_TIME_BUDGET), s.word_count
+    )[1],
+    'json_dumps': lambda a, s: (json.dumps(s.results(a), indent=2, default=json_default), s.word_count)[1],
+    'write_json': lambda a, s: (write_json(s.results(a), io.StringIO()), s.word_count)[1],
+    'write_json_compact': lambda a, s: (write_json(s.results(a), io.StringIO(), indent=None), s.word_count)[1],
+}
+
+STARTUP_CODE = (
+    "import sys; sys.path.insert(0, {project!r})\n"
+    "from src.text_analyzer import LiteraryTextAnalyzer\n"
+    "LiteraryTextAnalyzer(cache_size=0).analyze_complete('The woods are lovely, dark and deep.')\n"
+)
+
+
+def build_analyzer(model, seed, backend='keras'):
+    """
+    Analyzer using the VADER fallback or a small model trained on synthetic data
+    backend: sentiment inference backend for the small model
+    """
+    analyzer = LiteraryTextAnalyzer(cache_size=0)
+
+    if model == 'small':
+        import tensorflow as tf
+        tf.keras.utils.set_random_seed(seed)
+
+        texts, labels = generate_labelled_sentences(3000, seed)
+        sentiment = LiterarySentimentAnalyzer(max_words=2000, max_len=200, backend=backend)
+        sentiment.train(texts, labels, epochs=1, batch_size=64)
+        analyzer.sentiment_analyzer = sentiment
+
+    return analyzer
+
+
+def measure(stage, analyzer, sample, repeat, trace_memory):
+    """
+    Best-of-repeat wall time, plus peak allocation from one traced run
+    """
+    run = STAGES[stage]
+    run(analyzer, sample)  # warm-up (lazy imports, model graph tracing)
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        words = run(analyzer, sample)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    result = {
+        'seconds': best,
+        'words': words,
+        'words_per_second': words / best if best > 0 else 0
+    }
+
+    if trace_memory:
+        tracemalloc.start()
+        run(analyzer, sample)
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result
+
+
+def measure_startup(repeat):
+    """
+    Fresh-interpreter import time plus first analysis result
+    """
+    code = STARTUP_CODE.format(project=PROJECT_DIR)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, capture_output=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {'seconds': best}
+
+
+def compare_approximate(analyzer, sample, time_budget):
+    """
+    Exact and approximate analysis of one sample side by side: timings, and
+    each estimated share with its interval and whether it covers the exact one
+    """
+    start = time.perf_counter()
+    exact = analyzer.analyze_complete(_fresh(sample.text), text_type=sample.text_type, use_cache=False)
+    exact_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approximate = analyzer.analyze_complete(_fresh(sample.text), text_type=sample.text_type,
+                                            mode='approximate', time_budget=time_budget)
+    approximate_seconds = time.perf_counter() - start
+
+    rows = []
+    for section, shares in (('sentiment', 'distribution'), ('emotions', 'all_emotions')):
+        for label, estimate in approximate[section][shares].items():
+            low, high = approximate[section]['intervals'][label]
+            value = exact[section][shares].get(label, 0.0)
+            rows.append({
+                'name': f'{section}.{label}',
+                'exact': value,
+                'estimate': estimate,
+                'interval': [low, high],
+                'covered': low <= value <= high
+            })
+
+    return {
+        'exact_seconds': exact_seconds,
+        'approximate_seconds': approximate_seconds,
+        'time_budget': time_budget,
+        'sampled_sentences': approximate['metadata']['sampled_sentences'],
+        'census': approximate['metadata']['census'],
+        'coverage': sum(row['covered'] for row in rows) / len(rows) if rows else None,
+        'estimates': rows
+    }
+
+
+def compare(results, baseline, tolerance, min_seconds=0.005):
+    """
+    Returns: (list of (key, baseline seconds, current seconds) regressions,
+    list of result keys the baseline has no entry for)
+    """
+    regressions = []
+    missing = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            missing.append(key)
+        elif base['seconds'] >= min_seconds and current['seconds'] > base['seconds'] * (1 + tolerance):
+            regressions.append((key, base['seconds'], current['seconds']))
+    return regressions, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the literary analysis pipeline')
+    parser.add_argument('--sizes', nargs='+', default=['1k', '10k', '100k'],
+                        choices=['1k', '10k', '100k', '1m'], help='Corpus sizes in words')
+    parser.add_argument('--stages', nargs='+', choices=sorted(STAGES), help='Stages to run (default: all)')
+    parser.add_argument('--model', choices=['vader', 'small'], default='vader',
+                        help='VADER fallback or a small locally trained BiLSTM')
+    parser.add_argument('--backend', choices=['keras', 'numpy'], default='keras',
+                        help='Sentiment inference backend for --model small')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage (best is kept)')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus and training seed')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc peak-memory run')
+    parser.add_argument('--skip-startup', action='store_true', help='Skip the startup-time benchmark')
+    parser.add_argument('--baseline', help='Baseline JSON (default: benchmarks/baselines/<model>.json)')
+    parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--allow-missing-baseline', action='store_true',
+                        help='Pass when there is no baseline file or it lacks some of the results')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown before a stage counts as a regression (default: 0.25)')
+    parser.add_argument('--compare-approximate', action='store_true',
+                        help='Report exact and approximate results side by side')
+    parser.add_argument('--time-budget', type=float, default=APPROXIMATE_TIME_BUDGET,
+                        help=f'Approximate-mode latency target in seconds (default: {APPROXIMATE_TIME_BUDGET})')
+    parser.add_argument('--output', help='Also write the full results to this JSON file')
+    args = parser.parse_args()
+
+    name = args.model if args.model == 'vader' or args.backend == 'keras' else f'{args.model}-{args.backend}'
+    baseline_path = args.baseline or os.path.join(BENCHMARK_DIR, 'baselines', f'{name}.json')
+    stages = args.stages or list(STAGES)
+
+    print(f"Building {args.model} analyzer and corpus ({', '.join(args.sizes)} words)...")
+    analyzer = build_analyzer(args.model, args.seed, args.backend)
+    samples = [Sample(name, text, text_type)
+               for name, (text, text_type) in build_corpus(args.sizes, args.seed).items()]
+
+    results = {}
+    if not args.skip_startup:
+        results['startup'] = measure_startup(args.repeat)
+        print(f"  startup: {results['startup']['seconds']:.3f}s")
+
+    runs = [(stage, sample) for sample in samples for stage in stages]
+    if 'clean_text' in stages:
+        runs.append(('clean_text', Sample('story-1mb', generate_prose_bytes(LARGE_TEXT_BYTES, args.seed), 'story')))
+
+    for stage, sample in runs:
+        key = f'{stage}@{sample.name}'
+        results[key] = measure(stage, analyzer, sample, args.repeat, not args.no_memory)
+        line = f"  {key}: {results[key]['seconds']:.4f}s, {results[key]['words_per_second']:,.0f} words/s"
+        if 'peak_memory' in results[key]:
+            line += f", peak {results[key]['peak_memory'] / 1e6:.1f}MB"
+        print(line)
+
+    approximate = {}
+    if args.compare_approximate:
+        print(f"\nExact vs approximate (time budget {args.time_budget}s):")
+        for sample in samples:
+            approximate[sample.name] = row = compare_approximate(analyzer, sample, args.time_budget)
+            print(f"  {sample.name}: exact {row['exact_seconds']:.3f}s, approximate "
+                  f"{row['approximate_seconds']:.3f}s from {row['sampled_sentences']} sentences"
+                  f"{' (census)' if row['census'] else ''}, {row['coverage']:.0%} of intervals cover")
+            for estimate in row['estimates']:
+                low, high = estimate['interval']
+                print(f"    {estimate['name']:<24}{estimate['exact']:>8.3f}{estimate['estimate']:>8.3f}"
+                      f"  [{low:.3f}, {high:.3f}]{'' if estimate['covered'] else '  ✗'}")
+
+    report = {
+        'meta': {
+            'model': args.model,
+            'backend': args.backend,
+            'seed': args.seed,
+            'sizes': args.sizes,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+    if approximate:
+        report['approximate'] = approximate
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Baseline written to {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f"\n{'' if args.allow_missing_baseline else '✗ '}No baseline at {baseline_path} "
+              f"(run with --update-baseline to create one)")
+        return 0 if args.allow_missing_baseline else 1
+
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+
+    regressions, missing = compare(results, baseline, args.tolerance)
+    if missing:
+        print(f"\n{'' if args.allow_missing_baseline else '✗ '}{len(missing)} result(s) "
+              f"not in {baseline_path}:")
+        for key in missing:
+            print(f"  {key}")
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for key, before, after in regressions:
+            print(f"  {key}: {before:.4f}s -> {after:.4f}s ({after / before - 1:+.0%})")
+    if regressions or (missing and not args.allow_missing_baseline):
+        return 1
+
+    print(f"\n✓ No regressions beyond {args.tolerance:.0%} against {baseline_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""
+Approximate analysis of very long texts from a stratified sample
+The text is cut into equal-length strata by character position, so every part
+of the arc is covered, and sentences are sampled around random positions in
+each stratum, round-robin, until the sentence or time budget runs out. Only
+sampled sentences are tokenized and scored, so the cost depends on the budget
+rather than on the length of the text. A sentence is picked with probability
+proportional to its length, so estimates weight each one by the inverse;
+percentile bootstrap intervals resample within strata
+"""
+import random
+import re
+import time
+from datetime import datetime
+
+import numpy as np
+
+from src.document import Document
+from src.sentence_results import LABEL_CODES, LABELS
+
+
+# Sentence ends (with closing quotes/brackets and the following whitespace)
+# and blank lines; a sentence runs up to and including its boundary
+BOUNDARY = re.compile(r'[.!?]["\'”’)\]]*\s+|\n\s*\n')
+
+# Longest sentence searched for on either side of a sampled position
+MAX_SENTENCE_CHARS = 1000
+
+# Furthest a sampled position is searched back for the start of its sentence
+LOOKBACK_CHARS = 20 * MAX_SENTENCE_CHARS
+
+# Texts shorter than this many characters per budgeted sentence are scored
+# in full (every sentence, no intervals to speak of)
+CENSUS_CHARS_PER_SENTENCE = 50
+
+
+def sentence_at(text, position, max_chars=MAX_SENTENCE_CHARS):
+    """
+    (start, end) of the sentence containing position; sentences longer
+    than max_chars are cut into max_chars pieces from their start, as
+    iter_sentences cuts them, and the piece containing position is returned
+    (a start more than LOOKBACK_CHARS back is taken as that far back)
+    """
+    start, end = _boundaries(text, position, max(0, position - max_chars), max_chars)
+    if start is None:
+        # Longer than max_chars: find where it starts so the pieces line up
+        start, end = _boundaries(text, position, max(0, position - LOOKBACK_CHARS), max_chars)
+    if start is None:
+        start = max(0, position - LOOKBACK_CHARS)
+
+    if end - start > max_chars:
+        start += (position - start) // max_chars * max_chars
+        end = min(end, start + max_chars)
+    return start, end
+
+
+def _boundaries(text, position, window_start, max_chars):
+    """
+    Last sentence end at or before position after window_start (None if
+    there is none, or 0 at the start of the text), and the first one after
+    position (or max_chars past it)
+    """
+    start = 0 if window_start == 0 else None
+    end = min(len(text), position + max_chars)
+
+    for match in BOUNDARY.finditer(text, window_start, end):
+        if match.end() <= position:
+            start = match.end()
+        else:
+            end = match.end()
+            break
+    return start, end
+
+
+def iter_sentences(text, max_chars=MAX_SENTENCE_CHARS):
+    """
+    (start, end) of every sentence, with the same boundaries as sentence_at
+    """
+    start = 0
+    for match in BOUNDARY.finditer(text):
+        while match.end() - start > max_chars:
+            yield start, start + max_chars
+            start += max_chars
+        yield start, match.end()
+        start = match.end()
+    while start < len(text):
+        yield start, min(len(text), start + max_chars)
+        start += max_chars
+
+
+class _Sample:
+    def __init__(self, emotions):
+        self.strata = []
+        self.lengths = []
+        self.labels = []
+        self.confidences = []
+        self.emotion_counts = []
+        self.words = []
+        self.polarity = []
+        self.subjectivity = []
+        self.assessments = []
+        self.emotions = emotions
+
+    def __len__(self):
+        return len(self.strata)
+
+    def add(self, analyzer, text, units):
+        """
+        Score (stratum, start, end) units: sentiment in one batch, keyword
+        counts, word counts and TextBlob assessments
+        """
+        # TextBlob's pattern analyzer, called once per sentence for polarity,
+        # subjectivity and assessments (sentiment_assessments runs it twice)
+        from textblob.en import sentiment as pattern_sentiment
+
+        sentences = [text[start:end].strip() or text[start:end] for _, start, end in units]
+        sentiments = analyzer.sentiment_analyzer.predict_sentences(sentences)
+        matcher = analyzer.emotion_detector.matcher
+
+        for (stratum, start, end), sentence, sentiment in zip(units, sentences, sentiments):
+            scores = matcher.score(sentence)
+            blob_sentiment = pattern_sentiment(sentence)
+            polarity, subjectivity = blob_sentiment
+            assessments = blob_sentiment.assessments
+
+            self.strata.append(stratum)
+            self.lengths.append(end - start)
+            self.labels.append(LABEL_CODES[sentiment['sentiment']])
+            self.confidences.append(sentiment['confidence'])
+            self.emotion_counts.append([scores[emotion] for emotion in self.emotions])
+            self.words.append(len(Document(sentence).words))
+            self.polarity.append(polarity)
+            self.subjectivity.append(subjectivity)
+            self.assessments.append(len(assessments))
+
+    def arrays(self, stratum_lengths, census):
+        """
+        Per-sentence columns plus inverse-probability weights: a sentence
+        of length l drawn n_h times from a stratum of length L_h stands for
+        L_h / (n_h l) sentences (1 each in a census)
+        """
+        strata = np.array(self.strata, dtype=np.int64)
+        lengths = np.maximum(np.array(self.lengths, dtype=np.float64), 1)
+        if census:
+            weights = np.ones(len(strata))
+        else:
+            per_stratum = np.bincount(strata, minlength=len(stratum_lengths))
+            weights = np.asarray(stratum_lengths, dtype=np.float64)[strata] / (per_stratum[strata] * lengths)
+
+        confidences = np.array(self.confidences)
+        labels = np.array(self.labels, dtype=np.int64)
+        assessments = np.array(self.assessments, dtype=np.float64)
+        return {
+            'strata': strata,
+            'weights': weights,
+            'sentiment': confidences[:, None] * (labels[:, None] == np.arange(len(LABELS))),
+            'confidence': confidences,
+            'emotions': np.array(self.emotion_counts, dtype=np.float64).reshape(len(strata), len(self.emotions)),
+            'words': np.array(self.words, dtype=np.float64),
+            'polarity': np.array(self.polarity) * assessments,
+            'subjectivity': np.array(self.subjectivity) * assessments,
+            'assessments': assessments
+        }
+
+
+def _ratio(numerator, denominator):
+    # Ratios of weighted sums along the last axis, 0 where nothing was seen
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+
+def _estimates(columns, weights):
+    """
+    Ratio estimates for weights of shape (n,) or (replicates, n)
+    """
+    def total(name):
+        return weights @ columns[name]
+
+    emotion_totals = total('emotions')
+    return {
+        'sentiment': _ratio(total('sentiment'), total('confidence')[..., None]),
+        'emotions': _ratio(emotion_totals, emotion_totals.sum(axis=-1, keepdims=True)),
+        'polarity': _ratio(total('polarity'), total('assessments')),
+        'subjectivity': _ratio(total('subjectivity'), total('assessments')),
+        'word_count': total('words'),
+        'sentence_count': weights.sum(axis=-1)
+    }
+
+
+def _bootstrap_weights(strata, weights, replicates, rng):
+    """
+    Weights of bootstrap replicates that resample sentences within strata
+    (a resampled sentence's weight counts once per draw)
+    """
+    counts = np.zeros((replicates, len(strata)))
+    for stratum in np.unique(strata):
+        members = np.flatnonzero(strata == stratum)
+        draws = members[rng.integers(0, len(members), size=(replicates, len(members)))]
+        np.add.at(counts, (np.arange(replicates)[:, None], draws), 1)
+    return counts * weights
+
+
+def _interval(replicates, confidence):
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(replicates, [tail, 100 - tail], axis=0)
+    return low, high
+
+
+def approximate_analysis(analyzer, text, text_type='general', sentence_budget=400, time_budget=None,
+                         strata=20, confidence=0.95, replicates=200, seed=0):
+    """
+    Sentiment distribution, dominant emotions and subjectivity of text with
+    confidence intervals, from at most sentence_budget sampled sentences
+    analyzer: LiteraryTextAnalyzer whose models score the sample
+    time_budget: seconds; sampling stops once another round of one sentence
+    per stratum would not fit (at least two rounds are always scored)
+    strata: position strata (also the points of the approximate arc)
+    Returns: results shaped like analyze_complete, with estimated features,
+    'intervals' next to each estimate and sampling details in the metadata
+    (emotions are always estimated from keyword counts: a hybrid detector's
+    classifier scores whole texts, which a sentence sample cannot stand in
+    for, so metadata['emotion_scoring'] is 'keywords' in every mode)
+    """
+    started = time.perf_counter()
+    text = Document.of(text).text
+    rng = random.Random(seed)
+    emotions = list(analyzer.emotion_detector.matcher.emotions)
+    sample = _Sample(emotions)
+
+    census = len(text) <= CENSUS_CHARS_PER_SENTENCE * sentence_budget
+    strata = max(1, min(strata, len(text) // MAX_SENTENCE_CHARS or 1))
+    bounds = [len(text) * stratum // strata for stratum in range(strata + 1)]
+    stratum_lengths = np.diff(bounds)
+
+    if census:
+        units = [(min(start * strata // max(len(text), 1), strata - 1), start, end)
+                 for start, end in iter_sentences(text)]
+        if units:
+            sample.add(analyzer, text, units)
+    else:
+        rounds = 2
+        while len(sample) < sentence_budget:
+            units = []
+            for _ in range(rounds):
+                for stratum in range(strata):
+                    if len(sample) + len(units) >= sentence_budget:
+                        break
+                    position = rng.randrange(bounds[stratum], max(bounds[stratum + 1], bounds[stratum] + 1))
+                    units.append((stratum, *sentence_at(text, position)))
+            if not units:
+                break
+
+            batch_started = time.perf_counter()
+            sample.add(analyzer, text, units)
+            if time_budget is None:
+                rounds = -(-(sentence_budget - len(sample)) // strata)
+                continue
+
+            # Fit as many further rounds as the remaining time allows, at the
+            # per-sentence cost measured so far
+            per_round = (time.perf_counter() - batch_started) / len(units) * strata
+            remaining = time_budget - (time.perf_counter() - started)
+            rounds = int(remaining / per_round) if per_round > 0 else 1
+            if rounds < 1:
+                break
+
+    return _results(analyzer, text, text_type, sample, stratum_lengths, census, confidence, replicates,
+                    seed, started, sentence_budget, time_budget)
+
+
+def _results(analyzer, text, text_type, sample, stratum_lengths, census, confidence, replicates,
+             seed, started, sentence_budget, time_budget):
+    detector = analyzer.emotion_detector
+    emotions = sample.emotions
+    columns = sample.arrays(stratum_lengths, census) if len(sample) else None
+
+    if columns is None:
+        estimate = {
+            'sentiment': np.zeros(len(LABELS)), 'emotions': np.zeros(len(emotions)),
+            'polarity': 0.0, 'subjectivity': 0.0, 'word_count': 0.0, 'sentence_count': 0.0
+        }
+        bootstrap = None
+    else:
+        estimate = _estimates(columns, columns['weights'])
+        bootstrap = None if census else _estimates(
+            columns, _bootstrap_weights(columns['strata'], columns['weights'], replicates,
+                                        np.random.default_rng(seed)))
+
+    def interval(name, index=None):
+        value = estimate[name] if index is None else estimate[name][index]
+        if bootstrap is None:
+            return [float(value), float(value)]
+        low, high = _interval(bootstrap[name], confidence)
+        if index is not None:
+            low, high = low[index], high[index]
+        return [float(low), float(high)]
+
+    def agreement(name):
+        # Share of replicates that pick the same top label as the estimate
+        if bootstrap is None:
+            return 1.0
+        return float(np.mean(np.argmax(bootstrap[name], axis=-1) == np.argmax(estimate[name])))
+
+    distribution = {label: float(estimate['sentiment'][code]) for code, label in enumerate(LABELS)}
+    sentiment_scores = {key: distribution[key] for key in ('positive', 'negative', 'neutral')}
+    all_emotions = {emotion: float(estimate['emotions'][i]) for i, emotion in enumerate(emotions)}
+    emotion_result = detector.emotion_from_scores(all_emotions)
+    word_count = int(round(float(estimate['word_count'])))
+    sentence_count = int(round(float(estimate['sentence_count'])))
+
+    results = {
+        'metadata': {
+            'analyzed_at': datetime.now().isoformat(),
+            'text_type': text_type,
+            'text_length': len(text),
+            'mode': 'approximate',
+            'census': census,
+            'sampled_sentences': len(sample),
+            'strata': len(stratum_lengths),
+            'sentence_budget': sentence_budget,
+            'time_budget': time_budget,
+            'confidence_level': confidence,
+            'emotion_scoring': 'keywords',
+            'elapsed': time.perf_counter() - started
+        },
+        'features': {
+            'word_count': word_count,
+            'sentence_count': sentence_count,
+            'avg_sentence_length': word_count / sentence_count if sentence_count else 0,
+            'estimated': not census
+        },
+        'sentiment': {
+            'overall_sentiment': max(sentiment_scores, key=sentiment_scores.get),
+            'overall_agreement': agreement('sentiment'),
+            'distribution': sentiment_scores,
+            'intervals': {label: interval('sentiment', LABEL_CODES[label]) for label in sentiment_scores},
+            'sentence_count': sentence_count
+        },
+        'emotions': {
+            'primary_emotion': emotion_result['primary_emotion'],
+            'primary_agreement': agreement('emotions'),
+            'confidence': emotion_result['confidence'],
+            'all_emotions': emotion_result['all_emotions'],
+            'top_emotions': detector.rank_emotions(emotion_result['all_emotions'], top_n=3),
+            'intervals': {emotion: interval('emotions', i) for i, emotion in enumerate(emotions)}
+        },
+        'subjectivity': {
+            'subjectivity': float(estimate['subjectivity']),
+            'polarity': float(estimate['polarity']),
+            'assessment': detector._assess_subjectivity(float(estimate['subjectivity'])),
+            'intervals': {'subjectivity': interval('subjectivity'), 'polarity': interval('polarity')}
+        }
+    }
+
+    if word_count > 200 and columns is not None:
+        results['emotional_arc'] = _arc(detector, emotions, columns, len(stratum_lengths))
+    return results
+
+
+def _arc(detector, emotions, columns, strata):
+    """
+    One arc point per stratum, from the sentences sampled there
+    """
+    arc = []
+    for stratum in range(strata):
+        members = columns['strata'] == stratum
+        counts = columns['weights'][members] @ columns['emotions'][members]
+        emotion_data = detector.emotion_from_scores(dict(zip(emotions, counts.tolist())))
+        arc.append({
+            'position': stratum / strata,
+            'chunk_number': stratum + 1,
+            'primary_emotion': emotion_data['primary_emotion'],
+            'emotions': emotion_data['all_emotions'],
+            'sampled_sentences': int(members.sum())
+        })
+    return arc
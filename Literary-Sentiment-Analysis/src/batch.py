@@ -0,0 +1,189 @@
+"""
+Parallel corpus analysis with a resumable manifest
+Each worker process builds one LiteraryTextAnalyzer and reuses it for every file
+"""
+import glob
+import json
+import os
+import sys
+import time
+from functools import partial
+from multiprocessing import Pool
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.sentence_results import json_default, json_default_columnar
+from src.serialization import JSONLinesWriter
+from src.text_analyzer import LiteraryTextAnalyzer
+
+
+_worker_analyzer = None
+
+
+def _init_worker(sentiment_model_paths=None, emotion_detector=None, sentiment_backend='keras'):
+    """
+    Load models once per worker process
+    sentiment_model_paths: load_model arguments of a saved sentiment model
+    (LiterarySentimentAnalyzer.model_paths)
+    emotion_detector: detector to use instead of the default lexicon
+    sentiment_backend: 'keras' or 'numpy' (see LiterarySentimentAnalyzer)
+    """
+    global _worker_analyzer
+    _worker_analyzer = LiteraryTextAnalyzer(cache_size=0)
+    _worker_analyzer.sentiment_analyzer.backend = sentiment_backend
+    if sentiment_model_paths:
+        _worker_analyzer.sentiment_analyzer.load_model(*sentiment_model_paths)
+    if emotion_detector is not None:
+        _worker_analyzer.emotion_detector = emotion_detector
+
+
+def _analyze_path(path, text_type=None):
+    """
+    Analyze one file in a worker; errors are reported instead of raised
+    text_type: text type for every file (None detects it from the extension)
+    """
+    start = time.perf_counter()
+    try:
+        text, detected_type = _worker_analyzer.read_file(path)
+        text_type = text_type or detected_type
+        # Compact sentence results (smaller to send back); the writer's
+        # default hook picks the output layout
+        results = _worker_analyzer.analyze_complete(text, text_type=text_type, use_cache=False, compact=True)
+        error = None
+    except Exception as e:
+        results = None
+        error = f"{type(e).__name__}: {e}"
+
+    return path, results, error, time.perf_counter() - start
+
+
+def _compare_chunk(chunk):
+    """
+    Compare one (texts, labels) chunk in a worker
+    """
+    texts, labels = chunk
+    return _worker_analyzer._compare_chunk(texts, labels)
+
+
+def collect_files(directory=None, pattern=None, extensions=('.txt', '.poem')):
+    """
+    List files to analyze from a directory (recursive) and/or a glob pattern
+    """
+    paths = []
+
+    if directory:
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if os.path.splitext(name)[1].lower() in extensions:
+                    paths.append(os.path.join(root, name))
+
+    if pattern:
+        paths.extend(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+    return sorted(set(paths))
+
+
+def _read_manifest(manifest_path):
+    """
+    Returns: (files analyzed successfully, output size recorded by the last
+    entry or None)
+    """
+    completed = set()
+    output_end = None
+    if not os.path.exists(manifest_path):
+        return completed, output_end
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # partially written line from an interrupted run
+            if entry.get('status') == 'done':
+                completed.add(entry['file'])
+            output_end = entry.get('output_end', output_end)
+
+    return completed, output_end
+
+
+def load_manifest(manifest_path):
+    """
+    Return the set of files already analyzed successfully
+    """
+    return _read_manifest(manifest_path)[0]
+
+
+def run_batch(paths, output_path, manifest_path=None, workers=None, chunksize=4, compact=False,
+              text_type=None, analyzer=None):
+    """
+    Analyze files across a process pool, streaming results to JSONL
+    output_path: JSONL file, one {"file", "elapsed", "results"} record per file
+    manifest_path: resumable manifest; files marked done are skipped on rerun
+    (every entry records the output size after it, and output written after
+    the last entry by an interrupted run is truncated, so records are never
+    duplicated)
+    workers: number of worker processes (defaults to the CPU count)
+    compact: write per-sentence results in the columnar layout
+    text_type: text type for every file (None detects it from the extension)
+    analyzer: LiteraryTextAnalyzer whose models the workers load (its
+    sentiment model must have been saved or loaded from disk)
+    Returns: throughput summary
+    """
+    initargs = ()
+    if analyzer is not None:
+        sentiment = analyzer.sentiment_analyzer
+        if sentiment.has_model and sentiment.model_paths is None:
+            raise ValueError("Worker processes load the sentiment model from disk: "
+                             "save it (save_model or save_bundle) and load it first")
+        initargs = (sentiment.model_paths, analyzer.emotion_detector, sentiment.backend)
+
+    manifest_path = manifest_path or f"{output_path}.manifest"
+    completed, output_end = _read_manifest(manifest_path)
+    pending = [path for path in paths if path not in completed]
+
+    if output_end is not None and os.path.exists(output_path) and os.path.getsize(output_path) > output_end:
+        os.truncate(output_path, output_end)
+
+    print(f"{len(paths)} files found, {len(completed)} already done, {len(pending)} to analyze")
+
+    summary = {'files': 0, 'errors': 0, 'words': 0, 'file_seconds': 0.0}
+    start = time.perf_counter()
+
+    if pending:
+        with open(output_path, 'a', encoding='utf-8') as output, \
+                open(manifest_path, 'a', encoding='utf-8') as manifest, \
+                Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            writer = JSONLinesWriter(output, default=json_default_columnar if compact else json_default)
+            if output_end is None:
+                # Where this run's output starts, for truncation on resume
+                manifest.write(json.dumps({'status': 'started', 'output_end': output.tell()}) + '\n')
+                manifest.flush()
+
+            analyze = partial(_analyze_path, text_type=text_type)
+            for path, results, error, elapsed in pool.imap_unordered(analyze, pending, chunksize):
+                if error is None:
+                    writer.write({'file': path, 'elapsed': elapsed, 'results': results})
+                    summary['files'] += 1
+                    summary['words'] += results['features']['word_count']
+                    status = 'done'
+                    print(f"  ✓ {path} ({elapsed:.2f}s)")
+                else:
+                    summary['errors'] += 1
+                    status = 'error'
+                    print(f"  ✗ {path}: {error}")
+
+                summary['file_seconds'] += elapsed
+                manifest.write(json.dumps({'file': path, 'status': status, 'elapsed': elapsed, 'error': error,
+                                           'output_end': output.tell()}) + '\n')
+                manifest.flush()
+
+    wall = time.perf_counter() - start
+    summary['wall_seconds'] = wall
+    summary['files_per_second'] = summary['files'] / wall if wall > 0 else 0
+    summary['words_per_second'] = summary['words'] / wall if wall > 0 else 0
+
+    print(f"\n✓ Analyzed {summary['files']} files ({summary['errors']} errors) in {wall:.1f}s")
+    print(f"  • Throughput: {summary['files_per_second']:.2f} files/s, {summary['words_per_second']:.0f} words/s")
+    print(f"  • Results: {output_path}")
+    print(f"  • Manifest: {manifest_path}")
+
+    return summary
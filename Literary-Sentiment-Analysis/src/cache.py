@@ -0,0 +1,196 @@
+"""
+Caches for analysis results
+LRUCache is a thread-safe in-memory cache with size-based eviction
+ResultCache adds an optional on-disk tier of gzipped JSON (never pickles, so
+a shared cache directory cannot run code)
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from src.sentence_results import SentenceResults, json_default
+
+
+# Marks a serialized SentenceResults (holding its text) in cached JSON
+SENTENCE_RESULTS_KEY = '__sentence_results__'
+
+
+class LRUCache:
+    def __init__(self, max_size, sizeof=None):
+        """
+        max_size: eviction threshold, measured with sizeof
+        sizeof: function giving the size of a value (defaults to 1 per entry)
+        """
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_size:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.size += size
+
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Hit/miss counters and current occupancy
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'size': self.size,
+            'max_size': self.max_size
+        }
+
+
+class ResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, directory=None):
+        """
+        max_bytes: memory budget for the in-memory LRU tier
+        directory: optional directory for the on-disk tier
+        """
+        self.memory = LRUCache(max_bytes, sizeof=len)
+        self.directory = directory
+        self.disk_hits = 0
+        self.misses = 0
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(text, *parts):
+        """
+        Content-addressed key from the text hash plus any version parts
+        """
+        digest = hashlib.sha256(text.encode('utf-8'))
+        for part in parts:
+            digest.update(b'\0' + str(part).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Return a fresh copy of the cached value, or None on a miss
+        Values come back as JSON types (tuples as lists); unreadable disk
+        entries are deleted and count as misses
+        """
+        payload = self.memory.get(key)
+        value = None
+
+        if payload is not None:
+            value = _decode(payload)
+        elif self.directory:
+            value = self._read(key)
+
+        if value is None:
+            self.misses += 1
+        return value
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rb') as f:
+                payload = f.read()
+            value = _decode(payload)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, zlib.error):
+            # Truncated or corrupt entry (e.g. a crash mid-write elsewhere)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        self.memory.put(key, payload)
+        self.disk_hits += 1
+        return value
+
+    def put(self, key, value):
+        payload = json.dumps(value, default=_encode).encode('utf-8')
+        self.memory.put(key, payload)
+
+        if self.directory:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+    def clear(self):
+        """
+        Drop every entry from both tiers
+        """
+        self.memory.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith(('.json.gz', '.pkl.gz')):
+                    os.remove(os.path.join(self.directory, name))
+
+    def stats(self):
+        memory = self.memory.stats()
+        return {
+            'memory_hits': memory['hits'],
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'entries': memory['entries'],
+            'bytes': memory['size'],
+            'max_bytes': memory['max_size']
+        }
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+
+def _encode(obj):
+    if isinstance(obj, SentenceResults):
+        return {SENTENCE_RESULTS_KEY: obj.text, **obj.to_columnar()}
+    return json_default(obj)
+
+
+def _restore(obj):
+    if SENTENCE_RESULTS_KEY in obj:
+        return SentenceResults(obj[SENTENCE_RESULTS_KEY], obj['start'], obj['end'], obj['label'],
+                               obj['confidence'])
+    return obj
+
+
+def _decode(payload):
+    return json.loads(payload, object_hook=_restore)
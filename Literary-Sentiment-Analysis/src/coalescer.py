@@ -0,0 +1,130 @@
+"""
+Micro-batching request coalescer
+Concurrent callers submit lists of texts; a single background worker merges
+them into shared model batches and hands each caller its own results
+"""
+import queue
+import threading
+import time
+
+
+# Seconds between checks that the worker is still alive while waiting
+WORKER_CHECK_INTERVAL = 1.0
+
+
+class _Request:
+    def __init__(self, texts):
+        self.texts = texts
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchCoalescer:
+    def __init__(self, predict_batch, max_batch_size=512, max_wait_ms=5.0, timeout=None):
+        """
+        predict_batch: function mapping a list of texts to a list of results
+        max_batch_size: stop collecting once this many texts are queued
+        max_wait_ms: how long the first request waits for others to join
+        timeout: seconds a caller waits for its results before TimeoutError
+        (None waits as long as the worker is alive)
+        """
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='batch-coalescer', daemon=True)
+        self._worker.start()
+
+    def predict(self, texts):
+        """
+        Submit texts and block until their results are ready
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+
+        self._check_worker()
+        request = _Request(texts)
+        self._queue.put(request)
+
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not request.done.wait(WORKER_CHECK_INTERVAL if deadline is None else
+                                    min(WORKER_CHECK_INTERVAL, max(deadline - time.monotonic(), 0))):
+            self._check_worker()
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"No batch results after {self.timeout}s")
+
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def _check_worker(self):
+        if not self._worker.is_alive():
+            raise RuntimeError("The batch coalescer worker has stopped")
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'texts': self.texts,
+            'avg_batch_size': self.texts / self.batches if self.batches else 0
+        }
+
+    def _collect(self):
+        """
+        Wait for one request, then gather more until the batch is full or
+        max_wait has passed
+        """
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._collect()
+                self._process(batch)
+            except BaseException as e:
+                # Fail the batch rather than leave its callers waiting; anything
+                # beyond an Exception (SystemExit, ...) also stops the worker,
+                # and later callers get a RuntimeError from _check_worker
+                for request in batch:
+                    if not request.done.is_set():
+                        request.error = e
+                        request.done.set()
+                if not isinstance(e, Exception):
+                    raise
+
+    def _process(self, batch):
+        texts = [text for request in batch for text in request.texts]
+        results = self.predict_batch(texts)
+
+        self.batches += 1
+        self.requests += len(batch)
+        self.texts += len(texts)
+
+        start = 0
+        for request in batch:
+            end = start + len(request.texts)
+            request.results = results[start:end]
+            request.done.set()
+            start = end
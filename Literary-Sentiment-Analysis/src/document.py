@@ -0,0 +1,95 @@
+"""
+Shared tokenized document so every analysis stage reuses one tokenization pass
+"""
+from functools import cached_property
+from nltk.tokenize import word_tokenize, sent_tokenize
+
+
+class Document:
+    def __init__(self, text):
+        self.text = text
+
+    @classmethod
+    def of(cls, text):
+        """
+        Wrap raw text in a Document (Documents are returned unchanged)
+        """
+        if isinstance(text, cls):
+            return text
+        return cls(text)
+
+    def __len__(self):
+        return len(self.text)
+
+    def __str__(self):
+        return self.text
+
+    @cached_property
+    def lower(self):
+        """
+        Lowercase form of the text
+        """
+        return self.text.lower()
+
+    @cached_property
+    def sentences(self):
+        """
+        Sentences as produced by sent_tokenize
+        """
+        return sent_tokenize(self.text)
+
+    @cached_property
+    def sentence_words(self):
+        """
+        Word tokens for each sentence
+        """
+        return [word_tokenize(sentence, preserve_line=True)
+                for sentence in self.sentences]
+
+    @cached_property
+    def words(self):
+        """
+        Word tokens for the whole text (same as word_tokenize(text))
+        """
+        return [word for sentence in self.sentence_words for word in sentence]
+
+    @cached_property
+    def sentence_spans(self):
+        """
+        (start, end) character offsets of each sentence in the text
+        """
+        return _align(self.text, self.sentences, max_gap=1000)
+
+    @cached_property
+    def word_spans(self):
+        """
+        (start, end) character offsets of each word token in the text
+        Tokens rewritten by the tokenizer (e.g. quotes) get an empty span
+        """
+        return _align(self.text, self.words, max_gap=100)
+
+    @cached_property
+    def lines(self):
+        """
+        Raw lines of the text (including blank lines)
+        """
+        return self.text.split('\n')
+
+
+def _align(text, pieces, max_gap):
+    """
+    Locate each piece in the text, scanning forward from the previous match
+    max_gap bounds the search so unmatched pieces do not rescan the text
+    """
+    spans = []
+    cursor = 0
+
+    for piece in pieces:
+        start = text.find(piece, cursor, cursor + len(piece) + max_gap)
+        if start < 0:
+            spans.append((cursor, cursor))
+            continue
+        cursor = start + len(piece)
+        spans.append((start, cursor))
+
+    return spans
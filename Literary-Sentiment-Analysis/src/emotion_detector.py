@@ -1,22 +1,103 @@
 """
 Emotion detection using machine learning
 Detects emotions like joy, sadness, anger, fear, surprise
+scikit-learn and TextBlob are imported only by the stages that need them
 """
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
+import hashlib
+import itertools
 import pickle
 import os
-from textblob import TextBlob
+import sys
+import uuid
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.document import Document
+from src.keyword_matcher import KeywordMatcher, normalize_keyword
+from src.model_bundle import (BUNDLED_CLASSIFIERS, BundledForest, BundledLinearClassifier,
+                              BundledTfidfVectorizer, ModelBundle, is_bundle, save_bundle)
 
 
 class EmotionDetector:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=5000, ngram_range=(1, 3))
-        self.classifier = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.emotion_keywords = self._load_emotion_keywords()
+    def __init__(self, emotion_keywords=None, mode='keywords', model_weight=0.5, n_jobs=None):
+        """
+        emotion_keywords: optional custom lexicon (emotion -> keywords)
+        replacing the built-in literary lexicon (an empty dict means no
+        keywords, e.g. for a classifier-only hybrid detector)
+        mode: 'keywords' (lexicon counts only) or 'hybrid' (blend keyword
+        scores with the trained classifier's predict_proba; keyword scores
+        are used alone until a classifier is trained or loaded)
+        model_weight: share of the classifier probabilities in hybrid scores
+        n_jobs: parallel forest evaluation (sklearn semantics, -1 = all cores),
+        applied per prediction call; a classifier's own n_jobs takes precedence
+        """
+        if mode not in ('keywords', 'hybrid'):
+            raise ValueError(f"Unknown emotion mode: {mode}")
+        
+        self.mode = mode
+        self.model_weight = model_weight
+        self.n_jobs = n_jobs
+        self._vectorizer = None
+        self._classifier = None
+        self.model_version = None
+        lexicon = self._load_emotion_keywords() if emotion_keywords is None else emotion_keywords
+        self.emotion_keywords = {k: list(v) for k, v in lexicon.items()}
+        self.matcher = KeywordMatcher(self.emotion_keywords)
+    
+    @property
+    def vectorizer(self):
+        """
+        TF-IDF vectorizer, created on first use
+        """
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._vectorizer = TfidfVectorizer(max_features=5000, ngram_range=(1, 3))
+        return self._vectorizer
+    
+    @vectorizer.setter
+    def vectorizer(self, vectorizer):
+        self._vectorizer = vectorizer
+    
+    @property
+    def uses_classifier(self):
+        """
+        True when predictions blend in the trained classifier
+        """
+        return self.mode == 'hybrid' and hasattr(self._classifier, 'classes_')
+    
+    @property
+    def emotions(self):
+        """
+        Emotions predictions can contain: the lexicon's, plus any extra
+        classes of the classifier in hybrid mode
+        """
+        emotions = list(self.matcher.emotions)
+        if self.uses_classifier:
+            emotions += [str(name) for name in self.classifier.classes_ if str(name) not in emotions]
+        return emotions
+    
+    @property
+    def cache_version(self):
+        """
+        Everything besides the lexicon that changes predictions
+        """
+        if not self.uses_classifier:
+            return 'keywords'
+        return f"hybrid-{self.model_weight}-{self.model_version}"
+    
+    @property
+    def classifier(self):
+        """
+        Random forest classifier, created on first use
+        """
+        if self._classifier is None:
+            from sklearn.ensemble import RandomForestClassifier
+            self._classifier = RandomForestClassifier(n_estimators=100, random_state=42)
+        return self._classifier
+    
+    @classifier.setter
+    def classifier(self, classifier):
+        self._classifier = classifier
         
     def _load_emotion_keywords(self):
         """
@@ -52,12 +133,43 @@ class EmotionDetector:
                     'courage', 'strength', 'persevere', 'possibility']
         }
     
+    def add_emotion_keywords(self, emotion, keywords):
+        """
+        Extend the lexicon at runtime (creates the emotion if needed)
+        """
+        keywords = list(keywords)
+        self.matcher.add_keywords(emotion, keywords)
+        existing = self.emotion_keywords.setdefault(emotion, [])
+        existing.extend(k for k in keywords if k not in existing)
+    
+    def remove_emotion_keywords(self, emotion, keywords):
+        """
+        Remove keywords from the lexicon at runtime (matched like the
+        matcher matches them); an emotion left without keywords is dropped
+        """
+        removed = {normalize_keyword(keyword) for keyword in keywords}
+        self.matcher.remove_keywords(emotion, removed)
+        if emotion in self.emotion_keywords:
+            kept = [k for k in self.emotion_keywords[emotion] if normalize_keyword(k) not in removed]
+            if kept:
+                self.emotion_keywords[emotion] = kept
+            else:
+                del self.emotion_keywords[emotion]
+    
     def train(self, texts, labels):
         """
         Train the emotion classifier
         texts: list of text samples
         labels: list of emotion labels
         """
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import classification_report
+        
+        # Models loaded from a bundle are inference-only; start from fresh ones
+        if not hasattr(self.vectorizer, 'fit_transform'):
+            self.vectorizer = None
+            self.classifier = None
+        
         # Vectorize texts
         X = self.vectorizer.fit_transform(texts)
         
@@ -69,6 +181,8 @@ class EmotionDetector:
         # Train classifier
         self.classifier.fit(X_train, y_train)
         
+        self.model_version = f"trained-{uuid.uuid4().hex}"
+        
         # Evaluate
         y_pred = self.classifier.predict(X_test)
         print("Emotion Detection Model Performance:")
@@ -76,18 +190,119 @@ class EmotionDetector:
         
         return self.classifier.score(X_test, y_test)
     
+    def train_streaming(self, paths, **options):
+        """
+        Train out of core from labelled JSONL/CSV shards (see
+        StreamingEmotionTrainer for the options: features, learner, n_jobs, ...)
+        paths: shard files, directories or glob patterns
+        Returns: report with example counts, metrics and per-phase timing/memory
+        """
+        from src.emotion_training import StreamingEmotionTrainer, format_phases
+        
+        trainer = StreamingEmotionTrainer(**options)
+        self.vectorizer, self.classifier, report = trainer.fit(paths)
+        self.model_version = f"trained-{uuid.uuid4().hex}"
+        
+        print(f"Emotion model trained on {report['train_examples']} examples "
+              f"({report['n_features']} {report['features']} features, {report['learner']} learner)")
+        if report['metrics'] is not None:
+            print("Emotion Detection Model Performance:")
+            print(report['metrics']['text'])
+        print(format_phases(report['phases']))
+        
+        return report
+    
     def predict_emotion(self, text):
         """
-        Predict emotion from text using keyword matching and ML
+        Predict emotion from text using keyword matching and, in hybrid mode,
+        the trained classifier. Keywords count as whole words or inflections
+        ("smiled", "mourning"), never inside other words ("made", "courage")
+        text: raw string or Document
+        """
+        return self.predict_emotion_batch([text])[0]
+    
+    def predict_emotion_batch(self, texts, batch_size=256):
+        """
+        Predict emotions for many texts; in hybrid mode each batch of
+        batch_size texts goes through one transform and one predict_proba
+        Returns: list of results in the same order as texts
+        """
+        docs = [Document.of(text) for text in texts]
+        
+        # Keyword-based emotion scores (single word-level pass per text)
+        keyword_scores = [self.matcher.score(doc.text) for doc in docs]
+        if not self.uses_classifier:
+            return [self.emotion_from_scores(scores) for scores in keyword_scores]
+        
+        emotions = self.matcher.emotions
+        counts = np.array([[scores[emotion] for emotion in emotions] for scores in keyword_scores],
+                          dtype=np.float64).reshape(len(docs), len(emotions))
+        names, blended = self._blend_batches(counts, (doc.text for doc in docs), batch_size)
+        return [self.emotion_from_scores(dict(zip(names, row))) for row in blended.tolist()]
+    
+    def _model_probabilities(self, texts):
+        """
+        One transform and one predict_proba for a batch of texts
+        Returns: (class names, probabilities shaped texts x classes)
+        """
+        classifier = self.classifier
+        X = self.vectorizer.transform(texts)
+        
+        # n_jobs is passed per call: the classifier may be shared
+        if self.n_jobs is None:
+            probabilities = classifier.predict_proba(X)
+        elif isinstance(classifier, BundledForest):
+            probabilities = classifier.predict_proba(X, n_jobs=self.n_jobs)
+        else:
+            from joblib import parallel_config
+            with parallel_config(n_jobs=self.n_jobs):
+                probabilities = classifier.predict_proba(X)
+        return [str(name) for name in classifier.classes_], np.asarray(probabilities, dtype=np.float64)
+    
+    def _blend_batches(self, counts, texts, batch_size=256):
+        """
+        _blend over consecutive batches of batch_size texts, so features are
+        only ever held for one batch (a bundled vectorizer's are dense)
+        texts: iterable of texts matching the rows of counts, read lazily
+        Returns: (emotion names, blended distributions shaped texts x names)
+        """
+        texts = iter(texts)
+        blocks = []
+        for start in range(0, len(counts), batch_size):
+            batch = list(itertools.islice(texts, batch_size))
+            names, blended = self._blend(counts[start:start + len(batch)], batch)
+            blocks.append(blended)
+        
+        if not blocks:
+            return self.emotions, np.zeros((0, len(self.emotions)))
+        return names, np.concatenate(blocks)
+    
+    def _blend(self, counts, texts):
+        """
+        Blend keyword counts (texts x lexicon emotions) with classifier
+        probabilities; texts without keyword hits use the classifier alone
+        Returns: (emotion names, blended distributions shaped texts x names)
         """
-        # Keyword-based emotion scores
-        keyword_scores = {}
-        text_lower = text.lower()
+        emotions = self.matcher.emotions
+        classes, probabilities = self._model_probabilities(texts)
+        names = list(emotions) + [name for name in classes if name not in emotions]
+        column = {name: i for i, name in enumerate(names)}
+        
+        model = np.zeros((len(texts), len(names)))
+        model[:, [column[name] for name in classes]] = probabilities
         
-        for emotion, keywords in self.emotion_keywords.items():
-            score = sum(text_lower.count(keyword) for keyword in keywords)
-            keyword_scores[emotion] = score
+        keyword = np.zeros_like(model)
+        totals = counts.sum(axis=1, keepdims=True)
+        keyword[:, :len(emotions)] = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
         
+        weight = self.model_weight
+        blended = np.where(totals > 0, (1 - weight) * keyword + weight * model, model)
+        return names, blended
+    
+    def emotion_from_scores(self, keyword_scores):
+        """
+        Turn raw keyword counts (emotion -> hits) into an emotion prediction
+        """
         # Normalize scores
         total_score = sum(keyword_scores.values())
         if total_score > 0:
@@ -95,9 +310,9 @@ class EmotionDetector:
         else:
             keyword_probs = {k: 0 for k in keyword_scores.keys()}
         
-        # Get primary emotion
-        primary_emotion = max(keyword_probs, key=keyword_probs.get)
-        confidence = keyword_probs[primary_emotion]
+        # Get primary emotion (none with an empty lexicon)
+        primary_emotion = max(keyword_probs, key=keyword_probs.get) if keyword_probs else None
+        confidence = keyword_probs[primary_emotion] if keyword_probs else 0
         
         # Get secondary emotions (those with score > 0)
         secondary_emotions = {k: v for k, v in keyword_probs.items() 
@@ -110,27 +325,103 @@ class EmotionDetector:
             'secondary_emotions': secondary_emotions
         }
     
-    def analyze_emotional_arc(self, text, chunk_size=100):
+    def analyze_emotional_arc(self, text, chunk_size=100, step=None):
         """
         Analyze how emotions change throughout the text
         Useful for tracking emotional journey in stories and poems
+        text: raw string or Document
+        step: words between chunk starts (smaller than chunk_size for
+        overlapping, sliding windows)
+        """
+        return self._analyze_arcs([Document.of(text)], (chunk_size,), step)[0][1][chunk_size]
+    
+    def analyze_emotional_arcs(self, text, chunk_sizes=(50, 100, 500), step=None):
+        """
+        Emotional arcs at several resolutions from a single keyword pass
+        (and, in hybrid mode, shared classifier batches)
+        Returns: dict mapping chunk size -> arc
+        """
+        return self._analyze_arcs([Document.of(text)], chunk_sizes, step)[0][1]
+    
+    def analyze_emotional_arc_batch(self, texts, chunk_size=100, step=None, batch_size=256):
+        """
+        Emotional arcs for many texts; in hybrid mode the chunks of all texts
+        go through the classifier together, batch_size chunks at a time
+        """
+        docs = [Document.of(text) for text in texts]
+        return [arcs[chunk_size] for _, arcs in self._analyze_arcs(docs, (chunk_size,), step,
+                                                                   batch_size=batch_size)]
+    
+    def analyze_document(self, text, chunk_size=100, step=None):
+        """
+        Whole-text emotion and emotional arc together; in hybrid mode the
+        text and all of its chunks share classifier batches
+        Returns: (predict_emotion result, arc)
+        """
+        emotion, arcs = self._analyze_arcs([Document.of(text)], (chunk_size,), step, whole_text=True)[0]
+        return emotion, arcs[chunk_size]
+    
+    def _analyze_arcs(self, docs, chunk_sizes, step, whole_text=False, batch_size=256):
+        """
+        Arcs for each chunk size (plus the whole-text emotion if requested)
+        of every document, from one keyword pass per document; in hybrid
+        mode all chunks are blended in batches of batch_size texts
+        Returns: list of (emotion or None, dict of chunk size -> arc)
         """
-        from nltk.tokenize import word_tokenize
+        emotions = self.matcher.emotions
+        plans = []
+        for doc in docs:
+            prefix = self.matcher.prefix_counts(doc.words)
+            plans.append({size: self.matcher.window_scores(prefix, size, step) for size in chunk_sizes})
         
-        words = word_tokenize(text)
-        chunks = []
+        if not self.uses_classifier:
+            return [(self.predict_emotion(doc) if whole_text else None,
+                     {size: self._arc_from_rows(emotions, scores.tolist())
+                      for size, (_, _, scores) in windows.items()})
+                    for doc, windows in zip(docs, plans)]
         
-        # Split into chunks
-        for i in range(0, len(words), chunk_size):
-            chunk = ' '.join(words[i:i + chunk_size])
-            chunks.append(chunk)
+        # Chunk texts are joined lazily, one classifier batch at a time
+        def texts():
+            for doc, windows in zip(docs, plans):
+                words = doc.words
+                for starts, ends, _ in windows.values():
+                    for start, end in zip(starts, ends):
+                        yield ' '.join(words[start:end])
+                if whole_text:
+                    yield doc.text
         
-        # Analyze each chunk
+        counts = []
+        for doc, windows in zip(docs, plans):
+            counts.extend(scores for _, _, scores in windows.values())
+            if whole_text:
+                whole = self.matcher.score(doc.text)
+                counts.append(np.array([[whole[emotion] for emotion in emotions]]).reshape(1, len(emotions)))
+        counts = np.concatenate(counts).astype(np.float64) if counts else np.zeros((0, len(emotions)))
+        names, blended = self._blend_batches(counts, texts(), batch_size)
+        
+        results = []
+        offset = 0
+        for windows in plans:
+            arcs = {}
+            for size, (_, _, scores) in windows.items():
+                arcs[size] = self._arc_from_rows(names, blended[offset:offset + len(scores)].tolist())
+                offset += len(scores)
+            emotion = None
+            if whole_text:
+                emotion = self.emotion_from_scores(dict(zip(names, blended[offset].tolist())))
+                offset += 1
+            results.append((emotion, arcs))
+        return results
+    
+    def _arc_from_rows(self, emotions, rows):
+        """
+        Build arc points from per-chunk emotion scores
+        """
         emotional_arc = []
-        for i, chunk in enumerate(chunks):
-            emotion_data = self.predict_emotion(chunk)
+        for i, row in enumerate(rows):
+            emotion_data = self.emotion_from_scores(dict(zip(emotions, row)))
             emotional_arc.append({
-                'position': i / len(chunks),  # Normalized position (0 to 1)
+                'position': i / len(rows),  # Normalized position (0 to 1)
                 'chunk_number': i + 1,
                 'primary_emotion': emotion_data['primary_emotion'],
                 'emotions': emotion_data['all_emotions']
@@ -141,10 +432,24 @@ class EmotionDetector:
     def get_dominant_emotions(self, text, top_n=3):
         """
         Get the top N dominant emotions in the text
+        text: raw string or Document
         """
         result = self.predict_emotion(text)
+        return self.rank_emotions(result['all_emotions'], top_n)
+    
+    def get_dominant_emotions_batch(self, texts, top_n=3, batch_size=256):
+        """
+        Top N dominant emotions for many texts, predicted in batches
+        """
+        return [self.rank_emotions(result['all_emotions'], top_n)
+                for result in self.predict_emotion_batch(texts, batch_size)]
+    
+    def rank_emotions(self, all_emotions, top_n=3):
+        """
+        Sort an emotion -> score mapping and keep the top N
+        """
         sorted_emotions = sorted(
-            result['all_emotions'].items(),
+            all_emotions.items(),
             key=lambda x: x[1],
             reverse=True
         )
@@ -154,8 +459,11 @@ class EmotionDetector:
     def analyze_subjectivity(self, text):
         """
         Analyze subjectivity and polarity using TextBlob
+        text: raw string or Document
         """
-        blob = TextBlob(text)
+        from textblob import TextBlob
+        
+        blob = TextBlob(Document.of(text).text)
         
         return {
             'subjectivity': blob.sentiment.subjectivity,  # 0 = objective, 1 = subjective
@@ -194,17 +502,71 @@ class EmotionDetector:
     def load_model(self, model_path='models/emotion_model.pkl',
                    vectorizer_path='models/emotion_vectorizer.pkl'):
         """
-        Load pre-trained model and vectorizer
+        Load pre-trained model and vectorizer (model_path may also be a bundle
+        directory written by save_bundle)
         """
+        if is_bundle(model_path):
+            return self.load_bundle(model_path)
+        
+        digest = hashlib.sha256()
+        
         if os.path.exists(model_path):
             with open(model_path, 'rb') as f:
-                self.classifier = pickle.load(f)
+                data = f.read()
+            self.classifier = pickle.loads(data)
+            digest.update(data)
             print(f"Emotion model loaded from {model_path}")
         
         if os.path.exists(vectorizer_path):
             with open(vectorizer_path, 'rb') as f:
-                self.vectorizer = pickle.load(f)
+                data = f.read()
+            self.vectorizer = pickle.loads(data)
+            digest.update(data)
             print(f"Vectorizer loaded from {vectorizer_path}")
+        
+        if self._classifier is not None:
+            self.model_version = f"pickle-{digest.hexdigest()}"
+    
+    def save_bundle(self, directory='models/emotion_bundle'):
+        """
+        Save the trained vectorizer and classifier as a model bundle
+        (TF-IDF vocabulary and IDF weights, forest node arrays)
+        Returns: the bundle manifest
+        """
+        if self._classifier is None or not hasattr(self._classifier, 'classes_'):
+            raise ValueError("Train the emotion classifier before bundling it")
+        
+        if not hasattr(self.vectorizer, 'vocabulary_'):
+            raise ValueError("Only vocabulary-based vectorizers can be bundled (not hashing features)")
+        
+        linear = hasattr(self.classifier, 'coef_') or isinstance(self.classifier, BundledLinearClassifier)
+        classifier_type = 'linear' if linear else 'forest'
+        vectorizer_arrays, vectorizer_config = BundledTfidfVectorizer.export(self.vectorizer)
+        classifier_arrays, classifier_config = BUNDLED_CLASSIFIERS[classifier_type].export(self.classifier)
+        arrays = {f"tfidf_{name}": array for name, array in vectorizer_arrays.items()}
+        arrays.update({f"{classifier_type}_{name}": array for name, array in classifier_arrays.items()})
+        
+        manifest = save_bundle(directory, 'emotion', arrays, {
+            'vectorizer': vectorizer_config,
+            'classifier': classifier_config,
+            'classifier_type': classifier_type
+        })
+        print(f"Emotion model bundle saved to {directory}")
+        return manifest
+    
+    def load_bundle(self, directory='models/emotion_bundle', mmap=True, verify=False):
+        """
+        Load a bundle written by save_bundle; the vectorizer and classifier
+        are NumPy-only stand-ins reading the memory-mapped arrays
+        verify: re-hash the array files against the manifest
+        """
+        bundle = ModelBundle.load(directory, kind='emotion', mmap=mmap, verify=verify)
+        self.vectorizer = BundledTfidfVectorizer.from_bundle(bundle.arrays('tfidf_'), bundle.config['vectorizer'])
+        classifier_type = bundle.config.get('classifier_type', 'forest')
+        self.classifier = BUNDLED_CLASSIFIERS[classifier_type].from_bundle(
+            bundle.arrays(f"{classifier_type}_"), bundle.config['classifier'])
+        self.model_version = f"bundle-{bundle.checksum}"
+        print(f"Emotion model bundle loaded from {directory}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,288 @@
+"""
+Out-of-core training for the emotion classifier
+Labelled examples are streamed from JSONL/CSV shards in batches, so the
+corpus never has to fit in memory. Features come from a bounded TF-IDF
+vocabulary chosen in a first counting pass (or from a stateless hashing
+vectorizer). The classifier is either an SGD logistic regression updated with
+partial_fit batch by batch, or a random forest fitted in parallel on the
+sparse features. Every phase is timed, with its peak memory traced in this
+process and, when batches run in worker processes, the workers' peak RSS
+"""
+from collections import Counter
+
+import numpy as np
+
+from src.instrumentation import Instrumentation
+from src.shards import is_holdout, iter_batches, iter_examples, parallel_map, worker_state
+
+
+def _count_terms(batch):
+    """
+    Term and document frequencies of the training texts in one batch
+    """
+    analyzer = worker_state['analyzer']
+    test_fraction = worker_state['test_fraction']
+    term_counts = Counter()
+    document_counts = Counter()
+    documents = 0
+
+    texts, labels = batch
+    for text in texts:
+        if is_holdout(text, test_fraction):
+            continue
+        terms = analyzer(text)
+        term_counts.update(terms)
+        document_counts.update(set(terms))
+        documents += 1
+
+    return term_counts, document_counts, Counter(labels), len(texts), documents
+
+
+def _vectorize_batch(batch):
+    """
+    Feature rows of one batch, split into training and held-out examples
+    """
+    vectorizer = worker_state['vectorizer']
+    test_fraction = worker_state['test_fraction']
+
+    texts, labels = batch
+    holdout = np.fromiter((is_holdout(text, test_fraction) for text in texts), bool, len(texts))
+    X = vectorizer.transform(texts)
+    labels = np.asarray(labels)
+    return X[~holdout], labels[~holdout], X[holdout], labels[holdout]
+
+
+class StreamingEmotionTrainer:
+    def __init__(self, features='vocabulary', max_features=5000, ngram_range=(1, 3),
+                 n_features=2 ** 18, max_candidates=None, learner='sgd', epochs=1,
+                 batch_size=2000, n_jobs=None, test_fraction=0.2, max_test_examples=20000,
+                 text_field='text', label_field='label', instrumentation=None, random_state=42):
+        """
+        features: 'vocabulary' (two passes: count terms, then train on a
+        TF-IDF vectorizer restricted to the max_features most frequent terms;
+        can be bundled) or 'hashing' (HashingVectorizer with n_features columns)
+        max_candidates: terms kept while counting (default 20 x max_features,
+        at least 2 x max_features); the rarest half is dropped whenever the
+        count table outgrows it
+        learner: 'sgd' (incremental logistic regression, one partial_fit per
+        batch) or 'forest' (random forest fitted with n_jobs on the sparse rows)
+        epochs: passes over the shards for the SGD learner
+        n_jobs: worker processes for tokenizing and vectorizing batches (and
+        forest fitting); None or 1 runs in this process, -1 uses every CPU
+        test_fraction: share of examples held out for evaluation
+        max_test_examples: held-out examples kept for the evaluation
+        instrumentation: Instrumentation receiving the phase records (one
+        that traces memory is created by default)
+        """
+        if features not in ('vocabulary', 'hashing'):
+            raise ValueError(f"Unknown feature mode: {features}")
+        if learner not in ('sgd', 'forest'):
+            raise ValueError(f"Unknown learner: {learner}")
+
+        self.features = features
+        self.max_features = max_features
+        self.ngram_range = tuple(ngram_range)
+        self.n_features = n_features
+        self.max_candidates = max(max_candidates or 20 * max_features, 2 * max_features)
+        self.learner = learner
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.n_jobs = n_jobs
+        self.test_fraction = test_fraction
+        self.max_test_examples = max_test_examples
+        self.text_field = text_field
+        self.label_field = label_field
+        self.instrumentation = instrumentation or Instrumentation(trace_memory=True)
+        self.random_state = random_state
+
+    def _batches(self, paths, stats=None):
+        examples = iter_examples(paths, self.text_field, self.label_field, stats)
+        return iter_batches(examples, self.batch_size)
+
+    def fit(self, paths):
+        """
+        Train on every shard under paths
+        Returns: (vectorizer, classifier, report) where report holds example
+        counts, classes, evaluation metrics and one timing record per phase
+        """
+        phases = []
+        span = self.instrumentation.span
+        stats = {'skipped': 0}
+
+        # Pass 1: classes, example counts and (for a vocabulary) term counts
+        with span('scan', phases) as stage:
+            scan = self._scan(paths, stats, stage.extra)
+            stage.tokens = scan['examples']
+        if not scan['classes']:
+            raise ValueError("No labelled examples found in the training shards")
+
+        with span('vocabulary', phases) as stage:
+            vectorizer = self._build_vectorizer(scan)
+            stage.tokens = self._feature_count(vectorizer)
+
+        # Pass 2 (one per epoch): vectorize batches and fit the learner
+        with span('fit', phases) as stage:
+            classifier, X_test, y_test, train_examples = self._fit(paths, vectorizer, scan['classes'],
+                                                                   stage.extra)
+            stage.tokens = train_examples
+
+        with span('evaluate', phases) as stage:
+            metrics = self._evaluate(classifier, X_test, y_test)
+            stage.tokens = len(y_test)
+
+        report = {
+            'examples': scan['examples'],
+            'train_examples': train_examples,
+            'test_examples': len(y_test),
+            'skipped': stats['skipped'],
+            'classes': {label: scan['classes'][label] for label in sorted(scan['classes'])},
+            'features': self.features,
+            'n_features': self._feature_count(vectorizer),
+            'learner': self.learner,
+            'metrics': metrics,
+            'phases': phases
+        }
+        return vectorizer, classifier, report
+
+    def _feature_count(self, vectorizer):
+        vocabulary = getattr(vectorizer, 'vocabulary_', None)
+        return len(vocabulary) if vocabulary is not None else self.n_features
+
+    def _scan(self, paths, stats, pool_stats):
+        term_counts = Counter()
+        document_counts = Counter()
+        classes = Counter()
+        examples = 0
+        documents = 0
+
+        if self.features == 'vocabulary':
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            analyzer = TfidfVectorizer(ngram_range=self.ngram_range).build_analyzer()
+            state = {'analyzer': analyzer, 'test_fraction': self.test_fraction}
+
+            for batch_terms, batch_documents, batch_classes, count, training in parallel_map(
+                    _count_terms, self._batches(paths, stats), self.n_jobs, state, pool_stats):
+                term_counts.update(batch_terms)
+                document_counts.update(batch_documents)
+                classes.update(batch_classes)
+                examples += count
+                documents += training
+
+                # Bound the count table: keep the most frequent half of the
+                # candidates (their document counts stay exact in practice)
+                if len(term_counts) > self.max_candidates:
+                    kept = dict(term_counts.most_common(self.max_candidates // 2))
+                    term_counts = Counter(kept)
+                    document_counts = Counter({term: document_counts[term] for term in kept})
+        else:
+            for _, labels in self._batches(paths, stats):
+                classes.update(labels)
+                examples += len(labels)
+
+        return {
+            'examples': examples,
+            'documents': documents,
+            'classes': classes,
+            'term_counts': term_counts,
+            'document_counts': document_counts
+        }
+
+    def _build_vectorizer(self, scan):
+        if self.features == 'hashing':
+            from sklearn.feature_extraction.text import HashingVectorizer
+            return HashingVectorizer(n_features=self.n_features, ngram_range=self.ngram_range,
+                                     alternate_sign=False)
+
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        # Most frequent terms (ties by term), in sklearn's alphabetical column order
+        term_counts = scan['term_counts']
+        top = sorted(term_counts, key=lambda term: (-term_counts[term], term))[:self.max_features]
+        if not top:
+            raise ValueError("The training shards contain no word tokens")
+        terms = sorted(top)
+
+        # Smoothed IDF over the training documents, as TfidfVectorizer computes it
+        documents = scan['documents']
+        frequencies = np.array([scan['document_counts'][term] for term in terms], dtype=np.float64)
+
+        vectorizer = TfidfVectorizer(ngram_range=self.ngram_range,
+                                     vocabulary={term: column for column, term in enumerate(terms)})
+        vectorizer.idf_ = np.log((1 + documents) / (1 + frequencies)) + 1
+        return vectorizer
+
+    def _fit(self, paths, vectorizer, classes, pool_stats):
+        from scipy import sparse
+
+        state = {'vectorizer': vectorizer, 'test_fraction': self.test_fraction}
+        X_test, y_test = [], []
+        test_rows = 0
+        train_examples = 0
+
+        if self.learner == 'sgd':
+            from sklearn.linear_model import SGDClassifier
+            classifier = SGDClassifier(loss='log_loss', alpha=1e-5, random_state=self.random_state)
+            labels = np.array(sorted(classes))
+
+            for epoch in range(self.epochs):
+                batches = parallel_map(_vectorize_batch, self._batches(paths), self.n_jobs, state, pool_stats)
+                for X, y, X_held, y_held in batches:
+                    if len(y):
+                        classifier.partial_fit(X, y, classes=labels)
+                    if epoch == 0:
+                        train_examples += len(y)
+                        if test_rows < self.max_test_examples and len(y_held):
+                            X_test.append(X_held)
+                            y_test.append(y_held)
+                            test_rows += len(y_held)
+        else:
+            from sklearn.ensemble import RandomForestClassifier
+            X_train, y_train = [], []
+
+            batches = parallel_map(_vectorize_batch, self._batches(paths), self.n_jobs, state, pool_stats)
+            for X, y, X_held, y_held in batches:
+                X_train.append(X)
+                y_train.append(y)
+                train_examples += len(y)
+                if test_rows < self.max_test_examples and len(y_held):
+                    X_test.append(X_held)
+                    y_test.append(y_held)
+                    test_rows += len(y_held)
+
+            classifier = RandomForestClassifier(n_estimators=100, random_state=self.random_state,
+                                                n_jobs=self.n_jobs)
+            classifier.fit(sparse.vstack(X_train).tocsr(), np.concatenate(y_train))
+
+        if X_test:
+            X_test = sparse.vstack(X_test).tocsr()[:self.max_test_examples]
+            y_test = np.concatenate(y_test)[:self.max_test_examples]
+        else:
+            y_test = np.array([])
+        return classifier, X_test, y_test, train_examples
+
+    def _evaluate(self, classifier, X_test, y_test):
+        if not len(y_test):
+            return None
+
+        from sklearn.metrics import classification_report
+        predictions = classifier.predict(X_test)
+        metrics = classification_report(y_test, predictions, output_dict=True, zero_division=0)
+        metrics['text'] = classification_report(y_test, predictions, zero_division=0)
+        return metrics
+
+
+def format_phases(phases):
+    """
+    One line per phase: wall time, CPU time (of this process), items
+    processed, peak traced memory of this process and peak worker RSS
+    """
+    lines = []
+    for record in phases:
+        line = (f"  {record['stage']:<12}{record['wall_time']:>9.2f}s wall"
+                f"{record['cpu_time']:>9.2f}s cpu{record['tokens']:>10} items")
+        if 'peak_memory' in record:
+            line += f"{record['peak_memory'] / 2 ** 20:>9.1f} MB parent peak"
+        if 'worker_peak_rss' in record:
+            line += f"{record['worker_peak_rss'] / 2 ** 20:>9.1f} MB worker RSS"
+        lines.append(line)
+    return "\n".join(lines)
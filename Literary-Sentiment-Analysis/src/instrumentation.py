@@ -0,0 +1,139 @@
+"""
+Per-stage timing instrumentation for the analysis pipeline
+Stages run inside spans that record wall time, CPU time, token counts and
+(optionally) peak memory; hooks receive every record and running totals can
+be exported in the Prometheus text format
+"""
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Span:
+    def __init__(self, stage):
+        self.stage = stage
+        self.tokens = 0
+        self.extra = {}
+        self.overlapped = False
+        self.thread = threading.get_ident()
+
+
+class Instrumentation:
+    def __init__(self, trace_memory=False):
+        """
+        trace_memory: record peak allocation per stage with tracemalloc
+        (adds noticeable overhead, so it is off by default). tracemalloc's
+        peak is process-wide, so this is meant for single-threaded use:
+        a stage that overlaps a traced stage on another thread, or encloses
+        a nested one, gets no 'peak_memory'. Tracing started here is
+        stopped once no traced stage is running
+        """
+        self.trace_memory = trace_memory
+        self.hooks = []
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._traced = []
+        self._started_tracing = False
+
+    def add_hook(self, hook):
+        """
+        Register a callback called with each finished stage record
+        """
+        self.hooks.append(hook)
+
+    @contextmanager
+    def span(self, stage, records=None):
+        """
+        Time a stage; set span.tokens inside the block to record its size
+        (and span.extra to add fields to the record)
+        records: optional list the finished record is appended to
+        """
+        span = Span(stage)
+        if self.trace_memory:
+            self._start_tracing(span)
+            memory_start = tracemalloc.get_traced_memory()[0]
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield span
+        finally:
+            record = {
+                'stage': stage,
+                'wall_time': time.perf_counter() - wall_start,
+                'cpu_time': time.process_time() - cpu_start,
+                'tokens': span.tokens,
+                **span.extra
+            }
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - memory_start
+                if self._stop_tracing(span):
+                    record['peak_memory'] = peak
+
+            if records is not None:
+                records.append(record)
+            self._add(record)
+            for hook in self.hooks:
+                hook(record)
+
+    def _start_tracing(self, span):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            # Resetting the peak invalidates the peaks of running stages, and
+            # stages on other threads allocate into this one's peak
+            for running in self._traced:
+                running.overlapped = True
+            span.overlapped = any(running.thread != span.thread for running in self._traced)
+            self._traced.append(span)
+            tracemalloc.reset_peak()
+
+    def _stop_tracing(self, span):
+        """
+        Returns: whether the span's peak is its own
+        """
+        with self._lock:
+            self._traced.remove(span)
+            if not self._traced and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+            return not span.overlapped
+
+    def _add(self, record):
+        with self._lock:
+            totals = self.totals.setdefault(record['stage'], {
+                'calls': 0, 'wall_time': 0.0, 'cpu_time': 0.0, 'tokens': 0
+            })
+            totals['calls'] += 1
+            totals['wall_time'] += record['wall_time']
+            totals['cpu_time'] += record['cpu_time']
+            totals['tokens'] += record['tokens']
+
+    def prometheus(self, prefix='literary_analysis', extra_counters=None):
+        """
+        Stage totals (plus any extra name -> value counters) as Prometheus text
+        """
+        metrics = [
+            ('stage_calls_total', 'calls', 'Number of times each analysis stage ran'),
+            ('stage_wall_seconds_total', 'wall_time', 'Wall-clock seconds spent in each stage'),
+            ('stage_cpu_seconds_total', 'cpu_time', 'CPU seconds spent in each stage'),
+            ('stage_tokens_total', 'tokens', 'Word tokens processed by each stage'),
+        ]
+
+        with self._lock:
+            totals = {stage: dict(values) for stage, values in self.totals.items()}
+
+        lines = []
+        for name, field, help_text in metrics:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for stage, values in sorted(totals.items()):
+                lines.append(f'{prefix}_{name}{{stage="{stage}"}} {values[field]}')
+
+        for name, value in (extra_counters or {}).items():
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"{prefix}_{name} {value}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,198 @@
+"""
+Compiled keyword matcher for lexicon-based emotion scoring
+Scores every emotion in a single pass over the text
+"""
+import hashlib
+import re
+
+import numpy as np
+
+
+WORD_PATTERN = re.compile(r'[^\W\d_]+')
+
+# Endings that make a word an inflection or derivation of the keyword it
+# starts with ("smiled", "mourning", "darkness"); a word that merely contains
+# a keyword ("made", "courage", "hopeless") does not match
+INFLECTION_SUFFIXES = ('s', 'es', 'd', 'ed', 'ing', 'ly', 'er', 'est', 'en', 'ened', 'ful', 'fully', 'ness')
+
+
+def normalize_keyword(keyword):
+    """
+    The lowercase word a keyword matches (keywords must be single words)
+    """
+    words = WORD_PATTERN.findall(keyword.lower())
+    if len(words) != 1:
+        raise ValueError(f"Keyword must be a single word: {keyword!r}")
+    return words[0]
+
+
+class KeywordMatcher:
+    def __init__(self, lexicon=None):
+        """
+        lexicon: dict mapping emotion -> list of keywords
+        """
+        self.emotions = []
+        self.index = {}
+        self._stems = {}
+        self._fingerprint = None
+        self._compiled = None
+        if lexicon:
+            for emotion, keywords in lexicon.items():
+                self.add_keywords(emotion, keywords)
+
+    def add_keywords(self, emotion, keywords):
+        """
+        Register keywords for an emotion (creates the emotion if needed)
+        Keywords match whole words, case-insensitively, and their
+        inflections (the keyword followed by one of INFLECTION_SUFFIXES)
+        """
+        if emotion not in self.emotions:
+            self.emotions.append(emotion)
+
+        for keyword in keywords:
+            emotions = self.index.setdefault(normalize_keyword(keyword), [])
+            if emotion not in emotions:
+                emotions.append(emotion)
+
+        self._changed()
+
+    def remove_keywords(self, emotion, keywords):
+        """
+        Unregister keywords for an emotion (normalized like add_keywords);
+        an emotion left without keywords is dropped
+        """
+        for keyword in keywords:
+            word = normalize_keyword(keyword)
+            emotions = self.index.get(word, [])
+            if emotion in emotions:
+                emotions.remove(emotion)
+                if not emotions:
+                    del self.index[word]
+
+        if emotion in self.emotions and not any(emotion in emotions for emotions in self.index.values()):
+            self.emotions.remove(emotion)
+
+        self._changed()
+
+    def _changed(self):
+        self._stems = {}
+        self._fingerprint = None
+        self._compiled = None
+
+    def keyword_for(self, token):
+        """
+        The keyword a lowercase token matches: the token itself, or the
+        keyword it inflects (None if neither is in the lexicon)
+        """
+        if token in self.index:
+            return token
+        stems = self._stems
+        if token not in stems:
+            stems[token] = next((token[:-len(suffix)] for suffix in INFLECTION_SUFFIXES
+                                 if token.endswith(suffix) and token[:-len(suffix)] in self.index), None)
+        return stems[token]
+
+    @property
+    def fingerprint(self):
+        """
+        Content hash of the lexicon, usable as a cache version key
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha1(','.join(self.emotions).encode('utf-8'))
+            for word in sorted(self.index):
+                digest.update(f"{word}:{','.join(sorted(self.index[word]))};".encode('utf-8'))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def tokenize(self, text):
+        """
+        Split text into lowercase word tokens
+        """
+        return WORD_PATTERN.findall(text.lower())
+
+    def score_tokens(self, tokens):
+        """
+        Count keyword hits per emotion for already lowercased tokens
+        """
+        scores = dict.fromkeys(self.emotions, 0)
+        index = self.index
+        keyword_for = self.keyword_for
+
+        for token in tokens:
+            emotions = index.get(token) or index.get(keyword_for(token))
+            if emotions:
+                for emotion in emotions:
+                    scores[emotion] += 1
+
+        return scores
+
+    def score(self, text):
+        """
+        Count keyword hits per emotion in a single pass over the text
+        """
+        return self.score_tokens(self.tokenize(text))
+
+    def compile(self):
+        """
+        Lexicon as a matrix: row ids for each keyword and a keyword x emotion
+        matrix of 0/1 memberships (rebuilt only after the lexicon changes)
+        """
+        if self._compiled is None:
+            words = sorted(self.index)
+            row_ids = {word: row for row, word in enumerate(words)}
+            matrix = np.zeros((len(words), len(self.emotions)), dtype=np.int64)
+            columns = {emotion: column for column, emotion in enumerate(self.emotions)}
+            for word, emotions in self.index.items():
+                for emotion in emotions:
+                    matrix[row_ids[word], columns[emotion]] = 1
+            self._compiled = (row_ids, matrix)
+        return self._compiled
+
+    def prefix_counts(self, words):
+        """
+        Cumulative keyword hits per emotion over a list of word tokens
+        Row i holds the hits in words[:i], so the scores of any window
+        [start, end) are prefix[end] - prefix[start]
+        """
+        row_ids, matrix = self.compile()
+        positions = []
+        rows = []
+
+        keyword_for = self.keyword_for
+
+        for position, word in enumerate(words):
+            word = word.lower()
+            row = row_ids.get(word)
+            if row is None and word.isalpha():
+                row = row_ids.get(keyword_for(word))
+            if row is not None:
+                positions.append(position)
+                rows.append(row)
+            elif not word.isalpha():
+                for part in WORD_PATTERN.findall(word):
+                    row = row_ids.get(keyword_for(part))
+                    if row is not None:
+                        positions.append(position)
+                        rows.append(row)
+
+        prefix = np.zeros((len(words) + 1, len(self.emotions)), dtype=np.int64)
+        if rows:
+            np.add.at(prefix, np.array(positions) + 1, matrix[np.array(rows)])
+        return np.cumsum(prefix, axis=0, out=prefix)
+
+    def window_scores(self, prefix, window, step=None):
+        """
+        Keyword hits per emotion for windows of `window` words every `step`
+        words (step defaults to window, i.e. non-overlapping chunks)
+        Returns: (starts, ends, scores) with scores shaped windows x emotions
+        """
+        total = len(prefix) - 1
+        step = step or window
+
+        if step >= window:
+            starts = np.arange(0, total, step)
+        else:
+            starts = np.arange(0, max(total - window, 0) + 1, step)
+        ends = np.minimum(starts + window, total)
+
+        return starts, ends, prefix[ends] - prefix[starts]
@@ -0,0 +1,585 @@
+"""
+Versioned model bundles: a directory of .npy arrays plus a manifest.json
+Arrays are opened with np.load(mmap_mode='r'), so loading takes milliseconds
+and worker processes reading the same bundle share its pages through the OS
+page cache. The manifest records a SHA-256 per array and an overall checksum
+that caches can key on.
+
+Also provides NumPy-only stand-ins for the pickled preprocessing and
+classification objects (Keras Tokenizer, TfidfVectorizer,
+RandomForestClassifier, SGDClassifier) that read their state from a bundle
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+
+BUNDLE_FORMAT = 'literary-model-bundle'
+BUNDLE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+# Arrays are named like identifiers so they map directly to file names
+ARRAY_NAME = re.compile(r'^[A-Za-z0-9_]+$')
+
+
+def is_bundle(path):
+    """
+    True if path is a bundle directory
+    """
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _bundle_checksum(kind, config, arrays):
+    # Covers everything that affects predictions, but not the creation time
+    payload = json.dumps({
+        'format': BUNDLE_FORMAT,
+        'format_version': BUNDLE_VERSION,
+        'kind': kind,
+        'config': config,
+        'arrays': {name: entry['sha256'] for name, entry in arrays.items()}
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _replace(directory, name, write):
+    # Write to a temporary file and rename it into place: processes that
+    # still have the old file mapped keep reading the old contents
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, os.path.join(directory, name))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def save_bundle(directory, kind, arrays, config=None):
+    """
+    Write a bundle
+    kind: what the bundle holds ('sentiment', 'emotion', ...)
+    arrays: name -> NumPy array (no object arrays)
+    config: JSON-serializable settings needed to rebuild the model
+    Returns: the manifest
+    """
+    os.makedirs(directory, exist_ok=True)
+    config = config or {}
+    entries = {}
+
+    for name, array in arrays.items():
+        if not ARRAY_NAME.match(name):
+            raise ValueError(f"Invalid array name: {name!r}")
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            raise ValueError(f"Array {name!r} has dtype object and cannot be memory-mapped")
+
+        filename = f"{name}.npy"
+        _replace(directory, filename, lambda f: np.save(f, array, allow_pickle=False))
+        entries[name] = {
+            'file': filename,
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'sha256': _sha256(os.path.join(directory, filename))
+        }
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'format_version': BUNDLE_VERSION,
+        'kind': kind,
+        'created': datetime.now().isoformat(),
+        'checksum': _bundle_checksum(kind, config, entries),
+        'config': config,
+        'arrays': entries
+    }
+
+    # The manifest goes last, so a bundle is never seen half written
+    _replace(directory, MANIFEST_NAME,
+             lambda f: f.write(json.dumps(manifest, indent=2).encode('utf-8')))
+    return manifest
+
+
+class ModelBundle:
+    def __init__(self, directory, manifest, mmap=True):
+        self.directory = directory
+        self.manifest = manifest
+        self.mmap = mmap
+        self._arrays = {}
+
+    @classmethod
+    def load(cls, directory, kind=None, mmap=True, verify=False):
+        """
+        Open a bundle; arrays are mapped lazily on first access
+        kind: expected bundle kind (ValueError if it differs)
+        mmap: memory-map arrays instead of reading them into memory
+        verify: check every array file against its manifest checksum
+        """
+        with open(os.path.join(directory, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        if manifest.get('format') != BUNDLE_FORMAT:
+            raise ValueError(f"{directory} is not a model bundle")
+        if manifest.get('format_version', 0) > BUNDLE_VERSION:
+            raise ValueError(f"Bundle format version {manifest['format_version']} is newer "
+                             f"than this version supports ({BUNDLE_VERSION})")
+        if kind is not None and manifest['kind'] != kind:
+            raise ValueError(f"Expected a {kind} bundle, found {manifest['kind']}")
+
+        bundle = cls(directory, manifest, mmap=mmap)
+        if verify:
+            bundle.verify()
+        return bundle
+
+    @property
+    def kind(self):
+        return self.manifest['kind']
+
+    @property
+    def config(self):
+        return self.manifest['config']
+
+    @property
+    def checksum(self):
+        return self.manifest['checksum']
+
+    @property
+    def names(self):
+        return list(self.manifest['arrays'])
+
+    def arrays(self, prefix=''):
+        """
+        Arrays whose names start with prefix, keyed without it
+        """
+        return {name[len(prefix):]: self[name] for name in self.names if name.startswith(prefix)}
+
+    def __contains__(self, name):
+        return name in self.manifest['arrays']
+
+    def __getitem__(self, name):
+        if name not in self._arrays:
+            entry = self.manifest['arrays'][name]
+            self._arrays[name] = np.load(
+                os.path.join(self.directory, entry['file']),
+                mmap_mode='r' if self.mmap else None,
+                allow_pickle=False
+            )
+        return self._arrays[name]
+
+    def verify(self):
+        """
+        Re-hash every array file; ValueError on any mismatch
+        """
+        entries = self.manifest['arrays']
+        for name, entry in entries.items():
+            if _sha256(os.path.join(self.directory, entry['file'])) != entry['sha256']:
+                raise ValueError(f"Checksum mismatch for {name} in {self.directory}")
+        if _bundle_checksum(self.kind, self.config, entries) != self.checksum:
+            raise ValueError(f"Manifest checksum mismatch in {self.directory}")
+
+
+class VocabularyTokenizer:
+    def __init__(self, words, num_words=None, oov_index=None, lower=True,
+                 filters='!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n', split=' '):
+        """
+        Drop-in for Keras Tokenizer.texts_to_sequences without TensorFlow
+        words: vocabulary in index order (words[0] has index 1)
+        """
+        self.words = words
+        self.num_words = num_words
+        self.oov_index = oov_index
+        self.lower = lower
+        self.filters = filters
+        self.split = split
+        self.word_index = {str(word): index for index, word in enumerate(words, 1)}
+
+        if len(split) == 1:
+            # Runs of filter/split characters separate words, like
+            # text_to_word_sequence's translate + split + drop empties
+            self._pattern = re.compile(f"[^{re.escape(filters + split)}]+")
+        else:
+            self._pattern = None
+            self._translation = str.maketrans({char: split for char in filters})
+
+    @classmethod
+    def export(cls, tokenizer):
+        """
+        Vocabulary arrays and config for a fitted Keras Tokenizer (or a
+        VocabularyTokenizer)
+        Returns: (arrays, config)
+        """
+        if isinstance(tokenizer, cls):
+            return {'vocabulary': np.asarray(tokenizer.words)}, {
+                'num_words': tokenizer.num_words, 'oov_index': tokenizer.oov_index,
+                'lower': tokenizer.lower, 'filters': tokenizer.filters, 'split': tokenizer.split
+            }
+        if tokenizer.char_level or getattr(tokenizer, 'analyzer', None) is not None:
+            raise ValueError("Only word-level tokenizers without a custom analyzer can be bundled")
+
+        words = sorted(tokenizer.word_index, key=tokenizer.word_index.get)
+        if tokenizer.num_words:
+            words = words[:tokenizer.num_words - 1]
+
+        arrays = {'vocabulary': np.array(words, dtype=str)}
+        config = {
+            'num_words': tokenizer.num_words,
+            'oov_index': tokenizer.word_index.get(tokenizer.oov_token) if tokenizer.oov_token else None,
+            'lower': tokenizer.lower,
+            'filters': tokenizer.filters,
+            'split': tokenizer.split
+        }
+        return arrays, config
+
+    @classmethod
+    def from_bundle(cls, arrays, config):
+        """
+        arrays: the bundle (or a mapping of its arrays)
+        """
+        return cls(arrays['vocabulary'], **config)
+
+    def _words(self, text):
+        if self.lower:
+            text = text.lower()
+        if self._pattern is not None:
+            return self._pattern.findall(text)
+        return [word for word in text.translate(self._translation).split(self.split) if word]
+
+    def texts_to_sequences(self, texts):
+        """
+        Word index sequences, identical to Keras Tokenizer.texts_to_sequences
+        """
+        word_index = self.word_index
+        num_words = self.num_words
+        oov_index = self.oov_index
+        sequences = []
+
+        for text in texts:
+            sequence = []
+            for word in self._words(text):
+                index = word_index.get(word)
+                if index is not None and not (num_words and index >= num_words):
+                    sequence.append(index)
+                elif oov_index is not None:
+                    sequence.append(oov_index)
+            sequences.append(sequence)
+
+        return sequences
+
+
+class BundledTfidfVectorizer:
+    def __init__(self, terms, idf, lowercase=True, token_pattern=r"(?u)\b\w\w+\b",
+                 ngram_range=(1, 1), stop_words=None, norm='l2', sublinear_tf=False,
+                 binary=False, use_idf=True):
+        """
+        Drop-in for a fitted word-analyzer TfidfVectorizer's transform
+        terms: vocabulary in column order; idf: IDF weight per column
+        """
+        self.terms = terms
+        self.idf = idf
+        self.lowercase = lowercase
+        self.token_pattern = re.compile(token_pattern)
+        self.ngram_range = tuple(ngram_range)
+        self.stop_words = frozenset(stop_words) if stop_words else None
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+        self.binary = binary
+        self.use_idf = use_idf
+        self.vocabulary_ = {str(term): column for column, term in enumerate(terms)}
+
+    @classmethod
+    def export(cls, vectorizer):
+        """
+        Vocabulary/IDF arrays and config for a fitted TfidfVectorizer (or a
+        BundledTfidfVectorizer)
+        Returns: (arrays, config)
+        """
+        if isinstance(vectorizer, cls):
+            arrays = {'terms': np.asarray(vectorizer.terms)}
+            if vectorizer.use_idf:
+                arrays['idf'] = np.asarray(vectorizer.idf)
+            return arrays, {
+                'lowercase': vectorizer.lowercase,
+                'token_pattern': vectorizer.token_pattern.pattern,
+                'ngram_range': list(vectorizer.ngram_range),
+                'stop_words': sorted(vectorizer.stop_words) if vectorizer.stop_words else None,
+                'norm': vectorizer.norm,
+                'sublinear_tf': vectorizer.sublinear_tf,
+                'binary': vectorizer.binary,
+                'use_idf': vectorizer.use_idf
+            }
+        if (vectorizer.analyzer != 'word' or vectorizer.tokenizer is not None or
+                vectorizer.preprocessor is not None or vectorizer.strip_accents is not None):
+            raise ValueError("Only word analyzers with the default tokenizer, preprocessor "
+                             "and no accent stripping can be bundled")
+
+        vocabulary = vectorizer.vocabulary_
+        terms = sorted(vocabulary, key=vocabulary.get)
+        stop_words = vectorizer.get_stop_words()
+
+        arrays = {'terms': np.array(terms, dtype=str)}
+        if vectorizer.use_idf:
+            arrays['idf'] = np.asarray(vectorizer.idf_, dtype=np.float64)
+        config = {
+            'lowercase': vectorizer.lowercase,
+            'token_pattern': vectorizer.token_pattern,
+            'ngram_range': list(vectorizer.ngram_range),
+            'stop_words': sorted(stop_words) if stop_words else None,
+            'norm': vectorizer.norm,
+            'sublinear_tf': vectorizer.sublinear_tf,
+            'binary': vectorizer.binary,
+            'use_idf': vectorizer.use_idf
+        }
+        return arrays, config
+
+    @classmethod
+    def from_bundle(cls, arrays, config):
+        """
+        arrays: the bundle (or a mapping of its arrays)
+        """
+        idf = arrays['idf'] if config.get('use_idf', True) else None
+        return cls(arrays['terms'], idf, **config)
+
+    def _analyze(self, text):
+        # Same steps as sklearn's word analyzer: preprocess, tokenize,
+        # drop stop words, then add n-grams
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_pattern.findall(text)
+        if self.stop_words is not None:
+            tokens = [token for token in tokens if token not in self.stop_words]
+
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            terms.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def transform(self, texts):
+        """
+        Dense TF-IDF matrix (n_texts, n_terms), matching sklearn's transform
+        """
+        vocabulary = self.vocabulary_
+        matrix = np.zeros((len(texts), len(vocabulary)))
+
+        for row, text in enumerate(texts):
+            counts = Counter(vocabulary[term] for term in self._analyze(text) if term in vocabulary)
+            if counts:
+                columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                matrix[row, columns] = list(counts.values())
+
+        if self.binary:
+            np.minimum(matrix, 1, out=matrix)
+        if self.sublinear_tf:
+            counted = matrix > 0
+            matrix[counted] = np.log(matrix[counted]) + 1
+        if self.use_idf:
+            matrix *= self.idf
+        if self.norm is not None:
+            norms = (np.abs(matrix).sum(axis=1) if self.norm == 'l1'
+                     else np.sqrt((matrix * matrix).sum(axis=1)))
+            np.divide(matrix, norms[:, None], out=matrix, where=norms[:, None] > 0)
+        return matrix
+
+
+class BundledForest:
+    def __init__(self, classes, roots, children_left, children_right, feature, threshold,
+                 probabilities, max_depth, n_jobs=None):
+        """
+        Drop-in for a fitted RandomForestClassifier's predict/predict_proba
+        All trees share flat node arrays; roots holds each tree's first node
+        and leaves point to themselves
+        n_jobs: threads evaluating groups of trees (like the forest's n_jobs)
+        """
+        self.classes_ = classes
+        self.roots = roots
+        self.children_left = children_left
+        self.children_right = children_right
+        self.feature = feature
+        self.threshold = threshold
+        self.probabilities = probabilities
+        self.max_depth = max_depth
+        self.n_jobs = n_jobs
+
+    @classmethod
+    def export(cls, forest):
+        """
+        Node arrays and config for a fitted RandomForestClassifier (or a
+        BundledForest)
+        Returns: (arrays, config)
+        """
+        if isinstance(forest, cls):
+            names = ('classes', 'roots', 'children_left', 'children_right',
+                     'feature', 'threshold', 'probabilities')
+            return {name: np.asarray(getattr(forest, name if name != 'classes' else 'classes_'))
+                    for name in names}, {'max_depth': forest.max_depth}
+        if forest.n_outputs_ != 1:
+            raise ValueError("Only single-output forests can be bundled")
+
+        roots, left, right, feature, threshold, probabilities = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+
+            roots.append(offset)
+            left.append(np.where(leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(leaf, nodes, tree.children_right) + offset)
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+
+            # Per-node class distribution, normalized like DecisionTree.predict_proba
+            values = tree.value[:, 0, :].astype(np.float64)
+            totals = values.sum(axis=1, keepdims=True)
+            probabilities.append(values / np.where(totals == 0, 1.0, totals))
+
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        arrays = {
+            'classes': np.asarray(forest.classes_),
+            'roots': np.array(roots, dtype=np.int64),
+            'children_left': np.concatenate(left).astype(np.int64),
+            'children_right': np.concatenate(right).astype(np.int64),
+            'feature': np.concatenate(feature).astype(np.int64),
+            'threshold': np.concatenate(threshold).astype(np.float64),
+            'probabilities': np.concatenate(probabilities)
+        }
+        if arrays['classes'].dtype == object:
+            arrays['classes'] = arrays['classes'].astype(str)
+        return arrays, {'max_depth': int(max_depth)}
+
+    @classmethod
+    def from_bundle(cls, arrays, config):
+        """
+        arrays: the bundle (or a mapping of its arrays)
+        """
+        return cls(arrays['classes'], arrays['roots'], arrays['children_left'],
+                   arrays['children_right'], arrays['feature'], arrays['threshold'],
+                   arrays['probabilities'], config['max_depth'])
+
+    def predict_proba(self, X, n_jobs=None):
+        """
+        Mean class probabilities over all trees
+        X: dense (n_samples, n_features) array (sparse input is densified)
+        n_jobs: threads for this call when the forest's own n_jobs is None
+        """
+        if hasattr(X, 'toarray'):
+            X = X.toarray()
+        # sklearn compares float32 features against the split thresholds
+        X = np.asarray(X, dtype=np.float32)
+
+        n_jobs = self.n_jobs if self.n_jobs is not None else n_jobs
+        jobs = n_jobs if n_jobs and n_jobs > 0 else os.cpu_count() if n_jobs == -1 else 1
+        groups = [group for group in np.array_split(np.asarray(self.roots), jobs) if len(group)]
+        if len(groups) == 1:
+            return self._tree_probabilities(X, groups[0]) / len(self.roots)
+
+        with ThreadPoolExecutor(len(groups)) as executor:
+            totals = list(executor.map(lambda group: self._tree_probabilities(X, group), groups))
+        return np.sum(totals, axis=0) / len(self.roots)
+
+    def _tree_probabilities(self, X, roots):
+        """
+        Sum of the class probabilities of the trees starting at roots
+        """
+        # Walk every (sample, tree) pair down one level per step, dropping
+        # pairs from the active set once they reach a leaf
+        samples = np.repeat(np.arange(len(X)), len(roots))
+        nodes = np.tile(roots, len(X))
+        active = np.arange(len(nodes))
+
+        for _ in range(self.max_depth):
+            current = nodes[active]
+            go_left = X[samples[active], self.feature[current]] <= self.threshold[current]
+            following = np.where(go_left, self.children_left[current], self.children_right[current])
+            nodes[active] = following
+            active = active[following != current]
+            if not len(active):
+                break
+
+        return self.probabilities[nodes.reshape(len(X), len(roots))].sum(axis=1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class BundledLinearClassifier:
+    def __init__(self, classes, coef, intercept):
+        """
+        Drop-in for a fitted logistic-loss SGDClassifier's predict/predict_proba
+        coef: (classes, features), or (1, features) for two classes
+        """
+        self.classes_ = classes
+        self.coef = coef
+        self.intercept = intercept
+
+    @classmethod
+    def export(cls, classifier):
+        """
+        Weight arrays and config for a fitted SGDClassifier with loss='log_loss'
+        (or a BundledLinearClassifier)
+        Returns: (arrays, config)
+        """
+        if isinstance(classifier, cls):
+            return {'classes': np.asarray(classifier.classes_), 'coef': np.asarray(classifier.coef),
+                    'intercept': np.asarray(classifier.intercept)}, {}
+        if getattr(classifier, 'loss', None) != 'log_loss':
+            raise ValueError("Only logistic-loss linear classifiers can be bundled")
+
+        arrays = {
+            'classes': np.asarray(classifier.classes_),
+            'coef': np.asarray(classifier.coef_, dtype=np.float64),
+            'intercept': np.asarray(classifier.intercept_, dtype=np.float64)
+        }
+        if arrays['classes'].dtype == object:
+            arrays['classes'] = arrays['classes'].astype(str)
+        return arrays, {}
+
+    @classmethod
+    def from_bundle(cls, arrays, config):
+        """
+        arrays: the bundle (or a mapping of its arrays)
+        """
+        return cls(arrays['classes'], arrays['coef'], arrays['intercept'])
+
+    def predict_proba(self, X):
+        """
+        One-vs-rest logistic probabilities normalized per row, as sklearn does
+        """
+        scores = np.asarray(X) @ np.asarray(self.coef).T + self.intercept
+        probabilities = 1.0 / (1.0 + np.exp(-scores))
+        if probabilities.shape[1] == 1:
+            return np.hstack([1 - probabilities, probabilities])
+
+        totals = probabilities.sum(axis=1, keepdims=True)
+        return np.divide(probabilities, totals, out=np.full_like(probabilities, 1 / probabilities.shape[1]),
+                         where=totals > 0)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+# Classifier types an emotion bundle can hold (config 'classifier_type')
+BUNDLED_CLASSIFIERS = {
+    'forest': BundledForest,
+    'linear': BundledLinearClassifier,
+}
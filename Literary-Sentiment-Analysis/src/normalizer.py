@@ -0,0 +1,53 @@
+"""
+Precompiled text normalizer used by TextPreprocessor.clean_text
+Typographic characters are replaced and disallowed characters removed in a
+single pass of one precompiled pattern, then whitespace is collapsed with
+split/join
+"""
+import re
+
+
+# Curly quotes, dashes and ellipses found in literary texts
+# (unicode spaces need no entry: split() already treats them as whitespace)
+TYPOGRAPHIC_TRANSLATIONS = {
+    '“': '"', '”': '"', '„': '"', '‟': '"',
+    '‘': "'", '’': "'", '‚': "'", '‛': "'",
+    '′': "'", '″': '"',
+    '‐': '-', '‑': '-', '‒': '-', '–': '-', '—': '-', '―': '-',
+    '…': '...',
+}
+
+# Punctuation kept alongside word characters and whitespace (it carries sentiment)
+ALLOWED_PUNCTUATION = ".,!?;:'-"
+
+
+class TextNormalizer:
+    def __init__(self, translations=None, allowed=ALLOWED_PUNCTUATION):
+        """
+        translations: extra character -> replacement mappings
+        allowed: punctuation kept in the output; everything else that is not
+        a word character or whitespace is removed
+        """
+        mapping = dict(TYPOGRAPHIC_TRANSLATIONS)
+        mapping.update(translations or {})
+
+        # Replacements are filtered up front, so e.g. curly double quotes
+        # normalize to '"' and are then dropped like straight ones
+        disallowed = re.compile(rf"[^\w\s{re.escape(allowed)}]+")
+        self.replacements = {char: disallowed.sub('', value) for char, value in mapping.items()}
+
+        # str.translate walks a dict per character on non-ASCII text, which is
+        # far slower than one regex scan that only stops at rare characters
+        chars = re.escape(''.join(mapping))
+        self.pattern = re.compile(rf"[{chars}]|[^\w\s{re.escape(allowed)}{chars}]+")
+
+    def __call__(self, text):
+        """
+        Normalize typography, drop disallowed characters and collapse whitespace
+        """
+        replacements = self.replacements
+        text = self.pattern.sub(lambda match: replacements.get(match.group(), ''), text)
+        return ' '.join(text.split())
+
+
+default_normalizer = TextNormalizer()
@@ -0,0 +1,264 @@
+"""
+Inference-only NumPy implementation of the Keras sentiment network
+Runs the forward pass of a Sequential Embedding -> (Bidirectional) LSTM ->
+Dense model from its JSON config and weight arrays, with batching and
+Embedding masking, so trained models can be served without TensorFlow.
+Dropout layers are identity at inference time
+"""
+import json
+
+import numpy as np
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x):
+    return np.clip(x / 6.0 + 0.5, 0.0, 1.0)
+
+
+def _hard_sigmoid_keras2(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+def _softmax(x):
+    shifted = np.exp(x - x.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+    'hard_sigmoid_keras2': _hard_sigmoid_keras2,
+    'softmax': _softmax,
+}
+
+
+def _activation(name):
+    if name is None:
+        return ACTIVATIONS['linear']
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation for the NumPy backend: {name}")
+    return ACTIVATIONS[name]
+
+
+def _keras2_activations(config):
+    # Keras 2 defined hard_sigmoid as clip(0.2x + 0.5), Keras 3 as relu6(x + 3) / 6
+    if isinstance(config, dict):
+        return {key: 'hard_sigmoid_keras2' if value == 'hard_sigmoid' and 'activation' in key
+                else _keras2_activations(value) for key, value in config.items()}
+    if isinstance(config, list):
+        return [_keras2_activations(value) for value in config]
+    return config
+
+
+class Embedding:
+    def __init__(self, config, weights):
+        self.embeddings = weights[0]
+        self.mask_zero = config.get('mask_zero', False)
+
+    def __call__(self, inputs, mask):
+        mask = inputs != 0 if self.mask_zero else None
+        return self.embeddings[inputs], mask
+
+
+class LSTM:
+    def __init__(self, config, weights):
+        self.units = config['units']
+        self.return_sequences = config.get('return_sequences', False)
+        self.go_backwards = config.get('go_backwards', False)
+        self.zero_output_for_mask = config.get('zero_output_for_mask', False)
+        self.activation = _activation(config.get('activation', 'tanh'))
+        self.recurrent_activation = _activation(config.get('recurrent_activation', 'sigmoid'))
+        self.kernel = weights[0]
+        self.recurrent_kernel = weights[1]
+        self.bias = weights[2] if config.get('use_bias', True) else None
+
+    @staticmethod
+    def weight_count(config):
+        return 3 if config.get('use_bias', True) else 2
+
+    def __call__(self, inputs, mask):
+        """
+        inputs: (batch, time, features); mask: (batch, time) or None
+        Masked steps leave the state unchanged and output either zeros or
+        the carried-over state (zero_output_for_mask), like Keras
+        """
+        batch, steps, _ = inputs.shape
+        units = self.units
+
+        # Input projections for every step in one matmul; Keras gate order
+        # is input, forget, cell, output
+        projected = inputs @ self.kernel
+        if self.bias is not None:
+            projected += self.bias
+
+        h = np.zeros((batch, units), dtype=projected.dtype)
+        c = np.zeros((batch, units), dtype=projected.dtype)
+        outputs = np.zeros((batch, steps, units), dtype=projected.dtype) if self.return_sequences else None
+        order = range(steps - 1, -1, -1) if self.go_backwards else range(steps)
+
+        for t in order:
+            z = projected[:, t] + h @ self.recurrent_kernel
+            i = self.recurrent_activation(z[:, :units])
+            f = self.recurrent_activation(z[:, units:2 * units])
+            g = self.activation(z[:, 2 * units:3 * units])
+            o = self.recurrent_activation(z[:, 3 * units:])
+            c_next = f * c + i * g
+            h_next = o * self.activation(c_next)
+
+            if mask is None:
+                h, c = h_next, c_next
+            else:
+                step_mask = mask[:, t, None]
+                h = np.where(step_mask, h_next, h)
+                c = np.where(step_mask, c_next, c)
+
+            if outputs is not None:
+                outputs[:, t] = np.where(step_mask, h_next, 0) if (
+                    mask is not None and self.zero_output_for_mask) else h
+
+        if outputs is None:
+            return h, None
+
+        # go_backwards sequences come out in reverse time order, as in Keras
+        if self.go_backwards:
+            outputs = outputs[:, ::-1]
+        return outputs, mask
+
+
+class Bidirectional:
+    def __init__(self, config, weights):
+        layer_config = config['layer']['config']
+        backward_config = (config.get('backward_layer') or {}).get('config')
+        if backward_config is None:
+            backward_config = dict(layer_config, go_backwards=not layer_config.get('go_backwards', False))
+
+        split = LSTM.weight_count(layer_config)
+        self.forward = LSTM(layer_config, weights[:split])
+        self.backward = LSTM(backward_config, weights[split:])
+        self.merge_mode = config.get('merge_mode', 'concat')
+
+    @staticmethod
+    def weight_count(config):
+        layer_config = config['layer']['config']
+        backward_config = (config.get('backward_layer') or {}).get('config', layer_config)
+        return LSTM.weight_count(layer_config) + LSTM.weight_count(backward_config)
+
+    def __call__(self, inputs, mask):
+        forward, _ = self.forward(inputs, mask)
+        backward, _ = self.backward(inputs, mask)
+
+        # Align the backward outputs with forward time before merging
+        if self.backward.return_sequences:
+            backward = backward[:, ::-1]
+
+        if self.merge_mode == 'concat':
+            merged = np.concatenate([forward, backward], axis=-1)
+        elif self.merge_mode == 'sum':
+            merged = forward + backward
+        elif self.merge_mode == 'mul':
+            merged = forward * backward
+        elif self.merge_mode == 'ave':
+            merged = (forward + backward) / 2
+        else:
+            raise ValueError(f"Unsupported merge_mode for the NumPy backend: {self.merge_mode}")
+
+        return merged, mask if self.forward.return_sequences else None
+
+
+class Dense:
+    def __init__(self, config, weights):
+        self.kernel = weights[0]
+        self.bias = weights[1] if config.get('use_bias', True) else None
+        self.activation = _activation(config.get('activation'))
+
+    @staticmethod
+    def weight_count(config):
+        return 2 if config.get('use_bias', True) else 1
+
+    def __call__(self, inputs, mask):
+        outputs = inputs @ self.kernel
+        if self.bias is not None:
+            outputs += self.bias
+        return self.activation(outputs), mask
+
+
+class Identity:
+    def __init__(self, config, weights):
+        pass
+
+    def __call__(self, inputs, mask):
+        return inputs, mask
+
+
+LAYERS = {
+    'InputLayer': (Identity, 0),
+    'Dropout': (Identity, 0),
+    'Embedding': (Embedding, 1),
+    'LSTM': (LSTM, LSTM.weight_count),
+    'Bidirectional': (Bidirectional, Bidirectional.weight_count),
+    'Dense': (Dense, Dense.weight_count),
+}
+
+
+class NumpySequential:
+    def __init__(self, model_config, weights):
+        """
+        model_config: Keras Sequential config (the parsed model.to_json())
+        weights: arrays in model.get_weights() order
+        """
+        if model_config.get('class_name') != 'Sequential':
+            raise ValueError("The NumPy backend only runs Sequential models")
+        self.config = model_config
+        self.weights = list(weights)
+        if str(model_config.get('keras_version', '3')).startswith('2'):
+            model_config = _keras2_activations(model_config)
+
+        self.layers = []
+        position = 0
+        for layer in model_config['config']['layers']:
+            name = layer['class_name']
+            if name not in LAYERS:
+                raise ValueError(f"Unsupported layer for the NumPy backend: {name}")
+            layer_class, count = LAYERS[name]
+            if callable(count):
+                count = count(layer['config'])
+            self.layers.append(layer_class(layer['config'], weights[position:position + count]))
+            position += count
+
+        if position != len(weights):
+            raise ValueError(f"Model config uses {position} weight arrays, {len(weights)} given")
+
+        first = self.layers[1] if self.layers and isinstance(self.layers[0], Identity) else self.layers[0]
+        self.mask_zero = isinstance(first, Embedding) and first.mask_zero
+
+    @classmethod
+    def from_keras(cls, model):
+        """
+        Copy the config and weights of a built Keras model
+        """
+        return cls(json.loads(model.to_json()), model.get_weights())
+
+    def predict_on_batch(self, inputs):
+        """
+        Forward pass for one batch of padded index sequences
+        """
+        outputs, mask = np.asarray(inputs), None
+        for layer in self.layers:
+            outputs, mask = layer(outputs, mask)
+        return outputs
+
+    def predict(self, inputs, batch_size=256, verbose=0):
+        """
+        Forward pass in batches of batch_size (same signature as Keras)
+        """
+        inputs = np.asarray(inputs)
+        return np.concatenate([
+            self.predict_on_batch(inputs[start:start + batch_size])
+            for start in range(0, len(inputs), batch_size)
+        ]) if len(inputs) else np.zeros((0, 0))
@@ -1,35 +1,58 @@
 """
 Text preprocessing utilities for literary analysis
 """
-import re
 import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize, sent_tokenize
 from nltk.stem import WordNetLemmatizer
 import string
+import os
+from functools import lru_cache
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.document import Document
+from src.normalizer import default_normalizer
 
 class TextPreprocessor:
-    def __init__(self, remove_stopwords=False, lemmatize=True):
+    def __init__(self, remove_stopwords=False, lemmatize=True, lemma_cache_size=100000,
+                 normalizer=None):
+        """
+        lemma_cache_size: number of distinct words whose lemmas are memoized
+        (literary vocabulary is very skewed, so most lookups repeat)
+        normalizer: TextNormalizer used by clean_text (built once, reused)
+        """
+        self.normalizer = normalizer or default_normalizer
         self.remove_stopwords = remove_stopwords
         self.lemmatize = lemmatize
         self.lemmatizer = WordNetLemmatizer() if lemmatize else None
         self.stop_words = set(stopwords.words('english')) if remove_stopwords else set()
+        self._lemmatize = lru_cache(maxsize=lemma_cache_size)(self.lemmatizer.lemmatize) if lemmatize else None
+    
+    def lemma_cache_info(self):
+        """
+        Hit/miss statistics of the lemma cache
+        """
+        if not self.lemmatize:
+            return None
+        info = self._lemmatize.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'max_size': info.maxsize,
+            'hit_rate': info.hits / lookups if lookups else 0.0
+        }
     
     def clean_text(self, text):
         """
         Clean and normalize text while preserving literary structure
+        Curly quotes, dashes and ellipses are normalized, characters other than
+        words and sentiment punctuation are removed and whitespace is collapsed
+        text: raw string or Document
         """
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Normalize quotes
-        text = text.replace('"', '"').replace('"', '"')
-        text = text.replace(''', "'").replace(''', "'")
-        
-        # Remove special characters but keep punctuation for sentiment
-        text = re.sub(r'[^\w\s\.,!?;:\'-]', '', text)
-        
-        return text.strip()
+        return self.normalizer(Document.of(text).text)
     
     def tokenize_sentences(self, text):
         """
@@ -46,6 +69,7 @@ class TextPreprocessor:
     def preprocess(self, text, preserve_case=False):
         """
         Full preprocessing pipeline
+        text: raw string or Document
         """
         # Clean text
         text = self.clean_text(text)
@@ -63,16 +87,45 @@ class TextPreprocessor:
         
         # Lemmatize
         if self.lemmatize:
-            tokens = [self.lemmatizer.lemmatize(word) for word in tokens]
+            lemmatize = self._lemmatize
+            tokens = [lemmatize(word) for word in tokens]
         
         return tokens
     
+    def preprocess_many(self, texts, preserve_case=False):
+        """
+        Preprocess a batch of texts, lemmatizing each distinct token only once
+        texts: raw strings or Documents
+        Returns: list of token lists, in the same order as texts
+        """
+        token_lists = []
+        for text in texts:
+            text = self.clean_text(text)
+            if not preserve_case:
+                text = text.lower()
+            token_lists.append(self.tokenize_words(text))
+        
+        # Decide stopwords and lemmas once per distinct token across the batch
+        vocabulary = {word for tokens in token_lists for word in tokens}
+        if self.remove_stopwords:
+            vocabulary = {word for word in vocabulary if word.lower() not in self.stop_words}
+        if self.lemmatize:
+            lemmatize = self._lemmatize
+            lemmas = {word: lemmatize(word) for word in vocabulary}
+        else:
+            lemmas = {word: word for word in vocabulary}
+        
+        return [[lemmas[word] for word in tokens if word in lemmas] for tokens in token_lists]
+    
     def extract_features(self, text):
         """
         Extract features for ML models
+        text: raw string or Document
         """
-        sentences = self.tokenize_sentences(text)
-        words = self.tokenize_words(text)
+        doc = Document.of(text)
+        text = doc.text
+        sentences = doc.sentences
+        words = doc.words
         
         features = {
             'word_count': len(words),
@@ -91,8 +144,9 @@ class TextPreprocessor:
     def split_into_chunks(self, text, chunk_size=500):
         """
         Split long texts into manageable chunks for analysis
+        text: raw string or Document
         """
-        words = self.tokenize_words(text)
+        words = Document.of(text).words
         chunks = []
         
         for i in range(0, len(words), chunk_size):
@@ -105,15 +159,16 @@ class TextPreprocessor:
 def analyze_poetic_structure(text):
     """
     Analyze poetic elements like line breaks, stanzas, and rhyme
+    text: raw string or Document
     """
-    lines = text.split('\n')
-    lines = [line.strip() for line in lines if line.strip()]
+    doc = Document.of(text)
+    lines = [line.strip() for line in doc.lines if line.strip()]
     
     # Detect stanzas (separated by blank lines)
     stanzas = []
     current_stanza = []
     
-    for line in text.split('\n'):
+    for line in doc.lines:
         if line.strip():
             current_stanza.append(line.strip())
         elif current_stanza:
@@ -127,8 +182,8 @@ def analyze_poetic_structure(text):
         'line_count': len(lines),
         'stanza_count': len(stanzas),
         'avg_lines_per_stanza': len(lines) / len(stanzas) if stanzas else 0,
-        'total_words': len(word_tokenize(text)),
-        'avg_words_per_line': len(word_tokenize(text)) / len(lines) if lines else 0,
+        'total_words': len(doc.words),
+        'avg_words_per_line': len(doc.words) / len(lines) if lines else 0,
     }
     
     return structure
@@ -0,0 +1,121 @@
+"""
+Compact per-sentence sentiment results
+Sentences are stored as character offsets into the analyzed text plus NumPy
+columns for labels and confidences; dicts and strings are built on demand
+"""
+import numpy as np
+
+
+LABELS = ('negative', 'neutral', 'positive')
+LABEL_CODES = {label: code for code, label in enumerate(LABELS)}
+
+
+class SentenceResults:
+    __slots__ = ('text', 'starts', 'ends', 'labels', 'confidences')
+
+    def __init__(self, text, starts, ends, labels, confidences):
+        """
+        text: the analyzed text the offsets point into
+        starts, ends: sentence character offsets
+        labels: label codes (index into LABELS)
+        confidences: prediction confidences
+        """
+        self.text = text
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.labels = np.asarray(labels, dtype=np.int8)
+        self.confidences = np.asarray(confidences, dtype=np.float64)
+
+    @classmethod
+    def from_predictions(cls, text, spans, predictions):
+        """
+        Build from (start, end) spans and predict_sentiment results
+        """
+        count = len(predictions)
+        spans = np.array(spans, dtype=np.int64).reshape(count, 2)
+        labels = np.fromiter((LABEL_CODES[p['sentiment']] for p in predictions), np.int8, count)
+        confidences = np.fromiter((p['confidence'] for p in predictions), np.float64, count)
+        return cls(text, spans[:, 0], spans[:, 1], labels, confidences)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('sentence index out of range')
+        return {
+            'sentence': self.sentence(index),
+            'sentiment': LABELS[self.labels[index]],
+            'confidence': float(self.confidences[index])
+        }
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self):
+        return f"<SentenceResults: {len(self)} sentences>"
+
+    def sentence(self, index):
+        """
+        Text of one sentence, sliced from the analyzed text
+        """
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def distribution(self, method='weighted'):
+        """
+        Sentiment distribution over all sentences
+        method: 'weighted' (by confidence) or 'majority' (share of sentences)
+        """
+        weights = self.confidences if method == 'weighted' else None
+        totals = np.bincount(self.labels, weights=weights, minlength=len(LABELS))
+        total = totals.sum()
+        if total > 0:
+            totals = totals / total
+        return {label: float(totals[code]) for code, label in enumerate(LABELS)}
+
+    def to_list(self):
+        """
+        One dict per sentence (the original, verbose layout)
+        """
+        return list(self)
+
+    def to_columnar(self):
+        """
+        Compact JSON-friendly layout: offsets plus label/confidence columns
+        """
+        return {
+            'format': 'columnar',
+            'labels': list(LABELS),
+            'start': self.starts.tolist(),
+            'end': self.ends.tolist(),
+            'label': self.labels.tolist(),
+            'confidence': self.confidences.tolist()
+        }
+
+
+def json_default(obj):
+    """
+    json.dump default hook: sentence results as a list of dicts
+    (NumPy arrays and scalars become plain lists and numbers)
+    """
+    if isinstance(obj, SentenceResults):
+        return obj.to_list()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_default_columnar(obj):
+    """
+    json.dump default hook: sentence results in the compact columnar layout
+    """
+    if isinstance(obj, SentenceResults):
+        return obj.to_columnar()
+    return json_default(obj)
@@ -1,32 +1,106 @@
 """
 Sentiment analysis model using TensorFlow and Scikit-learn
+TensorFlow and scikit-learn are imported only when a model is built, trained
+or loaded, so the VADER fallback starts without them
 """
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import Embedding, LSTM, Dense, Dropout, Bidirectional
-from tensorflow.keras.preprocessing.text import Tokenizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-from sklearn.model_selection import train_test_split
 from nltk.sentiment import SentimentIntensityAnalyzer
+import hashlib
+import json
 import pickle
 import os
+import sys
+import threading
+import uuid
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.document import Document
+from src.model_bundle import ModelBundle, VocabularyTokenizer, is_bundle, save_bundle
+from src.sentence_results import SentenceResults
 
 
 class LiterarySentimentAnalyzer:
-    def __init__(self, max_words=10000, max_len=200):
+    def __init__(self, max_words=10000, max_len=200, dynamic_padding=True, bucket_width=8,
+                 backend='keras'):
+        """
+        dynamic_padding: group inputs into length buckets and pad each bucket
+        only to its own maximum (needs a model with a masking Embedding)
+        bucket_width: bucket widths are rounded up to a multiple of this to
+        bound the number of distinct input shapes the model sees
+        backend: 'keras' runs predictions through TensorFlow; 'numpy' runs the
+        trained network in NumPy (load_bundle then never imports TensorFlow)
+        """
+        if backend not in ('keras', 'numpy'):
+            raise ValueError(f"Unknown backend: {backend}")
+        
         self.max_words = max_words
         self.max_len = max_len
-        self.tokenizer = Tokenizer(num_words=max_words)
+        self.dynamic_padding = dynamic_padding
+        self.bucket_width = bucket_width
+        self._tokenizer = None
         self.model = None
+        self.backend = backend
+        self.network = None
+        self._network_version = None
+        self.model_version = 'vader'
+        self.model_paths = None
         self.vader = SentimentIntensityAnalyzer()
+        self.coalescer = None
+        self.sentence_memo = None
+        self._predict_lock = threading.Lock()
+    
+    @property
+    def has_model(self):
+        """
+        True once a trained (or built) network is available
+        """
+        return self.model is not None or self.network is not None
+    
+    @property
+    def tokenizer(self):
+        """
+        Keras tokenizer, created on first use
+        """
+        if self._tokenizer is None:
+            from tensorflow.keras.preprocessing.text import Tokenizer
+            self._tokenizer = Tokenizer(num_words=self.max_words)
+        return self._tokenizer
+    
+    @tokenizer.setter
+    def tokenizer(self, tokenizer):
+        self._tokenizer = tokenizer
+        self._model_replaced()
+    
+    @property
+    def model(self):
+        """
+        Keras model (None until built, trained or loaded)
+        """
+        return self._model
+    
+    @model.setter
+    def model(self, model):
+        self._model = model
+        self._model_replaced()
+    
+    def _model_replaced(self):
+        # A directly assigned model or tokenizer gets a fresh version, so
+        # result caches and sentence memos keyed on model_version never serve
+        # stale entries; training and loading then set their own version
+        has_model = getattr(self, '_model', None) is not None or getattr(self, 'network', None) is not None
+        self.model_version = f"assigned-{uuid.uuid4().hex}" if has_model else 'vader'
+        self.model_paths = None
         
     def build_model(self, embedding_dim=128):
         """
         Build LSTM model for deep sentiment analysis
+        Index 0 is masked so padding does not change predictions
         """
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Embedding, LSTM, Dense, Dropout, Bidirectional
+        
         model = Sequential([
-            Embedding(self.max_words, embedding_dim, input_length=self.max_len),
+            Embedding(self.max_words, embedding_dim, mask_zero=True),
             Bidirectional(LSTM(64, return_sequences=True)),
             Dropout(0.5),
             Bidirectional(LSTM(32)),
@@ -43,12 +117,17 @@ class LiterarySentimentAnalyzer:
         )
         
         self.model = model
+        self.model_version = f"untrained-{uuid.uuid4().hex}"
+        self.model_paths = None
         return model
     
     def prepare_data(self, texts, labels):
         """
         Prepare text data for training
         """
+        import tensorflow as tf
+        from tensorflow.keras.preprocessing.sequence import pad_sequences
+        
         # Fit tokenizer on texts
         self.tokenizer.fit_on_texts(texts)
         
@@ -67,6 +146,8 @@ class LiterarySentimentAnalyzer:
         """
         Train the sentiment model
         """
+        from sklearn.model_selection import train_test_split
+        
         # Prepare data
         X, y = self.prepare_data(texts, labels)
         
@@ -87,6 +168,45 @@ class LiterarySentimentAnalyzer:
             validation_data=(X_val, y_val),
             verbose=1
         )
+        self.model_version = f"trained-{uuid.uuid4().hex}"
+        self.model_paths = None
+        
+        return history
+    
+    def train_streaming(self, paths, epochs=10, batch_size=32, validation_fraction=0.2, n_jobs=None,
+                        cache=None, shuffle_buffer=10000, text_field='text', label_field='label'):
+        """
+        Train from labelled JSONL/CSV shards without loading the corpus
+        The vocabulary is counted in n_jobs worker processes, then batches
+        stream through a tf.data pipeline (parallel tokenization, token id
+        cache, length buckets of bucket_width, prefetch)
+        paths: shard files, directories or glob patterns
+        labels: 'negative'/'neutral'/'positive' or 0/1/2
+        cache: file path prefix to cache token ids on disk between epochs
+        (keyed by a digest of the shards and vocabulary), '' to cache them
+        in memory, None (default) to re-read the shards every epoch
+        """
+        from src.sentiment_training import build_vocabulary, make_datasets
+        
+        self.tokenizer = build_vocabulary(
+            paths, num_words=self.max_words, validation_fraction=validation_fraction,
+            n_jobs=n_jobs, text_field=text_field, label_field=label_field
+        )
+        train_data, validation_data = make_datasets(
+            paths, self.tokenizer, self.max_len, batch_size=batch_size,
+            validation_fraction=validation_fraction, cache=cache, shuffle_buffer=shuffle_buffer,
+            bucket_width=self.bucket_width, text_field=text_field, label_field=label_field
+        )
+        
+        # Build model if not exists
+        if self.model is None:
+            self.build_model()
+        
+        # The training dataset is already shuffled
+        history = self.model.fit(train_data, epochs=epochs, validation_data=validation_data,
+                                 shuffle=False, verbose=1)
+        self.model_version = f"trained-{uuid.uuid4().hex}"
+        self.model_paths = None
         
         return history
     
@@ -95,32 +215,172 @@ class LiterarySentimentAnalyzer:
         Predict sentiment of a single text
         Returns: sentiment label and confidence scores
         """
-        # Tokenize and pad
-        sequence = self.tokenizer.texts_to_sequences([text])
-        padded = pad_sequences(sequence, maxlen=self.max_len, padding='post')
+        return self.predict_sentiment_batch([text])[0]
+    
+    def predict_sentiment_batch(self, texts, batch_size=256, dynamic_padding=None):
+        """
+        Predict sentiment for many texts at once
+        With a trained model all texts are tokenized and padded together and
+        run through the network in batches of batch_size
+        dynamic_padding: override the instance setting for this call
+        Returns: list of results in the same order as texts
+        """
+        texts = list(texts)
+        if not texts:
+            return []
         
-        # Predict
-        if self.model:
-            prediction = self.model.predict(padded, verbose=0)[0]
-            sentiment_map = {0: 'negative', 1: 'neutral', 2: 'positive'}
-            predicted_label = sentiment_map[np.argmax(prediction)]
-            confidence = float(np.max(prediction))
-        else:
-            # Fallback to VADER if model not trained
-            scores = self.vader.polarity_scores(text)
-            compound = scores['compound']
-            if compound >= 0.05:
-                predicted_label = 'positive'
-                confidence = abs(compound)
-            elif compound <= -0.05:
-                predicted_label = 'negative'
-                confidence = abs(compound)
-            else:
-                predicted_label = 'neutral'
-                confidence = 1.0 - abs(compound)
+        model = self._inference_model()
+        if model is not None:
+            if dynamic_padding is None:
+                dynamic_padding = self.dynamic_padding
+            
+            # Tokenize (keeping the last max_len tokens, like pad_sequences)
+            sequences = [seq[-self.max_len:] for seq in self.tokenizer.texts_to_sequences(texts)]
             
-            prediction = [scores['neg'], scores['neu'], scores['pos']]
+            # Predict (Keras models are not safe to call from several threads)
+            with self._predict_lock:
+                if dynamic_padding and self._model_masks_padding(model):
+                    predictions = self._predict_bucketed(model, sequences, batch_size)
+                else:
+                    padded = self._pad(sequences, self.max_len)
+                    predictions = model.predict(padded, batch_size=batch_size, verbose=0)
+            return [self._model_result(prediction) for prediction in predictions]
+        
+        # Fallback to VADER if model not trained
+        return [self._vader_result(text) for text in texts]
+    
+    def predict_sentences(self, sentences, batch_size=256, stats=None):
+        """
+        Predict many sentences, scoring each distinct sentence only once
+        Repeated sentences (refrains, choruses) are looked up in a per-call memo
+        and, when sentence_memo (an LRUCache) is set, in a memo shared across
+        calls; the rest go through the coalescer when one is attached and a
+        model is loaded (VADER scores texts one by one, so there batching
+        would only add latency)
+        stats: optional dict filled with memo hit counts
+        Returns: list of results in the same order as sentences (each a
+        fresh copy, so callers may modify them without touching the memos)
+        """
+        memo = {}
+        keys = []
+        pending = []
+        shared_hits = 0
+        
+        for sentence in sentences:
+            key = ' '.join(sentence.split())
+            keys.append(key)
+            if key in memo:
+                continue
+            cached = self.sentence_memo.get((self.model_version, key)) if self.sentence_memo is not None else None
+            memo[key] = cached
+            if cached is None:
+                pending.append(key)
+            else:
+                shared_hits += 1
+        
+        if pending:
+            if self.coalescer is not None and self.has_model:
+                predictions = self.coalescer.predict(pending)
+            else:
+                predictions = self.predict_sentiment_batch(pending, batch_size=batch_size)
+            for key, prediction in zip(pending, predictions):
+                memo[key] = prediction
+                if self.sentence_memo is not None:
+                    self.sentence_memo.put((self.model_version, key), prediction)
+        
+        if stats is not None:
+            stats['sentences'] = stats.get('sentences', 0) + len(keys)
+            stats['unique'] = stats.get('unique', 0) + len(memo)
+            stats['repeat_hits'] = stats.get('repeat_hits', 0) + len(keys) - len(memo)
+            stats['shared_hits'] = stats.get('shared_hits', 0) + shared_hits
+            stats['inferred'] = stats.get('inferred', 0) + len(pending)
+        
+        return [self._copy_result(memo[key]) for key in keys]
+    
+    @staticmethod
+    def _copy_result(result):
+        return dict(result, scores=dict(result['scores']))
+    
+    def _inference_model(self):
+        """
+        What predictions run through: the Keras model, or with the numpy
+        backend a NumPy copy of it (re-exported whenever the model changes)
+        """
+        if self.backend == 'keras':
+            return self.model
+        if self.model is not None and (self.network is None or self._network_version != self.model_version):
+            from src.numpy_backend import NumpySequential
+            self.network = NumpySequential.from_keras(self.model)
+            self._network_version = self.model_version
+        return self.network
+    
+    def _predict_bucketed(self, model, sequences, batch_size):
+        """
+        Sort sequences by length and pad each batch only to its own longest
+        sequence (rounded up to bucket_width)
+        """
+        lengths = np.array([len(seq) for seq in sequences])
+        order = np.argsort(lengths, kind='stable')
+        predictions = np.zeros((len(sequences), 3), dtype='float32')
+        
+        for start in range(0, len(order), batch_size):
+            bucket = order[start:start + batch_size]
+            longest = max(int(lengths[bucket[-1]]), 1)
+            width = min(-(-longest // self.bucket_width) * self.bucket_width, self.max_len)
+            padded = self._pad([sequences[i] for i in bucket], width)
+            predictions[bucket] = np.asarray(model.predict_on_batch(padded))
+        
+        return predictions
+    
+    def _model_masks_padding(self, model):
+        """
+        Padding can be trimmed only if the Embedding masks index 0
+        (models saved before masking was added keep fixed-length padding)
+        """
+        if hasattr(model, 'mask_zero'):
+            return bool(model.mask_zero)
+        return bool(getattr(model.layers[0], 'mask_zero', False))
+    
+    def _pad(self, sequences, width):
+        """
+        Post-pad sequences with zeros to the given width
+        """
+        padded = np.zeros((len(sequences), width), dtype='int32')
+        for row, seq in enumerate(sequences):
+            seq = seq[-width:]
+            padded[row, :len(seq)] = seq
+        return padded
+    
+    def _model_result(self, prediction):
+        """
+        Convert a softmax output row into a sentiment result
+        """
+        sentiment_map = {0: 'negative', 1: 'neutral', 2: 'positive'}
+        predicted_label = sentiment_map[int(np.argmax(prediction))]
+        confidence = float(np.max(prediction))
         
+        return self._format_result(predicted_label, confidence, prediction)
+    
+    def _vader_result(self, text):
+        """
+        Score a text with VADER
+        """
+        scores = self.vader.polarity_scores(text)
+        compound = scores['compound']
+        if compound >= 0.05:
+            predicted_label = 'positive'
+            confidence = abs(compound)
+        elif compound <= -0.05:
+            predicted_label = 'negative'
+            confidence = abs(compound)
+        else:
+            predicted_label = 'neutral'
+            confidence = 1.0 - abs(compound)
+        
+        prediction = [scores['neg'], scores['neu'], scores['pos']]
+        return self._format_result(predicted_label, confidence, prediction)
+    
+    def _format_result(self, predicted_label, confidence, prediction):
         return {
             'sentiment': predicted_label,
             'confidence': confidence,
@@ -131,64 +391,41 @@ class LiterarySentimentAnalyzer:
             }
         }
     
-    def analyze_by_sentences(self, text):
+    def analyze_by_sentences(self, text, batch_size=256, stats=None, compact=False):
         """
         Analyze sentiment for each sentence in the text
+        text: raw string or Document
+        stats: optional dict filled with sentence memo hit counts
+        compact: return a SentenceResults (offsets into the text plus
+        label/confidence columns, dicts built on demand) instead of a list
+        of per-sentence dicts
         """
-        from nltk.tokenize import sent_tokenize
-        
-        sentences = sent_tokenize(text)
-        results = []
-        
-        for sentence in sentences:
-            sentiment = self.predict_sentiment(sentence)
-            results.append({
-                'sentence': sentence,
-                'sentiment': sentiment['sentiment'],
-                'confidence': sentiment['confidence']
-            })
-        
-        return results
+        doc = Document.of(text)
+        sentiments = self.predict_sentences(doc.sentences, batch_size=batch_size, stats=stats)
+        results = SentenceResults.from_predictions(doc.text, doc.sentence_spans, sentiments)
+        return results if compact else results.to_list()
     
-    def get_overall_sentiment(self, text, method='weighted'):
+    def get_overall_sentiment(self, text, method='weighted', batch_size=256, compact=False, stats=None):
         """
         Get overall sentiment of a long text
         method: 'weighted' (by confidence) or 'majority' (most common)
+        text: raw string or Document
+        compact: return 'sentences' as a SentenceResults instead of a list of dicts
+        stats: optional dict filled with sentence memo hit counts
         """
-        sentence_results = self.analyze_by_sentences(text)
+        sentence_results = self.analyze_by_sentences(text, batch_size=batch_size, stats=stats,
+                                                     compact=True)
         
-        if method == 'weighted':
-            # Weighted average by confidence
-            sentiment_scores = {'positive': 0, 'negative': 0, 'neutral': 0}
-            total_confidence = 0
-            
-            for result in sentence_results:
-                sentiment = result['sentiment']
-                confidence = result['confidence']
-                sentiment_scores[sentiment] += confidence
-                total_confidence += confidence
-            
-            # Normalize
-            if total_confidence > 0:
-                for key in sentiment_scores:
-                    sentiment_scores[key] /= total_confidence
-            
-            overall_sentiment = max(sentiment_scores, key=sentiment_scores.get)
-            
-        else:  # majority
-            sentiments = [r['sentiment'] for r in sentence_results]
-            overall_sentiment = max(set(sentiments), key=sentiments.count)
-            sentiment_scores = {
-                'positive': sentiments.count('positive') / len(sentiments),
-                'negative': sentiments.count('negative') / len(sentiments),
-                'neutral': sentiments.count('neutral') / len(sentiments)
-            }
+        # Weighted average by confidence, or share of sentences per label
+        distribution = sentence_results.distribution(method)
+        sentiment_scores = {key: distribution[key] for key in ('positive', 'negative', 'neutral')}
+        overall_sentiment = max(sentiment_scores, key=sentiment_scores.get)
         
         return {
             'overall_sentiment': overall_sentiment,
             'distribution': sentiment_scores,
             'sentence_count': len(sentence_results),
-            'sentences': sentence_results
+            'sentences': sentence_results if compact else sentence_results.to_list()
         }
     
     def save_model(self, model_path='models/sentiment_model.h5', 
@@ -210,16 +447,100 @@ class LiterarySentimentAnalyzer:
     def load_model(self, model_path='models/sentiment_model.h5',
                    tokenizer_path='models/tokenizer.pkl'):
         """
-        Load pre-trained model and tokenizer
+        Load pre-trained model and tokenizer (model_path may also be a bundle
+        directory written by save_bundle)
+        model_version is set from the file contents so caches keyed on it
+        are invalidated when a different model is loaded; model_paths lets
+        worker processes load the same model
         """
+        if is_bundle(model_path):
+            return self.load_bundle(model_path)
+        
+        digest = hashlib.sha256()
+        
         if os.path.exists(model_path):
+            from tensorflow.keras.models import load_model
             self.model = load_model(model_path)
+            digest.update(_file_digest(model_path))
             print(f"Model loaded from {model_path}")
         
         if os.path.exists(tokenizer_path):
             with open(tokenizer_path, 'rb') as f:
                 self.tokenizer = pickle.load(f)
+            digest.update(_file_digest(tokenizer_path))
             print(f"Tokenizer loaded from {tokenizer_path}")
+        
+        if self.model:
+            self.model_version = f"keras-{digest.hexdigest()}"
+            self.model_paths = (model_path, tokenizer_path)
+    
+    def save_bundle(self, directory='models/sentiment_bundle'):
+        """
+        Save the trained model and tokenizer as a model bundle: the vocabulary
+        and every weight as .npy arrays, the architecture in the manifest
+        Returns: the bundle manifest
+        """
+        if self.model is not None:
+            model_config, weights = json.loads(self.model.to_json()), self.model.get_weights()
+        elif self.network is not None:
+            model_config, weights = self.network.config, self.network.weights
+        else:
+            raise ValueError("No trained model to bundle")
+        
+        arrays, tokenizer_config = VocabularyTokenizer.export(self.tokenizer)
+        for index, weight in enumerate(weights):
+            arrays[f"weight_{index:03d}"] = weight
+        
+        config = {
+            'max_words': self.max_words,
+            'max_len': self.max_len,
+            'tokenizer': tokenizer_config,
+            'model': model_config,
+            'weight_count': len(weights)
+        }
+        manifest = save_bundle(directory, 'sentiment', arrays, config)
+        print(f"Model bundle saved to {directory}")
+        return manifest
+    
+    def load_bundle(self, directory='models/sentiment_bundle', mmap=True, verify=False):
+        """
+        Load a model bundle written by save_bundle
+        The tokenizer reads the memory-mapped vocabulary directly; with the
+        numpy backend so do the network weights, and TensorFlow is never
+        imported. model_version is the bundle checksum
+        verify: re-hash the array files against the manifest
+        """
+        bundle = ModelBundle.load(directory, kind='sentiment', mmap=mmap, verify=verify)
+        config = bundle.config
+        weights = [bundle[f"weight_{index:03d}"] for index in range(config['weight_count'])]
+        
+        if self.backend == 'numpy':
+            from src.numpy_backend import NumpySequential
+            self.model = None
+            self.network = NumpySequential(config['model'], weights)
+        else:
+            from tensorflow.keras.models import model_from_json
+            self.model = model_from_json(json.dumps(config['model']))
+            self.model.set_weights(weights)
+        
+        self.max_words = config['max_words']
+        self.max_len = config['max_len']
+        self.tokenizer = VocabularyTokenizer.from_bundle(bundle, config['tokenizer'])
+        self.model_version = f"bundle-{bundle.checksum}"
+        self._network_version = self.model_version
+        self.model_paths = (directory,)
+        print(f"Model bundle loaded from {directory}")
+
+
+def _file_digest(path):
+    """
+    SHA-256 digest of a file's contents
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.digest()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+"""
+Streaming training data for the sentiment network
+The vocabulary is counted over the shards in worker processes (the same word
+index Tokenizer.fit_on_texts builds), then a tf.data pipeline reads the
+shards, tokenizes with TensorFlow string ops on parallel threads, caches the
+token ids, and pads each batch only to its length bucket
+"""
+import hashlib
+import json
+import os
+from collections import Counter
+
+from src.model_bundle import VocabularyTokenizer
+from src.sentence_results import LABEL_CODES
+from src.shards import is_holdout, iter_batches, iter_examples, parallel_map, shard_paths, worker_state
+
+
+def sentiment_code(label):
+    """
+    Label code for 'negative'/'neutral'/'positive' or 0/1/2
+    """
+    code = LABEL_CODES.get(label.lower()) if isinstance(label, str) else None
+    if code is None:
+        code = int(label)
+    if code not in LABEL_CODES.values():
+        raise ValueError(f"Unknown sentiment label: {label}")
+    return code
+
+
+def _count_words(batch):
+    """
+    Word counts of the training texts in one batch, in first-seen order
+    """
+    tokenizer = worker_state['tokenizer']
+    validation_fraction = worker_state['validation_fraction']
+    counts = Counter()
+
+    texts, _ = batch
+    for text in texts:
+        if not is_holdout(text, validation_fraction):
+            counts.update(tokenizer._words(text))
+    return counts
+
+
+def build_vocabulary(paths, num_words=None, validation_fraction=0.2, n_jobs=None, batch_size=2000,
+                     text_field='text', label_field='label'):
+    """
+    Count words over the training examples of every shard (in n_jobs worker
+    processes) and keep the num_words - 1 most frequent, indexed from 1
+    Ties keep first-seen order, so the result matches fit_on_texts on the
+    same texts
+    Returns: VocabularyTokenizer
+    """
+    # Batches are merged in shard order and Counter keeps insertion order,
+    # so every word's position is that of its first occurrence
+    counts = Counter()
+    batches = iter_batches(iter_examples(paths, text_field, label_field), batch_size)
+    state = {'tokenizer': VocabularyTokenizer([]), 'validation_fraction': validation_fraction}
+    for batch_counts in parallel_map(_count_words, batches, n_jobs, state):
+        counts.update(batch_counts)
+
+    # sorted() is stable with reverse=True, like fit_on_texts' list.sort
+    words = sorted(counts, key=counts.get, reverse=True)
+    if num_words:
+        words = words[:num_words - 1]
+    return VocabularyTokenizer(words, num_words=num_words)
+
+
+def bucket_boundaries(max_len, bucket_width):
+    """
+    Length bucket boundaries every bucket_width tokens up to max_len
+    (sequences are padded to one less than their bucket's upper boundary)
+    """
+    return list(range(bucket_width + 1, max_len + 1, bucket_width)) + [max_len + 1]
+
+
+def cache_digest(paths, tokenizer, max_len, validation_fraction, text_field, label_field):
+    """
+    Digest of everything the cached token ids depend on: the shards (path,
+    size and modification time), the vocabulary and tokenizer settings,
+    max_len, the validation split and the record fields
+    """
+    shards = []
+    for path in shard_paths(paths):
+        info = os.stat(path)
+        shards.append([os.path.abspath(path), info.st_size, info.st_mtime_ns])
+
+    key = {
+        'shards': shards,
+        'words': list(tokenizer.word_index),
+        'num_words': tokenizer.num_words,
+        'oov_index': tokenizer.oov_index,
+        'lower': tokenizer.lower,
+        'filters': tokenizer.filters,
+        'split': tokenizer.split,
+        'max_len': max_len,
+        'validation_fraction': validation_fraction,
+        'fields': [text_field, label_field]
+    }
+    return hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()[:16]
+
+
+def make_datasets(paths, tokenizer, max_len, batch_size=32, validation_fraction=0.2, cache=None,
+                  shuffle_buffer=10000, bucket_width=8, text_field='text', label_field='label', seed=42):
+    """
+    tf.data pipelines of (padded token ids, one-hot labels) batches
+    Examples are split into training and validation by a hash of the text;
+    tokenization matches tokenizer.texts_to_sequences, and sequences keep
+    their last max_len ids like pad_sequences. Empty sequences are dropped
+    cache: None disables caching, a path prefix caches token ids on disk
+    (one file per split, named with cache_digest so changed shards or a new
+    vocabulary never reuse stale ids), '' caches them in memory
+    Returns: (training dataset, validation dataset or None)
+    """
+    import tensorflow as tf
+
+    def examples():
+        for text, label in iter_examples(paths, text_field, label_field):
+            yield text, sentiment_code(label), is_holdout(text, validation_fraction)
+
+    source = tf.data.Dataset.from_generator(examples, output_signature=(
+        tf.TensorSpec(shape=(), dtype=tf.string),
+        tf.TensorSpec(shape=(), dtype=tf.int32),
+        tf.TensorSpec(shape=(), dtype=tf.bool)
+    ))
+
+    # Word -> index lookup for the indices texts_to_sequences keeps
+    word_index = {word: index for word, index in tokenizer.word_index.items()
+                  if not (tokenizer.num_words and index >= tokenizer.num_words)}
+    missing = tokenizer.oov_index or 0
+    table = tf.lookup.StaticHashTable(tf.lookup.KeyValueTensorInitializer(
+        tf.constant(list(word_index), dtype=tf.string),
+        tf.constant(list(word_index.values()), dtype=tf.int32)
+    ), default_value=missing)
+
+    # Filter and split characters become separators (as \x{...} for RE2)
+    separators = '[' + ''.join(f"\\x{{{ord(char):x}}}" for char in tokenizer.filters + tokenizer.split) + ']'
+
+    def tokenize(text, label, holdout):
+        if tokenizer.lower:
+            text = tf.strings.lower(text, encoding='utf-8')
+        words = tf.strings.split(tf.strings.regex_replace(text, separators, ' '), sep=' ')
+        ids = table.lookup(tf.boolean_mask(words, words != ''))
+        if not missing:
+            ids = tf.boolean_mask(ids, ids > 0)
+        return ids[-max_len:], tf.one_hot(label, 3), holdout
+
+    tokenized = source.map(tokenize, num_parallel_calls=tf.data.AUTOTUNE)
+    tokenized = tokenized.filter(lambda ids, label, holdout: tf.size(ids) > 0)
+    boundaries = bucket_boundaries(max_len, bucket_width)
+    if cache:
+        cache = f"{cache}.{cache_digest(paths, tokenizer, max_len, validation_fraction, text_field, label_field)}"
+
+    def split(holdout, name):
+        dataset = tokenized.filter(lambda ids, label, flag: flag == holdout)
+        dataset = dataset.map(lambda ids, label, flag: (ids, label))
+        if cache is not None:
+            dataset = dataset.cache(f"{cache}.{name}" if cache else '')
+        if not holdout and shuffle_buffer:
+            dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.bucket_by_sequence_length(
+            lambda ids, label: tf.shape(ids)[0],
+            bucket_boundaries=boundaries,
+            bucket_batch_sizes=[batch_size] * (len(boundaries) + 1),
+            pad_to_bucket_boundary=True
+        )
+        return dataset.prefetch(tf.data.AUTOTUNE)
+
+    return split(False, 'train'), split(True, 'validation') if validation_fraction > 0 else None
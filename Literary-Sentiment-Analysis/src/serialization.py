@@ -0,0 +1,207 @@
+"""
+Incremental JSON and JSONL writers for analysis output
+Containers are written piece by piece, so per-sentence results and arc points
+(including generators that produce them lazily) go straight to the file
+instead of being built into one large string first. Output is byte-for-byte
+what json.dumps gives for the same tree and options (ASCII-escaped by
+default, like json.dumps); orjson is used for the pieces when it is
+installed and falls back to the json module wherever its formatting would
+differ
+The analyzers hand over a finished result tree: results are streamed while
+they are written, not while they are computed. Partial results as they are
+produced come from LiteraryTextAnalyzer.iter_analyze (NDJSON events)
+"""
+import json
+import re
+from collections.abc import Iterator
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+from src.sentence_results import json_default
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# orjson writes floats in (1e-9, 1e-4) as 0.00001 / 1e-7 where json writes
+# 1e-05 / 1e-07, and null for NaN and infinity as well as None
+SHORT_EXPONENT = re.compile(rb'\de-\d(?!\d)')
+
+# Values that are written as one piece rather than streamed item by item
+SCALAR_TYPES = (str, int, float, bool, type(None))
+
+# Items of a streamed list are encoded this many at a time
+CHUNK_SIZE = 256
+
+
+def _may_differ(data):
+    # Plain substring checks first: a regex alternation over the whole
+    # output costs more than the encoding itself
+    if b'null' in data or b'0.0000' in data:
+        return True
+    return b'e-' in data and SHORT_EXPONENT.search(data) is not None
+
+
+class JSONEncoder:
+    def __init__(self, indent=2, default=json_default, backend='auto', ensure_ascii=True):
+        """
+        indent: spaces per level, or None for compact output with no whitespace
+        default: hook for objects json cannot encode (e.g. SentenceResults)
+        backend: 'auto' (orjson when installed), 'orjson' or 'json'
+        ensure_ascii: escape non-ASCII characters, as json.dumps does by
+        default (False writes them as UTF-8 text)
+        """
+        if backend == 'orjson' and orjson is None:
+            raise ImportError("orjson is not installed (pip install orjson)")
+        if backend not in ('auto', 'orjson', 'json'):
+            raise ValueError(f"Unknown JSON backend: {backend}")
+
+        self.indent = indent
+        self.default = default
+        self.ensure_ascii = ensure_ascii
+        self.separators = (',', ': ') if indent is not None else (',', ':')
+        self.encode_key = encode_basestring_ascii if ensure_ascii else encode_basestring
+        self._json = json.JSONEncoder(
+            indent=indent, separators=self.separators, ensure_ascii=ensure_ascii, default=default
+        )
+
+        # orjson only knows two-space indentation
+        self.use_orjson = backend != 'json' and orjson is not None and indent in (None, 2)
+        self._orjson_option = orjson.OPT_INDENT_2 if self.use_orjson and indent == 2 else 0
+
+    @property
+    def backend(self):
+        return 'orjson' if self.use_orjson else 'json'
+
+    def encode(self, value):
+        """
+        Encode one value as it would appear at the top level of json.dumps
+        """
+        if self.use_orjson:
+            try:
+                data = orjson.dumps(value, default=self.default, option=self._orjson_option)
+            except TypeError:
+                # Non-string keys, integers beyond 64 bits, ...
+                pass
+            else:
+                # orjson always writes UTF-8, so escaped output needs json
+                # unless the text is plain ASCII
+                if not _may_differ(data) and not (self.ensure_ascii and not data.isascii()):
+                    return data.decode('utf-8')
+        return self._json.encode(value)
+
+
+class JSONStreamWriter:
+    def __init__(self, fileobj, indent=2, default=json_default, backend='auto', chunk_size=CHUNK_SIZE,
+                 ensure_ascii=True):
+        """
+        fileobj: text file to write to
+        chunk_size: list items encoded per backend call
+        """
+        self.fileobj = fileobj
+        self.encoder = JSONEncoder(indent=indent, default=default, backend=backend, ensure_ascii=ensure_ascii)
+        self.chunk_size = chunk_size
+
+    def write(self, value):
+        """
+        Write one JSON document; dicts, lists of containers and iterators are
+        streamed (list items in chunks), everything else is encoded in one piece
+        """
+        self._write(value, 0)
+
+    def _newline(self, depth):
+        if self.encoder.indent is None:
+            return ''
+        return '\n' + ' ' * (self.encoder.indent * depth)
+
+    def _write(self, value, depth):
+        if not isinstance(value, (dict, list, tuple, Iterator) + SCALAR_TYPES):
+            value = self.encoder.default(value)
+
+        if isinstance(value, dict) and value and all(isinstance(key, str) for key in value):
+            self._write_dict(value, depth)
+        elif isinstance(value, Iterator) or (
+                isinstance(value, (list, tuple)) and
+                any(isinstance(item, (dict, list, tuple)) for item in value)):
+            self._write_items(value, depth)
+        else:
+            self._write_piece(value, depth)
+
+    def _write_piece(self, value, depth):
+        text = self.encoder.encode(value)
+        if depth and self.encoder.indent is not None:
+            text = text.replace('\n', self._newline(depth))
+        self.fileobj.write(text)
+
+    def _write_dict(self, value, depth):
+        item_separator, key_separator = self.encoder.separators
+        inner = self._newline(depth + 1)
+        write = self.fileobj.write
+
+        write('{')
+        for index, (key, item) in enumerate(value.items()):
+            write((item_separator if index else '') + inner + self.encoder.encode_key(key) + key_separator)
+            self._write(item, depth + 1)
+        write(self._newline(depth) + '}')
+
+    def _write_items(self, items, depth):
+        write = self.fileobj.write
+        chunk = []
+        empty = True
+
+        for item in items:
+            chunk.append(item)
+            if len(chunk) == self.chunk_size:
+                write(('[' if empty else self.encoder.separators[0]) + self._encode_chunk(chunk, depth))
+                chunk = []
+                empty = False
+
+        if chunk:
+            write(('[' if empty else self.encoder.separators[0]) + self._encode_chunk(chunk, depth))
+            empty = False
+        write('[]' if empty else self._newline(depth) + ']')
+
+    def _encode_chunk(self, chunk, depth):
+        # Encode the items as one list, then drop its brackets (and, when
+        # indenting, the newline before the closing one)
+        text = self.encoder.encode(chunk)
+        if self.encoder.indent is None:
+            return text[1:-1]
+        text = text[1:-2]
+        return text.replace('\n', self._newline(depth)) if depth else text
+
+
+class JSONLinesWriter:
+    def __init__(self, fileobj, default=json_default, backend='auto', flush=True, ensure_ascii=True):
+        """
+        fileobj: text file to append records to
+        flush: flush after every record so partial output survives a crash
+        """
+        self.fileobj = fileobj
+        self.encoder = JSONEncoder(indent=None, default=default, backend=backend, ensure_ascii=ensure_ascii)
+        self.flush = flush
+
+    def write(self, record):
+        """
+        Write one record as a single compact line
+        """
+        self.fileobj.write(self.encoder.encode(record) + '\n')
+        if self.flush:
+            self.fileobj.flush()
+
+
+def write_json(value, fileobj, indent=2, default=json_default, backend='auto', ensure_ascii=True):
+    """
+    Stream value to fileobj as JSON (same output as json.dump with the same
+    indent and ensure_ascii, and compact separators when indent is None)
+    """
+    JSONStreamWriter(fileobj, indent=indent, default=default, backend=backend,
+                     ensure_ascii=ensure_ascii).write(value)
+
+
+def dumps(value, indent=2, default=json_default, backend='auto', ensure_ascii=True):
+    """
+    Encode value in one piece with the fastest available backend
+    """
+    return JSONEncoder(indent=indent, default=default, backend=backend, ensure_ascii=ensure_ascii).encode(value)
@@ -0,0 +1,163 @@
+"""
+Labelled training examples streamed from on-disk shards
+Shards are JSONL (one object per line) or CSV/TSV files with a header row,
+optionally gzipped; they are read one line at a time and processed in
+batches, in worker processes when asked to, without ever loading a corpus
+"""
+import csv
+import glob
+import gzip
+import json
+import os
+import sys
+import zlib
+from collections import deque
+
+
+SHARD_EXTENSIONS = ('.jsonl', '.ndjson', '.csv', '.tsv')
+
+# State handed to worker functions by parallel_map (set in each worker)
+worker_state = {}
+
+
+def shard_paths(paths):
+    """
+    Expand files, directories (recursively) and glob patterns into a sorted
+    list of shard files (optionally gzipped, e.g. part-0001.jsonl.gz)
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+
+    shards = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                shards.extend(os.path.join(root, name) for name in names if _shard_format(name))
+        elif os.path.isfile(path):
+            shards.append(path)
+        else:
+            shards.extend(match for match in glob.glob(path, recursive=True) if os.path.isfile(match))
+
+    return sorted(set(shards))
+
+
+def _shard_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lower()
+    return extension if extension in SHARD_EXTENSIONS else None
+
+
+def iter_examples(paths, text_field='text', label_field='label', stats=None):
+    """
+    Yield (text, label) pairs from every shard under paths, labels as strings
+    stats: optional dict whose 'skipped' count records examples missing
+    the text or label
+    """
+    for path in shard_paths(paths):
+        extension = _shard_format(path)
+        if extension is None:
+            raise ValueError(f"Unsupported shard format: {path}")
+
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', newline='') as f:
+            if extension in ('.csv', '.tsv'):
+                records = csv.DictReader(f, delimiter='\t' if extension == '.tsv' else ',')
+            else:
+                records = (json.loads(line) for line in f if line.strip())
+
+            for record in records:
+                text, label = record.get(text_field), record.get(label_field)
+                if not text or label in (None, ''):
+                    if stats is not None:
+                        stats['skipped'] = stats.get('skipped', 0) + 1
+                    continue
+                yield text, str(label)
+
+
+def iter_batches(examples, batch_size):
+    """
+    Group (text, label) pairs into (texts, labels) batches
+    """
+    texts, labels = [], []
+    for text, label in examples:
+        texts.append(text)
+        labels.append(label)
+        if len(texts) == batch_size:
+            yield texts, labels
+            texts, labels = [], []
+    if texts:
+        yield texts, labels
+
+
+def is_holdout(text, fraction):
+    """
+    Deterministic train/held-out assignment from a hash of the text, so every
+    pass over the shards puts each example on the same side
+    """
+    return zlib.crc32(text.encode('utf-8')) % 10000 < fraction * 10000
+
+
+def worker_count(n_jobs):
+    """
+    Processes for n_jobs (sklearn semantics: None is 1, -1 is every CPU)
+    """
+    if n_jobs == -1:
+        return os.cpu_count() or 1
+    return n_jobs or 1
+
+
+def peak_rss():
+    """
+    Peak resident set size of this process in bytes (None where the
+    resource module is unavailable, e.g. on Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _init_worker(state):
+    worker_state.clear()
+    worker_state.update(state)
+
+
+def _run_task(func, item):
+    return func(item), peak_rss()
+
+
+def parallel_map(func, items, n_jobs=None, state=None, stats=None):
+    """
+    Ordered map of a module-level func over a lazy iterable, in n_jobs worker
+    processes (func reads `state` from worker_state). At most two tasks per
+    worker are in flight: Pool.imap reads its whole input ahead, which would
+    load every shard
+    stats: optional dict given 'worker_peak_rss', the largest peak RSS of
+    any worker process in bytes (tracemalloc in this process cannot see it)
+    """
+    workers = worker_count(n_jobs)
+    if workers == 1:
+        _init_worker(state or {})
+        for item in items:
+            yield func(item)
+        return
+
+    from multiprocessing import Pool
+
+    with Pool(workers, initializer=_init_worker, initargs=(state or {},)) as pool:
+        pending = deque()
+
+        def result():
+            value, rss = pending.popleft().get()
+            if stats is not None and rss is not None:
+                stats['worker_peak_rss'] = max(stats.get('worker_peak_rss', 0), rss)
+            return value
+
+        for item in items:
+            pending.append(pool.apply_async(_run_task, (func, item)))
+            if len(pending) >= 2 * workers:
+                yield result()
+        while pending:
+            yield result()
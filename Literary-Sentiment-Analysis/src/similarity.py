@@ -0,0 +1,92 @@
+"""
+Pairwise comparison matrices for sets of texts
+Every matrix is computed in bulk with NumPy (or a sparse product for TF-IDF)
+rather than pair by pair
+"""
+import numpy as np
+
+
+def emotion_matrix(emotion_results, emotions):
+    """
+    Stack predict_emotion results into an (n, k) array of distributions
+    """
+    return np.array([[result['all_emotions'].get(emotion, 0.0) for emotion in emotions]
+                     for result in emotion_results], dtype=np.float64).reshape(-1, len(emotions))
+
+
+def cosine_similarity_matrix(vectors):
+    """
+    Cosine similarity between all rows; rows of zeros are similar to nothing
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    return np.clip(unit @ unit.T, -1.0, 1.0)
+
+
+def _entropy(distributions):
+    # Shannon entropy in bits along the last axis, with 0 log 0 = 0
+    logs = np.log2(distributions, out=np.zeros_like(distributions), where=distributions > 0)
+    return -(distributions * logs).sum(axis=-1)
+
+
+def js_divergence_matrix(distributions, block_size=256):
+    """
+    Jensen-Shannon divergence (base 2, in [0, 1]) between all rows
+    Rows are normalized to sum to one; rows of zeros count as uniform.
+    Computed as H(M) - (H(P) + H(Q)) / 2 in row blocks to bound memory
+    """
+    count, width = distributions.shape
+    totals = distributions.sum(axis=1, keepdims=True)
+    uniform = np.full_like(distributions, 1.0 / width) if width else distributions
+    probs = np.where(totals > 0, distributions / np.where(totals > 0, totals, 1.0), uniform)
+    entropies = _entropy(probs)
+
+    divergence = np.empty((count, count))
+    for start in range(0, count, block_size):
+        block = probs[start:start + block_size]
+        mixture = (block[:, None, :] + probs[None, :, :]) / 2
+        divergence[start:start + block_size] = (
+            _entropy(mixture) - (entropies[start:start + block_size, None] + entropies[None, :]) / 2
+        )
+
+    np.fill_diagonal(divergence, 0.0)
+    return np.clip(divergence, 0.0, 1.0)
+
+
+def delta_matrix(values):
+    """
+    values[j] - values[i] for every pair (row i, column j)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return values[None, :] - values[:, None]
+
+
+def tfidf_similarity_matrix(texts):
+    """
+    Cosine similarity of L2-normalized TF-IDF vectors (one sparse product)
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    try:
+        vectors = TfidfVectorizer(sublinear_tf=True).fit_transform(texts)
+    except ValueError:
+        # No text has any word token
+        return np.zeros((len(texts), len(texts)))
+    return np.asarray((vectors @ vectors.T).todense())
+
+
+def comparison_matrices(texts, sentiment_results, emotion_results, emotions):
+    """
+    All pairwise matrices for compare_texts
+    Sentiment deltas compare polarity (positive - negative probability)
+    """
+    distributions = emotion_matrix(emotion_results, emotions)
+    polarity = [result['scores']['positive'] - result['scores']['negative']
+                for result in sentiment_results]
+
+    return {
+        'emotion_cosine': cosine_similarity_matrix(distributions),
+        'emotion_js_divergence': js_divergence_matrix(distributions),
+        'sentiment_delta': delta_matrix(polarity),
+        'tfidf_similarity': tfidf_similarity_matrix(texts)
+    }
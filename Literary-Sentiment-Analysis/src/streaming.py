@@ -0,0 +1,384 @@
+"""
+Streaming analysis of book-length texts
+Files are read in bounded blocks cut on paragraph/sentence boundaries and every
+stage is fed incrementally, so memory stays flat as the file grows. Partial
+results (sentences, arc points, running aggregates) can be emitted as events
+while the stream is read
+"""
+import os
+import re
+import string
+import sys
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.document import Document
+from src.sentence_results import LABEL_CODES, SentenceResults
+
+
+SENTENCE_END = re.compile(r'[.!?]["\'”’)\]]*\s+')
+
+# How far back from the end of a buffer to look for a sentence boundary
+BOUNDARY_SEARCH = 4096
+
+# Texts of at most this many words get no emotional arc (as in analyze_complete)
+ARC_MIN_WORDS = 200
+
+
+def iter_text_blocks(fileobj, block_size=64 * 1024):
+    """
+    Read a text stream in blocks of roughly block_size characters
+    Each block ends on a paragraph break, sentence end or (failing both) line
+    break when one is available; the remainder is carried over into the next
+    block
+    """
+    carry = ''
+
+    while True:
+        chunk = fileobj.read(block_size)
+        if not chunk:
+            if carry.strip():
+                yield carry
+            return
+
+        buffer = carry + chunk
+        cut = _find_boundary(buffer)
+
+        # No boundary at all: carry on reading, but never hold more than a few blocks
+        if cut <= 0:
+            if len(buffer) < 4 * block_size:
+                carry = buffer
+                continue
+            cut = buffer.rfind(' ') + 1 or len(buffer)
+
+        yield buffer[:cut]
+        carry = buffer[cut:]
+
+
+def _find_boundary(buffer):
+    """
+    Position just after the last paragraph break, else the last sentence
+    end, else the last line break (hard-wrapped prose has line breaks inside
+    sentences, so they are only used when no sentence ends in the buffer)
+    """
+    cut = buffer.rfind('\n\n')
+    if cut >= 0:
+        return cut + 2
+
+    tail_start = max(0, len(buffer) - BOUNDARY_SEARCH)
+    last = None
+    for last in SENTENCE_END.finditer(buffer, tail_start):
+        pass
+    if last:
+        return last.end()
+
+    return buffer.rfind('\n') + 1
+
+
+class StreamingAnalysis:
+    def __init__(self, analyzer, text_type='general', max_sentences=1000, arc_chunk_size=100,
+                 emit_events=False, compact=False):
+        """
+        Incremental counterpart of LiteraryTextAnalyzer.analyze_complete
+        analyzer: LiteraryTextAnalyzer whose models are used for every block
+        max_sentences: per-sentence results kept in the output (aggregates cover all)
+        arc_chunk_size: words per emotional arc point
+        emit_events: queue a 'sentence' event per sentence and an 'arc_point'
+        event per arc chunk for drain_events (every sentence, not only the
+        first max_sentences)
+        compact: return the kept sentence results as a SentenceResults (offsets
+        into the stream) instead of a list of dicts
+        """
+        self.analyzer = analyzer
+        self.text_type = text_type
+        self.max_sentences = max_sentences
+        self.arc_chunk_size = arc_chunk_size
+        self.events = [] if emit_events else None
+        self.compact = compact
+
+        matcher = analyzer.emotion_detector.matcher
+        self.text_length = 0
+
+        # Features
+        self.word_count = 0
+        self.word_chars = 0
+        self.sentence_count = 0
+        self.punctuation_count = 0
+        self.exclamation_count = 0
+        self.question_count = 0
+        self.vocabulary = set()
+
+        # Poetic structure
+        self.line_count = 0
+        self.stanza_count = 0
+        self._line_has_text = False
+        self._in_stanza = False
+
+        # Sentiment
+        self.sentiment_scores = {'positive': 0, 'negative': 0, 'neutral': 0}
+        self.sentence_starts = []
+        self.sentence_ends = []
+        self.sentence_labels = []
+        self.sentence_confidences = []
+        self._kept_text = []
+        self.sentiments_seen = 0
+        self.memo_stats = {}
+
+        # Emotions and arc
+        self.emotion_counts = dict.fromkeys(matcher.emotions, 0)
+        self.arc_counts = []
+        self._arc_words = []
+        self._arc_word_offset = 0
+
+        # Subjectivity (weighted by the number of TextBlob assessments)
+        self.polarity_sum = 0.0
+        self.subjectivity_sum = 0.0
+        self.assessment_count = 0
+
+    def feed(self, block):
+        """
+        Analyze one block of text and fold it into the running aggregates
+        """
+        doc = Document(block)
+        offset = self.text_length
+        self.text_length += len(block)
+
+        self._feed_features(doc)
+        self._feed_lines(block)
+        self._feed_sentiment(doc, offset)
+        self._feed_emotions(doc)
+        self._feed_subjectivity(block)
+
+    def _feed_features(self, doc):
+        words = doc.words
+        self.word_count += len(words)
+        self.word_chars += sum(len(word) for word in words)
+        self.sentence_count += len(doc.sentences)
+        self.punctuation_count += sum(1 for char in doc.text if char in string.punctuation)
+        self.exclamation_count += doc.text.count('!')
+        self.question_count += doc.text.count('?')
+        self.vocabulary.update(words)
+
+    def _feed_lines(self, block):
+        for i, part in enumerate(block.split('\n')):
+            if i > 0:
+                self._end_line()
+            if part.strip():
+                self._line_has_text = True
+
+    def _end_line(self):
+        if self._line_has_text:
+            self.line_count += 1
+            if not self._in_stanza:
+                self.stanza_count += 1
+            self._in_stanza = True
+        else:
+            self._in_stanza = False
+        self._line_has_text = False
+
+    def _feed_sentiment(self, doc, offset):
+        sentiments = self.analyzer.sentiment_analyzer.predict_sentences(doc.sentences, stats=self.memo_stats)
+        kept_end = None
+
+        for sentence, (start, end), sentiment in zip(doc.sentences, doc.sentence_spans, sentiments):
+            self.sentiment_scores[sentiment['sentiment']] += sentiment['confidence']
+            result = {
+                'sentence': sentence,
+                'sentiment': sentiment['sentiment'],
+                'confidence': sentiment['confidence'],
+                'start': offset + start,
+                'end': offset + end
+            }
+            if len(self.sentence_starts) < self.max_sentences:
+                self.sentence_starts.append(offset + start)
+                self.sentence_ends.append(offset + end)
+                self.sentence_labels.append(LABEL_CODES[sentiment['sentiment']])
+                self.sentence_confidences.append(sentiment['confidence'])
+                kept_end = end
+            if self.events is not None:
+                self.events.append({'type': 'sentence', 'index': self.sentiments_seen, **result})
+            self.sentiments_seen += 1
+
+        # Keep the stream's text up to the last kept sentence, so the kept
+        # offsets index into it
+        if len(self.sentence_starts) < self.max_sentences:
+            self._kept_text.append(doc.text)
+        elif kept_end is not None:
+            self._kept_text.append(doc.text[:kept_end])
+
+    def _sentence_results(self):
+        sentences = SentenceResults(''.join(self._kept_text), self.sentence_starts, self.sentence_ends,
+                                    self.sentence_labels, self.sentence_confidences)
+        if self.compact:
+            return sentences
+        return [dict(result, start=start, end=end)
+                for result, start, end in zip(sentences, self.sentence_starts, self.sentence_ends)]
+
+    def _feed_emotions(self, doc):
+        matcher = self.analyzer.emotion_detector.matcher
+        for emotion, score in matcher.score(doc.text).items():
+            self.emotion_counts[emotion] = self.emotion_counts.get(emotion, 0) + score
+
+        self._arc_words.extend(doc.words)
+        while len(self._arc_words) >= self.arc_chunk_size:
+            self._add_arc_chunk(self._arc_words[:self.arc_chunk_size])
+            del self._arc_words[:self.arc_chunk_size]
+
+    def _add_arc_chunk(self, words):
+        matcher = self.analyzer.emotion_detector.matcher
+        counts = matcher.score(' '.join(words))
+        self.arc_counts.append(counts)
+
+        if self.events is not None:
+            # Normalized positions need the final chunk count, so partial
+            # arc points carry word offsets instead
+            emotion_data = self.analyzer.emotion_detector.emotion_from_scores(counts)
+            self.events.append({
+                'type': 'arc_point',
+                'chunk_number': len(self.arc_counts),
+                'start_word': self._arc_word_offset,
+                'end_word': self._arc_word_offset + len(words),
+                'primary_emotion': emotion_data['primary_emotion'],
+                'emotions': emotion_data['all_emotions']
+            })
+        self._arc_word_offset += len(words)
+
+    def drain_events(self):
+        """
+        Events queued since the last call, oldest first
+        Arc points stay queued until the text is long enough to have an arc
+        in the final results
+        """
+        if self.word_count > ARC_MIN_WORDS:
+            events, self.events = self.events, []
+            return events
+
+        events = [event for event in self.events if event['type'] != 'arc_point']
+        self.events = [event for event in self.events if event['type'] == 'arc_point']
+        return events
+
+    def _sentiment_distribution(self):
+        # Confidence-weighted distribution, as in get_overall_sentiment(method='weighted')
+        distribution = dict(self.sentiment_scores)
+        total_confidence = sum(distribution.values())
+        if total_confidence > 0:
+            for key in distribution:
+                distribution[key] /= total_confidence
+        return distribution
+
+    def aggregate(self):
+        """
+        Running totals so far: sentiment distribution and dominant emotions
+        """
+        detector = self.analyzer.emotion_detector
+        distribution = self._sentiment_distribution()
+        emotion_result = detector.emotion_from_scores(self.emotion_counts)
+
+        return {
+            'type': 'aggregate',
+            'text_length': self.text_length,
+            'word_count': self.word_count,
+            'sentence_count': self.sentence_count,
+            'sentiment': {
+                'overall_sentiment': max(distribution, key=distribution.get),
+                'distribution': distribution
+            },
+            'emotions': {
+                'primary_emotion': emotion_result['primary_emotion'],
+                'confidence': emotion_result['confidence'],
+                'top_emotions': detector.rank_emotions(emotion_result['all_emotions'], top_n=3)
+            }
+        }
+
+    def _feed_subjectivity(self, block):
+        from textblob import TextBlob
+
+        polarity, subjectivity, assessments = TextBlob(block).sentiment_assessments
+        weight = len(assessments)
+        self.polarity_sum += polarity * weight
+        self.subjectivity_sum += subjectivity * weight
+        self.assessment_count += weight
+
+    def result(self):
+        """
+        Finish the stream and return results shaped like analyze_complete
+        """
+        if self._arc_words:
+            self._add_arc_chunk(self._arc_words)
+            self._arc_words = []
+        if self._line_has_text:
+            self._end_line()
+
+        detector = self.analyzer.emotion_detector
+        word_count = self.word_count
+        sentence_count = self.sentence_count
+
+        results = {
+            'metadata': {
+                'analyzed_at': datetime.now().isoformat(),
+                'text_type': self.text_type,
+                'text_length': self.text_length,
+                'streamed': True,
+                'sentence_memo': self.memo_stats,
+                'sentences_truncated': sentence_count > len(self.sentence_starts)
+            }
+        }
+
+        results['features'] = {
+            'word_count': word_count,
+            'sentence_count': sentence_count,
+            'avg_word_length': self.word_chars / word_count if word_count else 0,
+            'avg_sentence_length': word_count / sentence_count if sentence_count else 0,
+            'punctuation_count': self.punctuation_count,
+            'exclamation_count': self.exclamation_count,
+            'question_count': self.question_count,
+            'unique_words': len(self.vocabulary),
+            'lexical_diversity': len(self.vocabulary) / word_count if word_count else 0,
+        }
+
+        if self.text_type == 'poem':
+            results['poetic_structure'] = {
+                'line_count': self.line_count,
+                'stanza_count': self.stanza_count,
+                'avg_lines_per_stanza': self.line_count / self.stanza_count if self.stanza_count else 0,
+                'total_words': word_count,
+                'avg_words_per_line': word_count / self.line_count if self.line_count else 0,
+            }
+
+        distribution = self._sentiment_distribution()
+        results['sentiment'] = {
+            'overall_sentiment': max(distribution, key=distribution.get),
+            'distribution': distribution,
+            'sentence_count': sentence_count,
+            'sentences': self._sentence_results()
+        }
+
+        emotion_result = detector.emotion_from_scores(self.emotion_counts)
+        results['emotions'] = {
+            'primary_emotion': emotion_result['primary_emotion'],
+            'confidence': emotion_result['confidence'],
+            'all_emotions': emotion_result['all_emotions'],
+            'top_emotions': detector.rank_emotions(emotion_result['all_emotions'], top_n=3)
+        }
+
+        polarity = self.polarity_sum / self.assessment_count if self.assessment_count else 0.0
+        subjectivity = self.subjectivity_sum / self.assessment_count if self.assessment_count else 0.0
+        results['subjectivity'] = {
+            'subjectivity': subjectivity,
+            'polarity': polarity,
+            'assessment': detector._assess_subjectivity(subjectivity)
+        }
+
+        if word_count > ARC_MIN_WORDS:
+            chunk_total = len(self.arc_counts)
+            results['emotional_arc'] = []
+            for i, counts in enumerate(self.arc_counts):
+                emotion_data = detector.emotion_from_scores(counts)
+                results['emotional_arc'].append({
+                    'position': i / chunk_total,
+                    'chunk_number': i + 1,
+                    'primary_emotion': emotion_data['primary_emotion'],
+                    'emotions': emotion_data['all_emotions']
+                })
+
+        return results
@@ -1,71 +1,198 @@
 """
 Complete text analyzer combining sentiment and emotion analysis
 """
+import io
+import logging
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+from src.approximate import approximate_analysis
+from src.cache import ResultCache
+from src.document import Document
+from src.instrumentation import Instrumentation
+from src.sentence_results import json_default, json_default_columnar
+from src.serialization import write_json
+from src.similarity import comparison_matrices
 from src.preprocessing import TextPreprocessor, analyze_poetic_structure
 from src.sentiment_model import LiterarySentimentAnalyzer
+from src.streaming import StreamingAnalysis, iter_text_blocks
 from src.emotion_detector import EmotionDetector
-import json
 from datetime import datetime
 
 
+TEXT_TYPE_BY_EXTENSION = {
+    '.poem': 'poem',
+    '.txt': 'general',
+    '.md': 'general'
+}
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of analyze_complete results changes
+RESULTS_VERSION = 1
+
+
 class LiteraryTextAnalyzer:
-    def __init__(self):
+    def __init__(self, cache_size=64 * 1024 * 1024, cache_dir=None, instrumentation=None,
+                 emotion_mode='keywords'):
+        """
+        cache_size: bytes of analyze_complete results kept in memory (0 disables caching)
+        cache_dir: optional directory for an on-disk cache tier
+        instrumentation: Instrumentation receiving per-stage timings
+        emotion_mode: 'keywords' or 'hybrid' (blend in the trained emotion classifier)
+        """
         self.preprocessor = TextPreprocessor(remove_stopwords=False, lemmatize=True)
         self.sentiment_analyzer = LiterarySentimentAnalyzer()
-        self.emotion_detector = EmotionDetector()
+        self.emotion_detector = EmotionDetector(mode=emotion_mode)
+        self.cache = ResultCache(cache_size, cache_dir) if cache_size or cache_dir else None
+        self.instrumentation = instrumentation or Instrumentation()
+    
+    def cache_key(self, text, text_type):
+        """
+        Cache key for a text: content hash, text type and model/lexicon versions
+        """
+        return ResultCache.make_key(
+            Document.of(text).text,
+            text_type,
+            RESULTS_VERSION,
+            self.sentiment_analyzer.model_version,
+            self.emotion_detector.cache_version,
+            self.emotion_detector.matcher.fingerprint
+        )
+    
+    def cache_stats(self):
+        """
+        Hit/miss counters of the result cache
+        """
+        return self.cache.stats() if self.cache else None
         
-    def analyze_complete(self, text, text_type='general'):
+    def analyze_complete(self, text, text_type='general', use_cache=True, include_timings=False,
+                         mode='exact', sentence_budget=400, time_budget=None, compact=False):
         """
         Perform complete analysis on a literary text
         text_type: 'poem', 'book', 'story', 'essay', 'general'
+        text: raw string or Document (tokenized once and shared by every stage)
+        use_cache: look up and store results in the result cache
+        include_timings: attach per-stage timing records to results['metadata']['timings']
+        mode: 'exact', or 'approximate' to estimate the headline results with
+        confidence intervals from a stratified sample of at most
+        sentence_budget sentences and time_budget seconds (never cached;
+        see src/approximate.py)
+        compact: keep results['sentiment']['sentences'] as a SentenceResults
+        (offsets plus columns) instead of a list of per-sentence dicts
         """
-        print(f"Analyzing {text_type}...")
+        span = self.instrumentation.span
+        timings = []
+        
+        if mode == 'approximate':
+            with span('approximate', timings) as stage:
+                results = approximate_analysis(self, text, text_type=text_type, sentence_budget=sentence_budget,
+                                               time_budget=time_budget)
+                stage.tokens = results['features']['word_count']
+            if include_timings:
+                results['metadata']['timings'] = timings
+            return results
+        if mode != 'exact':
+            raise ValueError(f"Unknown analysis mode: {mode}")
+        
+        if use_cache and self.cache:
+            with span('cache_lookup', timings):
+                key = self.cache_key(text, text_type)
+                results = self.cache.get(key)
+            if results is not None:
+                results['metadata']['cached'] = True
+                # No sentence was scored (entries written by older versions
+                # still carry the counts of the run that stored them)
+                results['metadata'].pop('sentence_memo', None)
+                if include_timings:
+                    results['metadata']['timings'] = timings
+                return results if compact else self._expand_sentences(results)
+        
+        memo_stats = {}
+        results = self._analyze(text, text_type, timings, memo_stats)
+        
+        if use_cache and self.cache:
+            self.cache.put(key, results)
+        
+        # Per-call statistics, attached after caching like the timings
+        results['metadata']['sentence_memo'] = memo_stats
+        if include_timings:
+            results['metadata']['timings'] = timings
+        return results if compact else self._expand_sentences(results)
+    
+    def _expand_sentences(self, results):
+        """
+        Copy of results with the compact sentence results as a list of dicts
+        (the cached results keep the compact form)
+        """
+        sentiment = dict(results['sentiment'], sentences=results['sentiment']['sentences'].to_list())
+        return dict(results, sentiment=sentiment)
+    
+    def _analyze(self, text, text_type, timings, memo_stats=None):
+        """
+        Run every analysis stage (uncached), timing each one
+        memo_stats: optional dict filled with sentence memo hit counts
+        """
+        logger.info("Analyzing %s...", text_type)
+        span = self.instrumentation.span
+        doc = Document.of(text)
         
         results = {
             'metadata': {
                 'analyzed_at': datetime.now().isoformat(),
                 'text_type': text_type,
-                'text_length': len(text)
+                'text_length': len(doc)
             }
         }
         
-        # Basic preprocessing
-        print("  • Preprocessing text...")
-        results['features'] = self.preprocessor.extract_features(text)
+        # Basic preprocessing (the shared tokenization happens here)
+        with span('features', timings) as stage:
+            results['features'] = self.preprocessor.extract_features(doc)
+            stage.tokens = len(doc.words)
         
         # Poetic structure (if applicable)
         if text_type == 'poem':
-            print("  • Analyzing poetic structure...")
-            results['poetic_structure'] = analyze_poetic_structure(text)
+            with span('poetic_structure', timings) as stage:
+                results['poetic_structure'] = analyze_poetic_structure(doc)
+                stage.tokens = len(doc.words)
         
         # Sentiment analysis
-        print("  • Analyzing sentiment...")
-        results['sentiment'] = self.sentiment_analyzer.get_overall_sentiment(text)
-        
-        # Emotion detection
-        print("  • Detecting emotions...")
-        emotion_result = self.emotion_detector.predict_emotion(text)
-        results['emotions'] = {
-            'primary_emotion': emotion_result['primary_emotion'],
-            'confidence': emotion_result['confidence'],
-            'all_emotions': emotion_result['all_emotions'],
-            'top_emotions': self.emotion_detector.get_dominant_emotions(text, top_n=3)
-        }
+        with span('sentiment', timings) as stage:
+            results['sentiment'] = self.sentiment_analyzer.get_overall_sentiment(doc, compact=True,
+                                                                                 stats=memo_stats)
+            stage.tokens = len(doc.words)
+        
+        # Emotion detection; the hybrid detector classifies the text and its
+        # arc chunks in one batch, so the arc is computed here too
+        with_arc = results['features']['word_count'] > 200
+        with span('emotions', timings) as stage:
+            if with_arc and self.emotion_detector.uses_classifier:
+                emotion_result, emotional_arc = self.emotion_detector.analyze_document(doc)
+            else:
+                emotion_result, emotional_arc = self.emotion_detector.predict_emotion(doc), None
+            results['emotions'] = {
+                'primary_emotion': emotion_result['primary_emotion'],
+                'confidence': emotion_result['confidence'],
+                'all_emotions': emotion_result['all_emotions'],
+                'top_emotions': self.emotion_detector.rank_emotions(emotion_result['all_emotions'], top_n=3)
+            }
+            stage.tokens = len(doc.words)
         
         # Subjectivity analysis
-        print("  • Analyzing subjectivity...")
-        results['subjectivity'] = self.emotion_detector.analyze_subjectivity(text)
+        with span('subjectivity', timings) as stage:
+            results['subjectivity'] = self.emotion_detector.analyze_subjectivity(doc)
+            stage.tokens = len(doc.words)
         
         # Emotional arc (for longer texts)
-        if results['features']['word_count'] > 200:
-            print("  • Tracking emotional arc...")
-            results['emotional_arc'] = self.emotion_detector.analyze_emotional_arc(text)
+        if with_arc:
+            with span('emotional_arc', timings) as stage:
+                if emotional_arc is None:
+                    emotional_arc = self.emotion_detector.analyze_emotional_arc(doc)
+                results['emotional_arc'] = emotional_arc
+                stage.tokens = len(doc.words)
         
-        print("✓ Analysis complete!")
+        logger.info("✓ Analysis complete!")
         return results
     
     def generate_summary(self, analysis_results):
@@ -85,7 +212,10 @@ class LiteraryTextAnalyzer:
         summary.append(f"  • Word count: {features['word_count']}")
         summary.append(f"  • Sentence count: {features['sentence_count']}")
         summary.append(f"  • Average sentence length: {features['avg_sentence_length']:.1f} words")
-        summary.append(f"  • Lexical diversity: {features['lexical_diversity']:.2%}")
+        if 'lexical_diversity' in features:
+            summary.append(f"  • Lexical diversity: {features['lexical_diversity']:.2%}")
+        if features.get('estimated'):
+            summary.append(f"  • Estimated from {results['metadata']['sampled_sentences']} sampled sentences")
         
         # Poetic structure (if available)
         if 'poetic_structure' in results:
@@ -132,26 +262,83 @@ class LiteraryTextAnalyzer:
         
         return "\n".join(summary)
     
-    def analyze_file(self, filepath, output_format='text'):
+    def read_file(self, filepath):
         """
-        Analyze a text file
-        output_format: 'text', 'json', or 'both'
+        Read a text file and detect its text type from the extension
+        Returns: (text, text_type)
         """
-        # Detect file type from extension
         ext = os.path.splitext(filepath)[1].lower()
-        text_type_map = {
-            '.poem': 'poem',
-            '.txt': 'general',
-            '.md': 'general'
-        }
-        text_type = text_type_map.get(ext, 'general')
+        text_type = TEXT_TYPE_BY_EXTENSION.get(ext, 'general')
         
-        # Read file
         with open(filepath, 'r', encoding='utf-8') as f:
             text = f.read()
         
+        return text, text_type
+    
+    def analyze_stream(self, fileobj, text_type='general', block_size=64 * 1024, max_sentences=1000,
+                       compact=False):
+        """
+        Analyze a text stream incrementally without holding it in memory
+        Only aggregates and the first max_sentences sentence results are kept
+        compact: keep the sentence results as a SentenceResults (as in analyze_complete)
+        """
+        logger.info("Streaming analysis of %s...", text_type)
+        analysis = StreamingAnalysis(self, text_type=text_type, max_sentences=max_sentences, compact=compact)
+        
+        for block in iter_text_blocks(fileobj, block_size=block_size):
+            with self.instrumentation.span('stream_block'):
+                analysis.feed(block)
+        
+        logger.info("✓ Analysis complete!")
+        return analysis.result()
+    
+    def iter_analyze(self, text_or_stream, text_type='general', block_size=4 * 1024, max_sentences=1000,
+                     arc_chunk_size=100):
+        """
+        Analyze incrementally, yielding partial results as each block of about
+        block_size characters is done (so the first results arrive after one
+        block however long the text is)
+        text_or_stream: raw string, Document or text file object
+        Yields dicts tagged by 'type':
+          'sentence': one sentence's sentiment with its character offsets
+          'arc_point': one emotional arc chunk of arc_chunk_size words
+          'aggregate': running sentiment distribution and dominant emotions
+          'complete': the final results (as analyze_stream returns them)
+        """
+        if isinstance(text_or_stream, (str, Document)):
+            text_or_stream = io.StringIO(Document.of(text_or_stream).text)
+        
+        analysis = StreamingAnalysis(self, text_type=text_type, max_sentences=max_sentences,
+                                     arc_chunk_size=arc_chunk_size, emit_events=True)
+        
+        for block in iter_text_blocks(text_or_stream, block_size=block_size):
+            with self.instrumentation.span('stream_block'):
+                analysis.feed(block)
+            yield from analysis.drain_events()
+            yield analysis.aggregate()
+        
+        results = analysis.result()
+        yield from analysis.drain_events()
+        yield {'type': 'complete', 'results': results}
+    
+    def analyze_file(self, filepath, output_format='text', stream=False, compact=False):
+        """
+        Analyze a text file
+        output_format: 'text', 'json', or 'both'
+        stream: read and analyze the file incrementally (for book-length texts)
+        compact: write JSON without indentation, with per-sentence results in
+        the columnar layout
+        """
+        ext = os.path.splitext(filepath)[1].lower()
+        
         # Analyze
-        results = self.analyze_complete(text, text_type=text_type)
+        if stream:
+            text_type = TEXT_TYPE_BY_EXTENSION.get(ext, 'general')
+            with open(filepath, 'r', encoding='utf-8') as f:
+                results = self.analyze_stream(f, text_type=text_type, compact=compact)
+        else:
+            text, text_type = self.read_file(filepath)
+            results = self.analyze_complete(text, text_type=text_type, compact=compact)
         
         # Generate output
         if output_format in ['text', 'both']:
@@ -167,30 +354,89 @@ class LiteraryTextAnalyzer:
         if output_format in ['json', 'both']:
             json_path = filepath.replace(ext, '_analysis.json')
             with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2)
+                write_json(results, f, indent=None if compact else 2,
+                           default=json_default_columnar if compact else json_default)
             print(f"✓ JSON results saved to: {json_path}")
         
         return results
     
-    def compare_texts(self, texts, labels=None):
+    def compare_texts(self, texts, labels=None, workers=1, chunksize=8, include_matrices=False):
         """
         Compare sentiment and emotions across multiple texts
+        workers: worker processes (1 runs in this process, None uses every CPU);
+        each worker loads the models once and analyzes chunks of chunksize texts
+        include_matrices: also return pairwise comparison matrices
+        Returns: list of per-text results, or with include_matrices a dict with
+        'texts', 'labels', 'emotions' and 'matrices' (n x n NumPy arrays:
+        emotion_cosine, emotion_js_divergence, sentiment_delta, tfidf_similarity)
         """
-        if labels is None:
-            labels = [f"Text {i+1}" for i in range(len(texts))]
+        docs = [Document.of(text) for text in texts]
+        labels = list(labels) if labels is not None else [f"Text {i+1}" for i in range(len(docs))]
         
+        if workers == 1 or len(docs) <= chunksize:
+            comparisons = self._compare_chunk(docs, labels)
+        else:
+            comparisons = self._compare_parallel([doc.text for doc in docs], labels, workers, chunksize)
+        
+        if not include_matrices:
+            return comparisons
+        
+        emotions = self.emotion_detector.emotions
+        matrices = comparison_matrices(
+            [doc.text for doc in docs],
+            [result['sentiment'] for result in comparisons],
+            [result['emotion'] for result in comparisons],
+            emotions
+        )
+        return {
+            'texts': comparisons,
+            'labels': labels,
+            'emotions': list(emotions),
+            'matrices': matrices
+        }
+    
+    def _compare_chunk(self, texts, labels):
+        """
+        Per-text results for one chunk, with sentiment predicted in one batch
+        """
+        docs = [Document.of(text) for text in texts]
+        sentiments = self.sentiment_analyzer.predict_sentiment_batch([doc.text for doc in docs])
+        emotions = self.emotion_detector.predict_emotion_batch(docs)
         comparisons = []
         
-        for text, label in zip(texts, labels):
+        for doc, label, sentiment, emotion in zip(docs, labels, sentiments, emotions):
             result = {
                 'label': label,
-                'sentiment': self.sentiment_analyzer.predict_sentiment(text),
-                'emotion': self.emotion_detector.predict_emotion(text),
-                'features': self.preprocessor.extract_features(text)
+                'sentiment': sentiment,
+                'emotion': emotion,
+                'features': self.preprocessor.extract_features(doc)
             }
             comparisons.append(result)
         
         return comparisons
+    
+    def _compare_parallel(self, texts, labels, workers, chunksize):
+        """
+        Fan chunks out over a process pool that loads this analyzer's models
+        """
+        from multiprocessing import Pool
+        from src.batch import _compare_chunk, _init_worker
+        
+        sentiment = self.sentiment_analyzer
+        if sentiment.has_model and sentiment.model_paths is None:
+            raise ValueError("Worker processes load the sentiment model from disk: "
+                             "save it (save_model or save_bundle) and load it first, or use workers=1")
+        
+        chunks = [(texts[i:i + chunksize], labels[i:i + chunksize])
+                  for i in range(0, len(texts), chunksize)]
+        comparisons = []
+        
+        with Pool(workers, initializer=_init_worker,
+                  initargs=(sentiment.model_paths, self.emotion_detector, sentiment.backend)) as pool:
+            for chunk_results in pool.imap(_compare_chunk, chunks):
+                comparisons.extend(chunk_results)
+        
+        return comparisons
 
 
 if __name__ == "__main__":
@@ -0,0 +1,46 @@
+"""
+KeywordMatcher must score like the original str.count lexicon scoring except
+for keywords inside unrelated words, which it deliberately drops
+"""
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'benchmarks'))
+
+from corpus import build_corpus
+from keyword_parity import LITERARY_SENTENCES, compare
+from src.emotion_detector import EmotionDetector
+
+# Every hit the original scoring counted that the matcher does not
+EXPECTED_DROPPED = {
+    ('scared', 'care'): 1,
+    ('made', 'mad'): 1,
+    ('hearth', 'heart'): 1,
+    ('darkness', 'dark'): 1,
+    ('delighted', 'light'): 1,
+    ('haters', 'hate'): 1,
+    ('threatening', 'threat'): 1,
+}
+
+
+def test_literary_sentences_differ_only_by_pinned_hits():
+    report = compare(EmotionDetector(), 'literary sentences', LITERARY_SENTENCES)
+    assert report['unexplained'] == []
+    assert dict(report['embedded_dropped']) == EXPECTED_DROPPED
+
+
+def test_inflections_still_count():
+    report = compare(EmotionDetector(), 'literary sentences', LITERARY_SENTENCES)
+    matched = set(report['inflections_matched'])
+    for pair in [('smiled', 'smile'), ('laughing', 'laugh'), ('mourning', 'mourn'),
+                 ('loved', 'love'), ('hoped', 'hope'), ('darkened', 'dark')]:
+        assert pair in matched
+
+
+def test_corpus_differs_only_by_embedded_hits():
+    corpus = build_corpus(['1k', '10k'], 0)
+    report = compare(EmotionDetector(), 'benchmark corpus', [text for text, _ in corpus.values()])
+    assert report['unexplained'] == []
+    assert set(report['embedded_dropped']) == {('courage', 'rage'), ('darkness', 'dark')}
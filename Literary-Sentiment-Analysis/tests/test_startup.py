@@ -0,0 +1,22 @@
+"""
+Importing the CLI must not pull in the heavy model libraries; they load
+lazily on first use
+"""
+import os
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['tensorflow', 'keras', 'textblob']
+
+
+def test_import_analyze_text_skips_heavy_modules():
+    code = (
+        "import sys\n"
+        "import analyze_text\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    completed = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR,
+                               capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == ''
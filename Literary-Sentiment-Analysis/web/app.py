@@ -1,20 +1,48 @@
 """
 Flask web application for literary sentiment analysis
 """
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+from src.cache import LRUCache
+from src.coalescer import BatchCoalescer
+from src.sentence_results import SentenceResults, json_default
+from src.serialization import dumps
 from src.text_analyzer import LiteraryTextAnalyzer
 
+
+class AnalysisJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(obj):
+        try:
+            return json_default(obj)
+        except TypeError:
+            return DefaultJSONProvider.default(obj)
+
+
 app = Flask(__name__)
+app.json = AnalysisJSONProvider(app)
 CORS(app)
 
 # Initialize analyzer
 analyzer = LiteraryTextAnalyzer()
 
+# Coalesce sentences from concurrent requests into shared model batches
+# (only used once a sentiment model is loaded; see benchmarks/load.py)
+coalescer = BatchCoalescer(
+    analyzer.sentiment_analyzer.predict_sentiment_batch,
+    max_batch_size=int(os.environ.get('ANALYZE_MAX_BATCH_SIZE', 512)),
+    max_wait_ms=float(os.environ.get('ANALYZE_MAX_WAIT_MS', 5))
+)
+analyzer.sentiment_analyzer.coalescer = coalescer
+
+# Share sentence scores across requests (refrains and canonical lines recur)
+analyzer.sentiment_analyzer.sentence_memo = LRUCache(int(os.environ.get('SENTENCE_MEMO_SIZE', 100000)))
+
 
 @app.route('/')
 def index():
@@ -30,14 +58,22 @@ def analyze():
         data = request.get_json()
         text = data.get('text', '')
         text_type = data.get('type', 'general')
+        include_timings = bool(data.get('timings', False))
+        compact = bool(data.get('compact', False))
         
         if not text:
             return jsonify({'error': 'No text provided'}), 400
         
         # Perform analysis
-        results = analyzer.analyze_complete(text, text_type=text_type)
+        results = analyzer.analyze_complete(text, text_type=text_type, include_timings=include_timings,
+                                            compact=compact)
         summary = analyzer.generate_summary(results)
         
+        # Copied, so the cached results keep their SentenceResults
+        sentences = results['sentiment']['sentences']
+        if isinstance(sentences, SentenceResults):
+            results = dict(results, sentiment=dict(results['sentiment'], sentences=sentences.to_columnar()))
+        
         return jsonify({
             'success': True,
             'results': results,
@@ -56,7 +92,64 @@ def analyze():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/analyze/stream', methods=['GET', 'POST'])
+def analyze_stream():
+    """
+    Analyze text, streaming partial results as they are ready: one JSON
+    event per line (NDJSON), or Server-Sent Events when the request asks for
+    'format': 'sse' or accepts text/event-stream
+    POST takes a JSON body; GET takes text, type and format query parameters
+    so a browser EventSource can consume the SSE form (URL length limits
+    apply, so longer texts should be POSTed and read with a fetch stream)
+    """
+    data = request.args if request.method == 'GET' else request.get_json()
+    text = data.get('text', '')
+    text_type = data.get('type', 'general')
+    sse = data.get('format') == 'sse' or request.accept_mimetypes.best == 'text/event-stream'
+    
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+    
+    def encode(event):
+        line = dumps(event, indent=None)
+        return f"event: {event['type']}\ndata: {line}\n\n" if sse else line + '\n'
+    
+    def generate():
+        try:
+            for event in analyzer.iter_analyze(text, text_type=text_type):
+                if event['type'] == 'complete':
+                    event['summary'] = analyzer.generate_summary(event['results'])
+                yield encode(event)
+        except Exception as e:
+            yield encode({'type': 'error', 'error': str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream' if sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/metrics')
+def metrics():
+    """
+    Per-stage timing counters in the Prometheus text format
+    """
+    extra = {}
+    cache_stats = analyzer.cache_stats()
+    if cache_stats:
+        extra['cache_memory_hits_total'] = cache_stats['memory_hits']
+        extra['cache_disk_hits_total'] = cache_stats['disk_hits']
+        extra['cache_misses_total'] = cache_stats['misses']
+    coalescer_stats = coalescer.stats()
+    extra['coalescer_batches_total'] = coalescer_stats['batches']
+    extra['coalescer_texts_total'] = coalescer_stats['texts']
+    
+    return Response(analyzer.instrumentation.prometheus(extra_counters=extra),
+                    mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
     print("Starting Literary Sentiment Analysis Web Server...")
     print("Open your browser to: http://localhost:5000")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)